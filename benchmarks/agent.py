@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""example.py style agent used by the benchmark suite"""
+
+import ocfagent.agent
+import ocfagent.error
+import ocfagent.parameter
+
+
+class BenchOCF(ocfagent.agent.ResourceAgent):
+	"""Benchmark OCF agent
+	"""
+	VERSION = "1.0"
+	SHORTDESC = "Benchmark OCF agent"
+	LONGDESC = "This agent is used by the benchmark suite to measure per-action latency"
+
+	class OCFParameter_test1(ocfagent.parameter.ResourceStringParameter):
+		"""test1 parameter
+This is a string parameter"""
+		@property
+		def default(self):
+			return "bla"
+
+	class OCFParameter_test2(ocfagent.parameter.ResourceIntParameter):
+		"""test2 parameter
+This is an integer parameter"""
+		@property
+		def required(self):
+			return True
+
+	class OCFParameter_test3(ocfagent.parameter.ResourceBoolParameter):
+		"""test3 parameter
+This is a boolean parameter"""
+		@property
+		def default(self):
+			return True
+
+	def handle_start(self, timeout=10):  # pylint: disable=W0613
+		"""start handler"""
+		pass
+
+	def handle_stop(self, timeout=10):  # pylint: disable=W0613
+		"""stop handler"""
+		pass
+
+	def handle_monitor(self, timeout=10):  # pylint: disable=W0613
+		"""monitor handler"""
+		self.get_parameter("test1")
+		self.get_parameter("test2")
+
+	def handle_validate_all(self, timeout=10):  # pylint: disable=W0613
+		"""validate-all handler"""
+		if self.get_parameter("test2") < 0:
+			raise ocfagent.error.OCFErrConfigured("test2 must not be negative")
+
+
+if __name__ == "__main__":
+	BenchOCF().cmdline_call()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measure the import time of ocfagent.agent with and without lxml.
+
+ocfagent.agent no longer imports lxml at module import time. This benchmark
+compares a plain import of ocfagent.agent with an import that additionally
+loads lxml.etree (the cost every action paid before).
+
+Usage: python benchmarks/import_time.py [runs]
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+	("python startup", "pass"),
+	("import ocfagent.agent", "import ocfagent.agent"),
+	("import ocfagent.agent + lxml.etree", "import ocfagent.agent, lxml.etree"),
+]
+
+
+def measure(statement, runs):
+	"""return the median wall time of running statement in a fresh interpreter"""
+	env = dict(os.environ)
+	env["PYTHONPATH"] = ROOT
+	timings = []
+	for _ in range(runs):
+		start = time.time()
+		subprocess.check_call([sys.executable, "-c", statement], env=env)
+		timings.append(time.time() - start)
+	timings.sort()
+	return timings[len(timings) // 2]
+
+
+def main():
+	"""run benchmark and print results"""
+	runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+	results = []
+	for name, statement in STATEMENTS:
+		results.append((name, measure(statement, runs)))
+		print ("%-40s %8.2f ms" % (name, results[-1][1] * 1000))
+	saving = results[2][1] - results[1][1]
+	print ("%-40s %8.2f ms" % ("saving without lxml", saving * 1000))
+
+
+if __name__ == "__main__":
+	main()
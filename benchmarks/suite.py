@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmark suite for cold-start and per-action latency.
+
+Process benchmarks run benchmarks/agent.py as real subprocesses with a
+synthetic OCF environment and measure median wall time and peak RSS.
+Micro benchmarks measure framework functions for an agent with many
+parameters in-process.
+
+Usage:
+	python benchmarks/suite.py [--runs N] [--parameters N] [--output results.json]
+	python benchmarks/suite.py --compare baseline.json results.json [--threshold 0.1]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENT = os.path.join(ROOT, "benchmarks", "agent.py")
+sys.path.insert(0, ROOT)
+
+import ocfagent  # noqa pylint: disable=C0413
+import ocfagent.agent  # noqa pylint: disable=C0413
+import ocfagent.metadata  # noqa pylint: disable=C0413
+import ocfagent.parameter  # noqa pylint: disable=C0413
+
+PROCESS_BENCHMARKS = [
+	("import", [sys.executable, "-c", "import ocfagent.agent"], 0),
+	("cold_start", [sys.executable, AGENT], 3),
+	("meta-data", [sys.executable, AGENT, "meta-data"], 0),
+	("validate-all", [sys.executable, AGENT, "validate-all"], 0),
+	("monitor", [sys.executable, AGENT, "monitor"], 0),
+]
+"""name, command line and expected exit code of subprocess benchmarks (cold_start is a usage call)"""
+
+
+def ocf_environment():
+	"""synthetic OCF environment as passed by lrmd"""
+	env = dict(os.environ)
+	env.update({
+		"PYTHONPATH": ROOT,
+		"OCF_ROOT": "/usr/lib/ocf",
+		"OCF_RA_VERSION_MAJOR": "1",
+		"OCF_RA_VERSION_MINOR": "0",
+		"OCF_RESOURCE_INSTANCE": "bench:0",
+		"OCF_RESOURCE_TYPE": "BenchOCF",
+		"OCF_RESOURCE_PROVIDER": "bench",
+		"OCF_RESKEY_test1": "value",
+		"OCF_RESKEY_test2": "42",
+		"OCF_RESKEY_test3": "true",
+		"OCF_RESKEY_CRM_meta_timeout": "20000",
+	})
+	return env
+
+
+def median(values):
+	"""median of values"""
+	values = sorted(values)
+	return values[len(values) // 2]
+
+
+def run_process(args, env):
+	"""run args and return exit code, wall time in seconds and peak RSS in KiB"""
+	with open(os.devnull, "w") as devnull:
+		start = time.time()
+		proc = subprocess.Popen(args, env=env, stdout=devnull, stderr=devnull)
+		_, status, rusage = os.wait4(proc.pid, 0)
+		elapsed = time.time() - start
+	proc.returncode = os.WEXITSTATUS(status)
+	return proc.returncode, elapsed, rusage.ru_maxrss
+
+
+def process_benchmarks(runs):
+	"""run subprocess benchmarks"""
+	env = ocf_environment()
+	results = {}
+	for name, args, expected in PROCESS_BENCHMARKS:
+		walls = []
+		rss = []
+		for _ in range(runs):
+			code, wall, maxrss = run_process(args, env)
+			if code != expected:
+				raise RuntimeError("Benchmark %s exited with %i, expected %i" % (name, code, expected))
+			walls.append(wall)
+			rss.append(maxrss)
+		results["process.%s.wall_seconds" % name] = median(walls)
+		results["process.%s.max_rss_kib" % name] = max(rss)
+	return results
+
+
+def make_agent_class(parameters):
+	"""create an agent class with the given number of string parameters"""
+	attributes = {
+		"VERSION": "1.0",
+		"SHORTDESC": "Micro benchmark agent",
+		"LONGDESC": "Agent with many parameters",
+		"handle_start": lambda self, timeout=10: None,
+		"handle_stop": lambda self, timeout=10: None,
+		"handle_monitor": lambda self, timeout=10: None,
+	}
+	for i in range(parameters):
+		name = "OCFParameter_param%03i" % i
+		attributes[name] = type(name, (ocfagent.parameter.ResourceStringParameter,), {"__doc__": "param%03i\nparameter number %i" % (i, i)})
+	return ocfagent.agent.AttributeVerifier("MicroOCF", (ocfagent.agent.ResourceAgent,), attributes)
+
+
+def best_per_call(func, number, repeat=5):
+	"""best time per call of func over repeat rounds of number calls"""
+	best = None
+	for _ in range(repeat):
+		start = time.time()
+		for _ in range(number):
+			func()
+		elapsed = (time.time() - start) / number
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+
+def micro_benchmarks(parameters, number):
+	"""run in-process micro benchmarks for an agent with many parameters"""
+	saved_argv, saved_environ = sys.argv, dict(os.environ)
+	sys.argv = ["bench", "monitor"]
+	os.environ.update(ocf_environment())
+	for i in range(parameters):
+		os.environ["OCF_RESKEY_param%03i" % i] = "value%i" % i
+	try:
+		results = {}
+		results["micro.class_creation.seconds"] = best_per_call(lambda: make_agent_class(parameters), max(1, number // 10))
+		agent = make_agent_class(parameters)()
+		results["micro.get_parameter_spec.seconds"] = best_per_call(lambda: agent.get_parameter_spec(check_env=True), number)
+		results["micro.parse_parameters.seconds"] = best_per_call(agent.parse_parameters, number)
+		results["micro.get_parameter.seconds"] = best_per_call(lambda: agent.get_parameter("param%03i" % (parameters - 1)), number * 10)
+		results["micro.meta_data_tree.seconds"] = best_per_call(agent.meta_data_tree, number)
+		results["micro.meta_data_string.seconds"] = best_per_call(lambda: ocfagent.metadata.tostring(agent.meta_data_tree()), number)
+		try:
+			import lxml.etree  # noqa pylint: disable=W0612
+		except ImportError:
+			pass
+		else:
+			results["micro.meta_data_xml.seconds"] = best_per_call(agent.meta_data_xml, number)
+		return results
+	finally:
+		sys.argv = saved_argv
+		os.environ.clear()
+		os.environ.update(saved_environ)
+
+
+def compare(baseline, current, threshold):
+	"""print a comparison of two result files and return the list of regressed metrics"""
+	regressions = []
+	for key in sorted(set(baseline["metrics"]) | set(current["metrics"])):
+		old = baseline["metrics"].get(key)
+		new = current["metrics"].get(key)
+		if old is None or new is None:
+			print ("%-45s %14s %14s" % (key, old, new))
+			continue
+		change = (new - old) / float(old) if old else 0.0
+		flag = ""
+		if change > threshold:
+			flag = "REGRESSION"
+			regressions.append(key)
+		print ("%-45s %14.6g %14.6g %+7.1f%% %s" % (key, old, new, change * 100, flag))
+	return regressions
+
+
+def main():
+	"""command line entry point"""
+	parser = argparse.ArgumentParser(description="pyocfagent benchmark suite")
+	parser.add_argument("--runs", type=int, default=20, help="subprocess runs per benchmark (default 20)")
+	parser.add_argument("--parameters", type=int, default=200, help="parameters of the micro benchmark agent (default 200)")
+	parser.add_argument("--number", type=int, default=200, help="calls per micro benchmark round (default 200)")
+	parser.add_argument("--output", help="write results as JSON to this file")
+	parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files")
+	parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown reported as regression (default 0.1)")
+	args = parser.parse_args()
+
+	if args.compare:
+		with open(args.compare[0]) as f:
+			baseline = json.load(f)
+		with open(args.compare[1]) as f:
+			current = json.load(f)
+		regressions = compare(baseline, current, args.threshold)
+		if regressions:
+			print ("%i regression(s) above %.0f%%" % (len(regressions), args.threshold * 100))
+			sys.exit(1)
+		return
+
+	metrics = {}
+	metrics.update(process_benchmarks(args.runs))
+	metrics.update(micro_benchmarks(args.parameters, args.number))
+	results = {
+		"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"python": platform.python_version(),
+		"ocfagent": ocfagent.__version__,
+		"parameters": args.parameters,
+		"metrics": metrics,
+	}
+	for key in sorted(metrics):
+		print ("%-45s %14.6g" % (key, metrics[key]))
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+	main()
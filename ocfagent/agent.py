@@ -1,17 +1,29 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import contextlib
 import os
+import signal
 import sys
+import time
 import types
 
-from lxml import etree
-
-# TODO: monitor OCF_CHECK_LEVEL not yet implemented
-
+from . import deadline
 from . import error
+from . import metadata
+from . import parameter
 
 OCF_RESKEY_PREFIX = "OCF_RESKEY_"
+HA_RSCTMP_DEFAULT = "/run/resource-agents"
+
+
+def exit_code(exc):
+	"""process exit code of SystemExit exc (OCF_ERR_GENERIC for non-integer codes)"""
+	if exc.code is None:
+		return error.OCF_SUCCESS
+	if isinstance(exc.code, int):
+		return exc.code
+	return error.OCF_ERR_GENERIC
 
 
 class AttributeVerifier(type):
@@ -21,7 +33,8 @@ class AttributeVerifier(type):
 	"ATTRIBUTES_MANDATORY" is present.
 
 	At object construction time it verifies that all elements of the
-	"ATTRIBUTES_MANDATORY" attribute are available.
+	"ATTRIBUTES_MANDATORY" attribute are available and lets the class
+	forward the call to a warm worker before the instance is created.
 	"""
 	instance = None
 
@@ -31,6 +44,10 @@ class AttributeVerifier(type):
 		if not hasattr(newcls, "ATTRIBUTES_MANDATORY"):
 			raise RuntimeError("instances of AttributeVerifier must have an ATTRIBUTES_MANDATORY attribute")
 		mcs.name = name
+		# Compute class level caches (handlers, parameters) once at class creation
+		init_class = getattr(newcls, "init_class", None)
+		if init_class is not None:
+			init_class()
 		return newcls
 
 	def __call__(cls, *args, **kwargs):
@@ -39,6 +56,8 @@ class AttributeVerifier(type):
 			if not hasattr(cls, attr):
 				raise RuntimeError("attribute %r required on class %r" % (attr, cls.name))
 		if cls.instance is None:
+			if getattr(cls, "WORKER_SOCKET", None) is not None:
+				cls.forward_call(*args, **kwargs)
 			cls.instance = super(AttributeVerifier, cls).__call__(*args, **kwargs)
 
 		return cls.instance
@@ -60,6 +79,36 @@ class ResourceAgent(object):  # pylint: disable=R0902
 	"""all handlers to be implemented"""
 	ATTRIBUTES_MANDATORY = ["VERSION", "LONGDESC", "SHORTDESC"]
 	"""Attributes of class to be define in derived classes"""
+	WORKER_SOCKET = None
+	"""Unix socket path of a warm worker (see ocfagent.worker). None disables forwarding"""
+	MANIFEST = None
+	"""Path of a precomputed manifest (see ocfagent.manifest), written by the manifest action. None disables it"""
+	ENFORCE_DEADLINE = True
+	"""Interrupt handlers which exceed their soft deadline"""
+	DEADLINE_MARGIN = 0.1
+	"""Fraction of the action timeout reserved for reporting before the hard kill"""
+	DEADLINE_ERROR = error.OCFErrGeneric
+	"""Exception raised when a handler exceeds its soft deadline"""
+	PROBES = []
+	"""Health probes (ocfagent.probe.Probe instances) run by run_probes"""
+	MONITOR_CACHE_TTL = None
+	"""Seconds a monitor outcome is served from the monitor cache. None disables the cache"""
+	MONITOR_CACHE_INVALIDATE = ["start", "stop", "promote", "demote", "reload", "migrate_to", "migrate_from"]
+	"""Actions invalidating the monitor cache"""
+	BATCH_CONCURRENCY = 16
+	"""Maximum number of instances run concurrently by the batch action"""
+	METRICS_DIR = None
+	"""node_exporter textfile collector directory for timing metrics (see ocfagent.metrics). None disables metrics"""
+	PARAMETER_PATH_CHECK_ACTIONS = ["start", "validate_all"]
+	"""Actions checking path constraints of parameters on the filesystem"""
+	STOP_SIGNALS = [(signal.SIGTERM, 0.9), (signal.SIGKILL, 1.0)]
+	"""Escalation of stop_process: signal and the fraction of the remaining stop time to wait for the exit after sending it"""
+	PROMOTION_COMMAND = ["crm_master", "-l", "reboot"]
+	"""Command setting (-v score) and deleting (-D) the promotion score of this instance"""
+	PROMOTION_MIN_INTERVAL = 0
+	"""Minimum seconds between promotion score updates, changes in between are coalesced"""
+	PROMOTION_REFRESH = 3600
+	"""Seconds after which an unchanged promotion score is published again"""
 
 	def __init__(self, testmode=False):
 		self.OCF_ENVIRON = {}
@@ -72,27 +121,142 @@ class ResourceAgent(object):  # pylint: disable=R0902
 		self.res_provider = None
 
 		self.name = self.__class__.__name__
+		self.deadline = None
+		self.probe_results = []
+		self.monitor_cache = None
+		self.timings = {}
+		self._state = None
+		self._notify = None
+		self._promotion = None
 
 		# Check if mandatory handlers are implemented
 		for attr in self.__OCF_HANDLERS_MANDATORY:
-			if not hasattr(self, "handle_%s" % attr):
+			if attr not in self._handlers:
 				raise error.OCFErrUnimplemented("Mandatory handler %s is not implemented" % attr)
 
 		# Get all handlers
 		self.handlers = self.get_implemented_handlers()
 
 		# Get action (first cmd line parameter)
-		action = self.get_action()
-
-		# Special actions which do not need all environment and parameter specs or variables
-		# Allow call without it to help developers implementing
-		if action in ["usage", "meta-data"]:
-			self.parameter_spec = self.get_parameter_spec(check_env=False)
+		self.action = self.get_action()
+
+		try:
+			# Special actions which do not need all environment and parameter specs or variables
+			# Allow call without it to help developers implementing
+			if self.action in ["usage", "meta-data", "manifest", "batch"]:
+				with self.timed("parameter_spec"):
+					self.parameter_spec = self.get_parameter_spec(check_env=False)
+			else:
+				# real call of a handler. Parse environment and parameters
+				with self.timed("parameter_spec"):
+					self.parameter_spec = self.get_parameter_spec(check_env=not self.testmode)
+				with self.timed("parse_environment"):
+					self.parse_environment()
+				with self.timed("parse_parameters"):
+					self.parse_parameters()
+				if self.MONITOR_CACHE_TTL is not None:
+					from . import cache
+					self.monitor_cache = cache.MonitorCache(os.path.join(self.rsctmp, "ocfagent"), self.instance_key, self.MONITOR_CACHE_TTL)
+		except SystemExit as e:
+			# invalid environment or parameters end the call before cmdline_call
+			self.record_call(exit_code(e))
+			raise
+
+	@classmethod
+	def init_class(cls):
+		"""Compute handler and parameter specifications once per class. Called by AttributeVerifier"""
+		start = time.time()
+		# Use precomputed manifest if present and up to date
+		cls._manifest = None
+		if cls.MANIFEST is not None:
+			from . import manifest
+			cls._manifest = manifest.load(cls, cls.MANIFEST)
+
+		if cls._manifest is not None:
+			cls._handlers = cls._manifest["handlers"]
+			cls._monitor_depths = cls._manifest["monitor_depths"]
+			cls._parameter_classes = [getattr(cls, "OCFParameter_%s" % name) for name in cls._manifest["parameters"]]
+			cls._required_parameters = cls._manifest["required"]
+			cls._class_timings = {"handler_discovery": time.time() - start}
 		else:
-			# real call of a handler. Parse environment and parameters
-			self.parameter_spec = self.get_parameter_spec(check_env=not self.testmode)
-			self.parse_environment()
-			self.parse_parameters()
+			cls._handlers = cls.introspect_handlers()
+			cls._monitor_depths = cls.introspect_monitor_depths()
+			discovered = time.time()
+			cls._parameter_classes, cls._required_parameters = cls.introspect_parameters()
+			cls._class_timings = {"handler_discovery": discovered - start, "parameter_spec": time.time() - discovered}
+		cls._parameter_index = dict((parameter_class.__name__[len("OCFParameter_"):], i) for i, parameter_class in enumerate(cls._parameter_classes))
+		cls._parameter_schema = None
+		if cls._manifest is None and "reload" not in cls._handlers:
+			for parameter_class in cls._parameter_classes:
+				if parameter_class().reloadable:
+					raise RuntimeError("Parameter %s is reloadable, but handler reload is not implemented" % parameter_class.__name__[len("OCFParameter_"):])
+
+	@classmethod
+	def introspect_handler(cls, handler):
+		"""get the arguments and their defaults of handler function handle_<handler>"""
+		handler_dict = {}
+		func = getattr(cls, "handle_%s" % handler)
+		assert func.func_code.co_argcount > 1
+		assert func.func_code.co_varnames[0] == "self"
+		# get all handler arguments
+		i = 0
+		for var in func.func_code.co_varnames[:func.func_code.co_argcount]:
+			if var == "self":
+				continue
+			handler_dict[var] = func.func_defaults[i]
+			i += 1
+		# Expect timeout to be always implemented. This is a should in
+		# http://www.linux-ha.org/doc/dev-guides/_metadata.html
+		# but we will force this here to be present
+		if "timeout" not in handler_dict.keys():
+			raise RuntimeError("Handler %s does not have parameter timeout" % handler)
+		return handler_dict
+
+	@classmethod
+	def introspect_handlers(cls):
+		"""get all implemented handlers by searching handle_* functions in class"""
+		valid_handlers = {}
+		for handler in cls.__OCF_VALID_HANDLERS:
+			if hasattr(cls, "handle_%s" % handler):
+				valid_handlers[handler] = cls.introspect_handler(handler)
+		return valid_handlers
+
+	@classmethod
+	def introspect_monitor_depths(cls):
+		"""get monitor handlers for OCF_CHECK_LEVEL depths by searching handle_monitor_<depth> functions in class"""
+		depths = {}
+		for entry in dir(cls):
+			if entry.startswith("handle_monitor_"):
+				depth = entry[len("handle_monitor_"):]
+				if not depth.isdigit() or int(depth) == 0:
+					raise RuntimeError("Monitor handler %s does not end with a positive depth" % entry)
+				depths[int(depth)] = cls.introspect_handler("monitor_%s" % depth)
+		return depths
+
+	@classmethod
+	def introspect_parameters(cls):
+		"""get and validate parameter classes (OCFParameter_*) of class. Returns the
+		list of parameter classes and the list of names of required parameters"""
+		parameter_classes = []
+		required = []
+		for entry in dir(cls):
+			if entry.startswith("OCFParameter_"):
+				name = entry[len("OCFParameter_"):]
+				parameter_class = getattr(cls, entry)
+
+				param_instance = parameter_class()
+				if param_instance.type_def not in [types.IntType, types.StringType, types.BooleanType, types.ListType]:
+					raise RuntimeError("type_def property of parameter class is not of known types")
+				# Extract descriptions
+				if param_instance.shortdesc is None:
+					raise RuntimeError("Parameter %s short description is not present" % name)
+				if param_instance.longdesc is None:
+					raise RuntimeError("Parameter %s long description is not present" % name)
+
+				parameter_classes.append(parameter_class)
+				if param_instance.required:
+					required.append(name)
+		return parameter_classes, required
 
 	def get_action(self):
 		"""validate the requested action. Raise a RuntimeError if the action
@@ -105,30 +269,341 @@ class ResourceAgent(object):  # pylint: disable=R0902
 		# handle_validate-all due to the hyphen
 		action = sys.argv[1].replace("validate-all", "validate_all")
 		# check if the action is a valid implemented handler
-		if action in ["meta-data", "usage"]:
+		if action in ["meta-data", "usage", "manifest", "batch"]:
 			return action
 		elif action in self.__OCF_VALID_HANDLERS:
-			if action in self.handlers.keys():
+			if action in self.handlers:
 				return action
 			else:
 				raise error.OCFErrUnimplemented("Specified action %s does not have a defined handler" % action)
 		else:
 			raise RuntimeError("Specified action %s is invalid" % action)
 
+	@classmethod
+	def forward_call(cls, *args, **kwargs):  # pylint: disable=W0613
+		"""forward a handler call to the warm worker (see WORKER_SOCKET) before an instance is
+		constructed, so environment and parameters are only parsed by the worker. Gets the
+		constructor arguments, of which only the testmode keyword is passed on. Outputs the
+		result and exits with its exit code if forwarded. Returns if the call runs in-process"""
+		testmode = kwargs.get("testmode", False)
+		if cls.WORKER_SOCKET is None or len(sys.argv) <= 1:
+			return
+		action = sys.argv[1].replace("validate-all", "validate_all")
+		if action not in cls._handlers:
+			return
+		from . import worker
+		if worker.in_worker:
+			return
+		# the worker child is bounded by the same timeout as an in-process call
+		value = os.environ.get("OCF_RESKEY_CRM_meta_timeout")
+		try:
+			timeout = int(value) / 1000.0 if value else deadline.parse_timeout(cls._handlers[action]["timeout"])
+		except ValueError:
+			timeout = None
+		try:
+			result = worker.call(cls.WORKER_SOCKET, sys.argv, os.environ, testmode, timeout)
+		except worker.WorkerUnavailable:
+			return
+		cls.worker_result(result)
+		raise SystemExit(error.OCF_SUCCESS)
+
 	def cmdline_call(self):
 		"""main function, which should be called. Expects cmd line argument and a implemented action"""
-		action = self.get_action()
+		code = error.OCF_ERR_GENERIC
+		try:
+			self.run_action(self.action)
+			code = error.OCF_SUCCESS
+		except SystemExit as e:
+			code = exit_code(e)
+			raise
+		finally:
+			if self.action in self.handlers:
+				self.persist_state(code)
+			self.record_call(code)
+
+	def run_action(self, action):
+		"""run action in-process"""
 		# Output usage, if action is usage (or none is given)
 		if action == "usage":
 			self.usage()
 			raise error.OCFErrUnimplemented("No action specified")
 		# Output xml meta-data
 		elif action == "meta-data":
-			self.meta_data()
+			with self.timed("meta_data"):
+				self.meta_data()
+		# Write precomputed manifest
+		elif action == "manifest":
+			if self.MANIFEST is None:
+				raise error.OCFErrConfigured("No MANIFEST path defined for agent %s" % self.name)
+			from . import manifest
+			manifest.build(self, self.MANIFEST)
+		# Run an action for many instances
+		elif action == "batch":
+			if len(sys.argv) not in [3, 4]:
+				raise error.OCFErrArgs("usage: %s batch <action> [<instances file>]" % self.name)
+			path = sys.argv[3] if len(sys.argv) == 4 else "-"
+			self.batch_call(sys.argv[2], sys.stdin if path == "-" else open(path))
 		else:
 			# Otherwise call implemented handler
+			if self.monitor_cache is None:
+				self.call_handler(action)
+			elif action == "monitor":
+				self.call_monitor_cached()
+			elif action in self.MONITOR_CACHE_INVALIDATE:
+				self.invalidate_monitor_cache()
+				try:
+					self.call_handler(action)
+				finally:
+					self.invalidate_monitor_cache()
+			else:
+				self.call_handler(action)
+
+	@contextlib.contextmanager
+	def timed(self, phase):
+		"""measure the duration of the enclosed block as phase in self.timings"""
+		start = time.time()
+		try:
+			yield
+		finally:
+			self.timings[phase] = self.timings.get(phase, 0.0) + time.time() - start
+
+	def persist_state(self, code):
+		"""save changed state after a handler ran, remove it after a successful stop"""
+		try:
+			if self.action == "stop" and code == error.OCF_SUCCESS:
+				self.state.remove()
+				return
+			# remember the parameters a reload has to be compared with (only agents supporting reload),
+			# after a live migration on the node the resource moved to
+			if "reload" in self.handlers and self.action in ["start", "reload", "migrate_from"] and code == error.OCF_SUCCESS:
+				self.state.set("parameters", self.parameter_values())
+			if self._state is not None:
+				self._state.save()
+		except (IOError, OSError) as e:
+			sys.stderr.write("Persisting state failed: %s\n" % e)
+
+	def record_call(self, code):
+		"""record metrics of this call ending with exit code if METRICS_DIR is set"""
+		if self.METRICS_DIR is not None and self.action not in ["usage", "batch"]:
+			self.record_metrics(code)
+
+	def record_metrics(self, code):
+		"""record phase timings (including class creation in this process) and exit code of this call"""
+		timings = dict(self._class_timings)
+		self.__class__._class_timings = {}
+		for phase, value in self.timings.items():
+			timings[phase] = timings.get(phase, 0.0) + value
+		from . import metrics
+		try:
+			metrics.record(self.METRICS_DIR, self.name, self.action, self.instance_key, timings, code)
+		except (IOError, OSError) as e:
+			sys.stderr.write("Recording metrics failed: %s\n" % e)
+
+	def batch_call(self, action, stream, output=None):
+		"""run action for every instance environment read from stream (see ocfagent.batch)
+		and write per-instance results as JSON lines to output (default stdout)"""
+		action = action.replace("validate-all", "validate_all")
+		if action not in self.handlers:
+			raise error.OCFErrArgs("Batch action %s does not have a defined handler" % action)
+		from . import batch
+		instances = batch.read_instances(stream)
+		return batch.run(self, action, instances, output or sys.stdout, self.BATCH_CONCURRENCY)
+
+	def call_monitor_cached(self):
+		"""call monitor handler or serve its outcome from the monitor cache if fresh"""
+		depth = self.get_monitor_depth()
+		cached = self.monitor_cache.get(depth)
+		if cached is not None:
+			code, message = cached
+			if code == error.OCF_SUCCESS and message is None:
+				return
+			raise error.from_code(code, message)
+		try:
+			self.call_handler("monitor")
+		except error.ResourceAgentException as e:
+			self.monitor_cache.put(depth, e.error_code, e.message)
+			raise
+		self.monitor_cache.put(depth, error.OCF_SUCCESS, None)
+
+	def invalidate_monitor_cache(self):
+		"""drop cached monitor outcomes of this resource instance"""
+		if self.monitor_cache is not None:
+			self.monitor_cache.invalidate()
+
+	def get_check_level(self):
+		"""get the monitor depth requested by OCF_CHECK_LEVEL (0 if not given)"""
+		value = self.OCF_ENVIRON.get("OCF_CHECK_LEVEL") or "0"
+		try:
+			return int(value)
+		except ValueError:
+			raise error.OCFErrArgs("Invalid OCF_CHECK_LEVEL %s" % value)
+
+	def get_monitor_depth(self):
+		"""get the deepest implemented monitor depth not exceeding the requested check level"""
+		level = self.get_check_level()
+		depths = [depth for depth in self._monitor_depths if depth <= level]
+		if depths:
+			return max(depths)
+		return 0
+
+	def get_timeout(self, action, depth=0):
+		"""get the timeout of action in seconds. Uses OCF_RESKEY_CRM_meta_timeout (milliseconds)
+		if given by the cluster manager, otherwise the timeout default of the handler"""
+		value = self.OCF_ENVIRON.get("OCF_RESKEY_CRM_meta_timeout")
+		if value:
+			return int(value) / 1000.0
+		if depth:
+			return deadline.parse_timeout(self._monitor_depths[depth]["timeout"])
+		return deadline.parse_timeout(self.handlers[action]["timeout"])
+
+	def call_handler(self, action):
+		"""call the handler of action. The handler can access its time budget as self.deadline.
+		If ENFORCE_DEADLINE is set, the handler is interrupted at the soft deadline and
+		DEADLINE_ERROR is raised. monitor is dispatched to handle_monitor_<depth> according
+		to OCF_CHECK_LEVEL. The handler is profiled if enabled (see ocfagent.profiling)"""
+		depth = 0
+		if action == "monitor":
+			depth = self.get_monitor_depth()
+		if depth:
+			handler = getattr(self, "handle_monitor_%i" % depth)
+		else:
 			handler = getattr(self, "handle_%s" % action)
-			handler()
+		self.deadline = deadline.Deadline(self.get_timeout(action, depth), self.DEADLINE_MARGIN)
+		from . import profiling
+		if not self.ENFORCE_DEADLINE:
+			with self.timed("handler"), profiling.profile(self.OCF_ENVIRON, self.name, action):
+				return handler()
+		try:
+			with deadline.enforce(self.deadline), self.timed("handler"), profiling.profile(self.OCF_ENVIRON, self.name, action):
+				return handler()
+		except deadline.DeadlineExceeded:
+			raise self.DEADLINE_ERROR("Action %s exceeded soft deadline of %.1fs" % (action, self.deadline.soft_timeout))
+
+	def gather(self, *checks):
+		"""run checks (callables) concurrently under the deadline of the current handler and
+		return their results. The first failing check is raised at once, the others are
+		abandoned and not interrupted (see ocfagent.parallel)"""
+		from . import parallel
+		return parallel.gather(self.deadline, *checks)
+
+	def run_command(self, args, **kwargs):
+		"""run command args bounded by the deadline of the current handler and return its
+		command.CommandResult. Failures raise OCFErr* exceptions (see ocfagent.command.run)"""
+		from . import command
+		return command.run(args, self.deadline, **kwargs)
+
+	def run_commands(self, commands, **kwargs):
+		"""run commands concurrently bounded by the deadline of the current handler (see ocfagent.command.run_many)"""
+		from . import command
+		return command.run_many(commands, self.deadline, **kwargs)
+
+	def wait_for_path(self, path, process=None, check=None):
+		"""wait until path (e.g. a pidfile or socket) exists, bounded by the deadline of the
+		current handler. Raises OCFErrGeneric on timeout or if process exits (see ocfagent.readiness)"""
+		from . import readiness
+		readiness.wait_path(path, self.deadline, process=process, check=check)
+
+	def wait_for_connect(self, address, process=None):
+		"""wait until address ((host, port) or a Unix socket path) accepts connections, bounded by
+		the deadline of the current handler (see ocfagent.readiness)"""
+		from . import readiness
+		readiness.wait_connect(address, self.deadline, process=process)
+
+	def wait_for_notify(self, notify_socket, process=None):
+		"""wait for READY=1 on notify_socket (a readiness.NotifySocket whose environ() was passed to
+		the daemon), bounded by the deadline of the current handler"""
+		return notify_socket.wait(self.deadline, process=process)
+
+	def get_probes(self):
+		"""return the probes run by run_probes. Override to build probes from parameters"""
+		return self.PROBES
+
+	def run_probes(self, probes=None):
+		"""run probes concurrently under the deadline of the current handler and raise
+		OCFSuccess, OCFNotRunning or OCFErrGeneric according to the combined result.
+		The single results including latencies are kept in self.probe_results. Raises
+		OCFErrConfigured if there are no probes"""
+		from . import parallel, probe
+		if probes is None:
+			probes = self.get_probes()
+		if not probes:
+			raise error.OCFErrConfigured("No probes configured for %s" % self.name)
+		timeout = self.deadline.remaining() if self.deadline is not None else None
+		group = parallel.TaskGroup(self.deadline)
+		for p in probes:
+			group.spawn(p.run, timeout)
+		self.probe_results = group.join()
+		state, message = probe.summarize(self.probe_results)
+		if state == probe.RUNNING:
+			raise error.OCFSuccess(message)
+		elif state == probe.NOT_RUNNING:
+			raise error.OCFNotRunning(message)
+		raise error.OCFErrGeneric(message)
+
+	def track_process(self, pid, name="pid"):
+		"""remember process pid (with its start time) as name in the state store. Returns the
+		process.Process or None if pid does not exist"""
+		from . import process
+		proc = process.Process.from_pid(pid)
+		if proc is None:
+			self.state.delete(name)
+		else:
+			self.state.set(name, proc.to_state())
+		return proc
+
+	def tracked_process(self, name="pid", comm=None, match=None):
+		"""return the running process.Process remembered as name or None. If it is gone and
+		comm or match are given, /proc is scanned (see process.find) and a single match is
+		tracked again"""
+		from . import process
+		proc = process.Process.from_state(self.state.get(name))
+		if proc is not None and proc.alive():
+			return proc
+		proc = None
+		if comm is not None or match is not None:
+			found = process.find(comm=comm, match=match)
+			if len(found) == 1:
+				proc = found[0]
+		if proc is None:
+			self.state.delete(name)
+		else:
+			self.state.set(name, proc.to_state())
+		return proc
+
+	def stop_process(self, proc=None, name="pid", signals=None, group=False):
+		"""stop proc (a process.Process, by default the process tracked as name) by sending
+		signals (default STOP_SIGNALS) escalating within the deadline of the stop handler, to the
+		process group if group is True (escalating until the whole group exited). Waits for the
+		exit using a pidfd where supported. Each step is timed as phase stop_<signal>. Raises
+		OCFErrGeneric if the process survives"""
+		from . import process
+		if proc is None:
+			proc = self.tracked_process(name)
+			if proc is None:
+				return
+		if signals is None:
+			signals = self.STOP_SIGNALS
+		budget = self.deadline
+		if budget is None:
+			budget = deadline.Deadline(self.get_timeout("stop"), self.DEADLINE_MARGIN)
+		for sig, fraction in signals:
+			with self.timed("stop_%s" % str(process.SIGNAL_NAMES.get(sig, sig)).lower()):
+				if not proc.signal(sig, group) or proc.wait(budget.remaining() * fraction, group=group):
+					break
+		else:
+			raise error.OCFErrGeneric("Process %i survived %s" % (proc.pid, ", ".join(process.SIGNAL_NAMES.get(sig, str(sig)) for sig, _ in signals)))
+		proc.close()
+		if self._state is not None:
+			self.state.delete(name)
+
+	@staticmethod
+	def worker_result(result):
+		"""output the result of a worker call and exit with its exit code"""
+		sys.stdout.write(result["stdout"])
+		sys.stdout.flush()
+		sys.stderr.write(result["stderr"])
+		if result["exit"] != 0:
+			raise SystemExit(result["exit"])
 
 	def usage(self):
 		"""Output usage to stdout listing all implemented handlers"""
@@ -137,55 +612,55 @@ class ResourceAgent(object):  # pylint: disable=R0902
 		print ("usage: %s {%s}" % (self.name, "|".join(calls).replace("validate_all", "validate-all")))
 
 	def get_implemented_handlers(self):
-		"""get all implemented handlers by searching handle_* functions in class"""
-		valid_handlers = {}
-		for handler in self.__OCF_VALID_HANDLERS:
-			if hasattr(self, "handle_%s" % handler):
-				handler_dict = {}
-				func = getattr(self, "handle_%s" % handler)
-				assert func.func_code.co_argcount > 1
-				assert func.func_code.co_varnames[0] == "self"
-				# get all handler arguments
-				i = 0
-				for var in func.func_code.co_varnames[:func.func_code.co_argcount]:
-					if var == "self":
-						continue
-					handler_dict[var] = func.func_defaults[i]
-					i += 1
-				# Expect timeout to be always implemented. This is a should in
-				# http://www.linux-ha.org/doc/dev-guides/_metadata.html
-				# but we will force this here to be present
-				if "timeout" not in handler_dict.keys():
-					raise RuntimeError("Handler %s does not have parameter timeout" % handler)
-				valid_handlers[handler] = handler_dict
-		return valid_handlers
+		"""get all implemented handlers (computed at class creation)"""
+		return self._handlers
 
 	def get_parameter_spec(self, check_env=True):
 		"""Get parameter specification from OCFParameter_* classes"""
-		env = os.environ
-		params = []
-		for entry in dir(self):
-			if entry.startswith("OCFParameter_"):
-				name = entry[len("OCFParameter_"):]
-				parameter_class = getattr(self, entry)
+		# Do not check environment, if check_env is False (usage and meta-data calls)
+		if check_env:
+			env = os.environ
+			for name in self._required_parameters:
+				env_name = OCF_RESKEY_PREFIX + name
+				if env_name not in env:
+					raise RuntimeError("os.environ is missing required parameter %s" % (env_name,))
+		return [parameter_class() for parameter_class in self._parameter_classes]
 
-				param_instance = parameter_class()
-				if param_instance.type_def not in [types.IntType, types.StringType, types.BooleanType]:
-					raise RuntimeError("type_def property of parameter class is not of known types")
+	@property
+	def rsctmp(self):
+		"""directory for temporary resource agent state (HA_RSCTMP)"""
+		return self.HA_ENVIRON.get("HA_RSCTMP") or HA_RSCTMP_DEFAULT
 
-				# Do not check environment, if check_env is False (usage and meta-data calls)
-				if check_env:
-					env_name = "OCF_RESKEY_" + name
-					if param_instance.required and env_name not in env:
-						raise RuntimeError("os.environ is missing required parameter %s" % (env_name,))
-				# Extract descriptions
-				if param_instance.shortdesc is None:
-					raise RuntimeError("Parameter %s short description is not present" % name)
-				if param_instance.longdesc is None:
-					raise RuntimeError("Parameter %s long description is not present" % name)
+	@property
+	def instance_key(self):
+		"""resource instance name including clone suffix, the agent name if not known"""
+		return self.OCF_ENVIRON.get("OCF_RESOURCE_INSTANCE") or self.name
+
+	@property
+	def state(self):
+		"""persistent state store of this resource instance (see ocfagent.state)"""
+		if self._state is None:
+			from . import state
+			self._state = state.StateStore(os.path.join(self.rsctmp, "ocfagent"), self.instance_key)
+		return self._state
+
+	@property
+	def promotion(self):
+		"""coalescing promotion score updater of this instance (see ocfagent.promotion). The
+		command is bounded by the deadline of the current handler"""
+		if self._promotion is None:
+			from . import promotion
+			self._promotion = promotion.PromotionScore(self.state, self.PROMOTION_COMMAND, self.PROMOTION_MIN_INTERVAL, self.PROMOTION_REFRESH)
+		self._promotion.deadline = self.deadline
+		return self._promotion
 
-				params.append(param_instance)
-		return params
+	@property
+	def notify(self):
+		"""notification variables of a notify action (see ocfagent.notify), parsed on access"""
+		if self._notify is None:
+			from . import notify
+			self._notify = notify.NotifyContext(self.OCF_ENVIRON)
+		return self._notify
 
 	@property
 	def is_clone(self):
@@ -197,11 +672,39 @@ class ResourceAgent(object):  # pylint: disable=R0902
 		"""Return the clone id for cloned resources"""
 		return self.res_clone_id
 
+	def _meta_int(self, name):
+		"""integer value of OCF_RESKEY_CRM_meta_<name>. None if not set or invalid"""
+		try:
+			return int(self.OCF_ENVIRON["OCF_RESKEY_CRM_meta_%s" % name])
+		except (KeyError, ValueError):
+			return None
+
+	@property
+	def clone_max(self):
+		"""Return the maximum number of clone instances (None if not a clone)"""
+		return self._meta_int("clone_max")
+
+	@property
+	def clone_node_max(self):
+		"""Return the maximum number of clone instances per node (None if not a clone)"""
+		return self._meta_int("clone_node_max")
+
+	def shard(self, items, key=str):
+		"""return the items this clone instance is responsible for, assigned to clone ids by
+		consistent hashing of key(item) (see ocfagent.sharding). All items if this is not a clone,
+		none if the clone id is beyond clone_max (an instance left over after clone_max was lowered)"""
+		if not self.is_clone or self.clone_max is None:
+			return list(items)
+		if not 0 <= self.clone_id < self.clone_max:
+			return []
+		from . import sharding
+		return sharding.shard(items, self.clone_id, self.clone_max, key)
+
 	def parse_environment(self):
 		"""Parse environment for HA and OCF environment variables"""
 		env = os.environ
 		# on a meta-data or usage call return
-		if self.get_action() in ["meta-data", "usage"]:
+		if self.action in ["meta-data", "usage"]:
 			return
 		for key in env.keys():
 			if key.startswith("HA_"):
@@ -236,61 +739,87 @@ class ResourceAgent(object):  # pylint: disable=R0902
 			if "OCF_RESOURCE_PROVIDER" in self.OCF_ENVIRON:
 				self.res_provider = self.OCF_ENVIRON["OCF_RESOURCE_PROVIDER"]
 
+	@classmethod
+	def get_parameter_schema(cls):
+		"""get the parse function compiled from the parameter classes (compiled on first use)"""
+		if cls._parameter_schema is None:
+			cls._parameter_schema = staticmethod(parameter.compile_schema(cls._parameter_classes))
+		return cls._parameter_schema
+
 	def parse_parameters(self):
-		"""Parse parameters (given with OCF_RESKEY_ prefix)"""
+		"""Parse and validate parameters (given with OCF_RESKEY_ prefix)"""
 		assert len(self.OCF_ENVIRON) > 0
-		for param_cls in self.parameter_spec:
-			cls_name = param_cls.name
-			env_name = "%s%s" % (OCF_RESKEY_PREFIX, cls_name)
-			if param_cls.type_def == types.IntType:  # nopep8
-				param_cls.value = int(self.OCF_ENVIRON[env_name])
-			elif param_cls.type_def == types.StringType:  # nopep8
-				param_cls.value = str(self.OCF_ENVIRON[env_name])
-			elif param_cls.type_def == types.BooleanType:  # nopep8
-				param_cls.value = self.OCF_ENVIRON[env_name]
+		values = self.get_parameter_schema()(self.OCF_ENVIRON, check_paths=self.action in self.PARAMETER_PATH_CHECK_ACTIONS)
+		for param, value in zip(self.parameter_spec, values):
+			if value is not None:
+				param.value = value
 
 	def get_parameter(self, name):
 		"""get a specific parameter"""
-		found_cls = None
-		for param_cls in self.parameter_spec:
-			if name == param_cls.name:
-				found_cls = param_cls
+		index = self._parameter_index.get(name)
+		assert index is not None
+		return self.parameter_spec[index].value
 
-		assert found_cls is not None
-		return found_cls.value
+	def parameter_values(self):
+		"""get all parameter values as dictionary"""
+		return dict((p.name, p.value) for p in self.parameter_spec)
 
-	def meta_data_xml(self):
-		"""Generate meta-data in XML format"""
-		e_resourceagent = etree.Element("resource-agent", {"name": self.name, "version": self.VERSION})  # pylint: disable=E1101
-		etree.SubElement(e_resourceagent, "version").text = "1.0"
-		etree.SubElement(e_resourceagent, "longdesc", {"lang": "en"}).text = self.LONGDESC  # pylint: disable=E1101
-		etree.SubElement(e_resourceagent, "shortdesc", {"lang": "en"}).text = self.SHORTDESC  # pylint: disable=E1101
-		e_parameters = etree.SubElement(e_resourceagent, "parameters")
+	@property
+	def parameter_diff(self):
+		"""parameters changed since the last successful start, reload or migrate_from as dictionary of
+		name to (old, new) value. Old values are None if they are not known"""
+		previous = self.state.get_dict("parameters", {})
+		return dict((name, (previous.get(name), value)) for name, value in self.parameter_values().items() if previous.get(name) != value)
+
+	def meta_data_tree(self):
+		"""Generate meta-data as ocfagent.metadata element tree"""
+		e_resourceagent = metadata.Element("resource-agent", {"name": self.name, "version": self.VERSION})  # pylint: disable=E1101
+		metadata.SubElement(e_resourceagent, "version", text="1.0")
+		metadata.SubElement(e_resourceagent, "longdesc", {"lang": "en"}, self.LONGDESC)  # pylint: disable=E1101
+		metadata.SubElement(e_resourceagent, "shortdesc", {"lang": "en"}, self.SHORTDESC)  # pylint: disable=E1101
+		e_parameters = metadata.SubElement(e_resourceagent, "parameters")
 		for p in self.parameter_spec:
-			e_parameter = etree.Element("parameter", {"name": p.name, "unique": str(int(p.unique)), "required": str(int(p.required))})
-			etree.SubElement(e_parameter, "longdesc", {"lang": "en"}).text = p.longdesc
-			etree.SubElement(e_parameter, "shortdesc", {"lang": "en"}).text = p.shortdesc
+			e_parameter = metadata.Element("parameter", {"name": p.name, "unique": str(int(p.unique and not p.reloadable)), "required": str(int(p.required))})
+			if p.reloadable:
+				e_parameter.attrib["reloadable"] = "1"
+			constraints = p.describe_constraints()
+			metadata.SubElement(e_parameter, "longdesc", {"lang": "en"}, p.longdesc if constraints is None else "%s\n%s" % (p.longdesc, constraints))
+			metadata.SubElement(e_parameter, "shortdesc", {"lang": "en"}, p.shortdesc)
+			content_data = {"type": p.type_name}
 			if p.default is not None:
-				content_data = {"type": p.type_name, "default": str(p.default)}
-			else:
-				content_data = {"type": p.type_name}
-			etree.SubElement(e_parameter, "content", content_data)
+				content_data["default"] = p.format_value(p.default)
+			metadata.SubElement(e_parameter, "content", content_data)
 			e_parameters.append(e_parameter)
 
-		e_actions = etree.SubElement(e_resourceagent, "actions")
+		e_actions = metadata.SubElement(e_resourceagent, "actions")
 		for handler in self.handlers.keys():
 			# Special case, validate_all should only be used internally
 			h = {"name": handler.replace("validate_all", "validate-all")}
 			for key in self.handlers[handler]:
 				h[key] = str(self.handlers[handler][key])
 
-			e_actions.append(etree.Element("action", h))
+			e_actions.append(metadata.Element("action", h))
+			# Additional monitor depths for OCF_CHECK_LEVEL
+			if handler == "monitor":
+				for depth in sorted(self._monitor_depths):
+					h = {"name": "monitor", "depth": str(depth)}
+					for key in self._monitor_depths[depth]:
+						h[key] = str(self._monitor_depths[depth][key])
+					e_actions.append(metadata.Element("action", h))
 
 		return e_resourceagent
 
+	def meta_data_xml(self):
+		"""Generate meta-data in XML format as lxml element (imports lxml on demand)"""
+		return metadata.to_lxml(self.meta_data_tree())
+
+	def meta_data_string(self):
+		"""Generate meta data as string including doctype"""
+		if self._manifest is not None:
+			return self._manifest["meta_data"]
+		return metadata.tostring(self.meta_data_tree())
+
 	def meta_data(self):
 		"""Output meta data to stdout including doctype"""
-		xml_data = self.meta_data_xml()
-		xml_data.addprevious(etree.PI('xm'))
-		print (etree.tostring(xml_data, pretty_print=True, xml_declaration=True, encoding='utf-8', doctype="""<!DOCTYPE resource-agent SYSTEM "ra-api-1.dtd">"""))
+		print (self.meta_data_string())
 		sys.stdout.write("\n")
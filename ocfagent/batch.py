@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Batch execution of one action for many resource instances in one process.
+
+Instance environments are read as JSON (one object per line or a list of
+objects) mapping environment variable names (OCF_RESOURCE_INSTANCE,
+OCF_RESKEY_*, ...) to values. Each instance runs in a forked child with the
+agent class already loaded, so it goes through the usual parse_environment,
+parse_parameters and handler deadline. Results are written as JSON lines, an
+instance that can not be started gets a failed result line of its own.
+"""
+
+import json
+import marshal
+import os
+import signal
+import sys
+import tempfile
+import time
+
+from . import deadline
+from . import error
+from . import worker
+
+_POLL_INTERVAL = 0.005
+"""seconds between checks for finished children"""
+
+KILL_GRACE = 1.0
+"""seconds a child may run past its timeout before it is killed"""
+
+
+def read_instances(stream):
+	"""read instance environments from stream (JSON lines or a JSON list)"""
+	data = stream.read()
+	stripped = data.strip()
+	if stripped.startswith("["):
+		instances = json.loads(stripped)
+	else:
+		instances = [json.loads(line) for line in data.splitlines() if line.strip()]
+	for instance in instances:
+		if not isinstance(instance, dict):
+			raise error.OCFErrArgs("Batch instance environment must be a JSON object, got %r" % (instance,))
+	return instances
+
+
+def base_environment(environ):
+	"""environment shared by all instances: the batch environment without instance specific variables"""
+	return dict((key, value) for key, value in environ.items() if not key.startswith("OCF_RESKEY_") and key != "OCF_RESOURCE_INSTANCE")
+
+
+def _encode(value):
+	"""environment string of a JSON key or value (unicode is encoded as utf-8)"""
+	if isinstance(value, unicode):
+		return value.encode("utf-8")
+	return str(value)
+
+
+def instance_environment(base, instance):
+	"""environment of instance (a JSON object) on top of base"""
+	environ = dict(base)
+	environ.update((_encode(key), _encode(value)) for key, value in instance.items())
+	return environ
+
+
+def _spawn(agent_cls, argv, environ, testmode):
+	"""fork a child running the agent. Returns pid and the file receiving the result"""
+	result_file = tempfile.TemporaryFile()
+	sys.stdout.flush()
+	sys.stderr.flush()
+	try:
+		pid = os.fork()
+	except OSError:
+		result_file.close()
+		raise
+	if pid == 0:
+		code = 1
+		try:
+			result = worker.run_agent(agent_cls, argv, environ, testmode)
+			result_file.write(marshal.dumps(result))
+			result_file.flush()
+			code = 0
+		finally:
+			os._exit(code)  # pylint: disable=W0212
+	return pid, result_file
+
+
+def _decode(data):
+	"""decode captured output for JSON"""
+	return data.decode("utf-8", "replace")
+
+
+def _kill(running):
+	"""kill and reap all running children"""
+	for pid, (_, _, result_file, _, _) in running.items():
+		try:
+			os.kill(pid, signal.SIGKILL)
+			os.waitpid(pid, 0)
+		except OSError:
+			pass
+		result_file.close()
+	running.clear()
+
+
+def _write_result(results, output, index, instance_name, result, start):
+	"""store the result of instance index and write it as JSON line to output"""
+	results[index] = {
+		"index": index,
+		"instance": instance_name,
+		"exit": result["exit"],
+		"stdout": _decode(result["stdout"]),
+		"stderr": _decode(result["stderr"]),
+		"duration": round(time.time() - start, 6),
+	}
+	output.write(json.dumps(results[index], sort_keys=True) + "\n")
+	output.flush()
+
+
+def _run_pending(agent, argv, base, default_timeout, pending, running, results, output, concurrency):  # pylint: disable=R0913
+	"""start pending instances and collect their results until all are done"""
+	while pending or running:
+		while pending and len(running) < concurrency:
+			index, instance = pending.pop(0)
+			start = time.time()
+			try:
+				environ = instance_environment(base, instance)
+				timeout = default_timeout
+				if environ.get("OCF_RESKEY_CRM_meta_timeout"):
+					timeout = int(environ["OCF_RESKEY_CRM_meta_timeout"]) / 1000.0
+				pid, result_file = _spawn(agent.__class__, argv, environ, agent.testmode)
+			except (ValueError, OSError) as e:
+				_write_result(results, output, index, instance.get("OCF_RESOURCE_INSTANCE"), {"exit": error.OCF_ERR_GENERIC, "stdout": "", "stderr": "Starting instance failed: %s" % e}, start)
+				continue
+			running[pid] = (index, instance.get("OCF_RESOURCE_INSTANCE"), result_file, start, start + timeout + KILL_GRACE)
+		if not running:
+			continue
+
+		pid, status = os.waitpid(-1, os.WNOHANG)
+		if pid == 0:
+			now = time.time()
+			for child_pid, (_, _, _, _, kill_at) in running.items():
+				if now > kill_at:
+					try:
+						os.kill(child_pid, signal.SIGKILL)
+					except OSError:
+						pass
+			time.sleep(_POLL_INTERVAL)
+			continue
+		if pid not in running:
+			continue
+
+		index, instance_name, result_file, start, kill_at = running.pop(pid)
+		result = None
+		if os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+			result_file.seek(0)
+			try:
+				result = marshal.loads(result_file.read())
+			except (EOFError, ValueError, TypeError):
+				result = None
+		result_file.close()
+		if result is None:
+			if os.WIFSIGNALED(status) and time.time() > kill_at:
+				message = "killed after timeout"
+			else:
+				message = "child terminated abnormally (status %i)" % status
+			result = {"exit": error.OCF_ERR_GENERIC, "stdout": "", "stderr": message}
+		_write_result(results, output, index, instance_name, result, start)
+
+
+def run(agent, action, instances, output, concurrency=16):
+	"""run action of agent (a ResourceAgent instance) for all instance environments
+	with at most concurrency children. Writes one JSON line per finished instance to output
+	and returns the list of results in input order"""
+	argv = [sys.argv[0], action]
+	base = base_environment(os.environ)
+	# hard kill bound if the instance does not set OCF_RESKEY_CRM_meta_timeout
+	timeouts = [agent.handlers[action]["timeout"]]
+	if action == "monitor":
+		timeouts.extend(spec["timeout"] for spec in agent._monitor_depths.values())  # pylint: disable=W0212
+	default_timeout = max(deadline.parse_timeout(timeout) for timeout in timeouts)
+
+	results = [None] * len(instances)
+	pending = list(enumerate(instances))
+	running = {}
+	try:
+		_run_pending(agent, argv, base, default_timeout, pending, running, results, output, concurrency)
+	except BaseException:
+		# interrupted or output failed: do not leave children behind
+		_kill(running)
+		raise
+	return results
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Monitor result cache.
+
+Stores the outcome (exit code and message) of monitor calls per resource
+instance and monitor depth in HA_RSCTMP, so that repeated monitors within the
+freshness window are answered without running the check again.
+"""
+
+import errno
+import marshal
+import os
+import time
+
+
+def instance_filename(instance):
+	"""make a resource instance name (including clone suffix) safe for use as file name"""
+	return instance.replace("/", "_")
+
+
+class MonitorCache(object):
+	"""cache of monitor outcomes of one resource instance (key) in directory, fresh for ttl seconds"""
+	def __init__(self, directory, key, ttl):
+		self.directory = directory
+		self.key = instance_filename(key)
+		self.ttl = ttl
+
+	def path(self, depth):
+		"""path of the cache file for monitor depth"""
+		return os.path.join(self.directory, "%s.monitor.%i" % (self.key, depth))
+
+	def get(self, depth):
+		"""return (exit code, message) of a fresh cached outcome for depth or None"""
+		try:
+			with open(self.path(depth), "rb") as f:
+				entry = marshal.load(f)
+		except (IOError, OSError, EOFError, ValueError, TypeError):
+			return None
+		age = time.time() - entry["time"]
+		if age < 0 or age > self.ttl:
+			return None
+		return entry["code"], entry["message"]
+
+	def put(self, depth, code, message):
+		"""store outcome of monitor at depth"""
+		if message is not None and not isinstance(message, basestring):
+			message = str(message)
+		try:
+			os.makedirs(self.directory)
+		except OSError as e:
+			if e.errno != errno.EEXIST:
+				raise
+		path = self.path(depth)
+		tmp_path = "%s.%d.tmp" % (path, os.getpid())
+		with open(tmp_path, "wb") as f:
+			marshal.dump({"time": time.time(), "code": code, "message": message}, f)
+		os.rename(tmp_path, path)
+
+	def invalidate(self):
+		"""remove all cached outcomes of this resource instance"""
+		prefix = "%s.monitor." % self.key
+		try:
+			entries = os.listdir(self.directory)
+		except OSError:
+			return
+		for entry in entries:
+			if entry.startswith(prefix):
+				try:
+					os.unlink(os.path.join(self.directory, entry))
+				except OSError as e:
+					if e.errno != errno.ENOENT:
+						raise
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Deadline-aware subprocess runner.
+
+Commands run in their own process group with stdout and stderr streamed into
+bounded ring buffers (keeping the last max_output bytes), so chatty commands
+can not exhaust memory. When the deadline (ocfagent.deadline.Deadline or a
+timeout in seconds) passes, the process group gets SIGTERM and, after a grace
+period, SIGKILL and is reaped. With a Deadline the grace period is reserved
+before its soft deadline, so output of SIGTERM handlers is still collected.
+Several commands can run concurrently in one select loop. Failures are mapped
+to OCFErr* exceptions.
+"""
+
+import errno
+import fcntl
+import os
+import select
+import signal
+import subprocess
+import time
+
+from . import error
+
+MAX_OUTPUT = 64 * 1024
+"""default number of bytes kept of stdout and stderr each"""
+
+KILL_GRACE = 1.0
+"""default seconds between SIGTERM and SIGKILL"""
+
+_READ_SIZE = 65536
+_POLL_INTERVAL = 0.05
+"""maximum select wait, bounds the delay noticing an exited command whose pipes are held open by its children"""
+
+
+class RingBuffer(object):
+	"""byte buffer keeping the last size bytes"""
+	def __init__(self, size):
+		self.size = size
+		self.data = bytearray()
+		self.truncated = False
+
+	def append(self, chunk):
+		"""append chunk, dropping the oldest bytes beyond size"""
+		self.data.extend(chunk)
+		if len(self.data) > self.size:
+			del self.data[:len(self.data) - self.size]
+			self.truncated = True
+
+	def __str__(self):
+		return str(self.data)
+
+
+class CommandResult(object):
+	"""outcome of a command"""
+	def __init__(self, args, returncode, stdout, stderr, duration, timed_out):
+		self.args = args
+		self.returncode = returncode
+		self.stdout = str(stdout)
+		self.stderr = str(stderr)
+		self.stdout_truncated = stdout.truncated
+		self.stderr_truncated = stderr.truncated
+		self.duration = duration
+		self.timed_out = timed_out
+
+	def __repr__(self):
+		return "CommandResult(%r, returncode=%r, timed_out=%r)" % (self.args, self.returncode, self.timed_out)
+
+	def check(self):
+		"""raise OCFErrGeneric if the command timed out or exited non-zero. Returns self otherwise"""
+		name = " ".join(self.args)
+		if self.timed_out:
+			raise error.OCFErrGeneric("Command %s timed out after %.1fs" % (name, self.duration))
+		if self.returncode != 0:
+			lines = (self.stderr or self.stdout).strip().splitlines()
+			if self.returncode < 0:
+				status = "was killed by signal %i" % -self.returncode
+			else:
+				status = "exited with %i" % self.returncode
+			raise error.OCFErrGeneric("Command %s %s%s" % (name, status, (": %s" % lines[-1]) if lines else ""))
+		return self
+
+
+def _close_inherited_fds():
+	"""close file descriptors above stderr not marked close-on-exec (listing /proc/self/fd
+	instead of closing every possible descriptor like close_fds)"""
+	try:
+		fds = [int(fd) for fd in os.listdir("/proc/self/fd")]
+	except OSError:
+		return
+	for fd in fds:
+		if fd <= 2:
+			continue
+		try:
+			if not fcntl.fcntl(fd, fcntl.F_GETFD) & fcntl.FD_CLOEXEC:
+				os.close(fd)
+		except (IOError, OSError):
+			pass
+
+
+def _preexec():
+	"""run in the child: own session and process group, no inherited descriptors"""
+	os.setsid()
+	_close_inherited_fds()
+
+
+class _Command(object):
+	"""a running command of run_many"""
+	def __init__(self, args, env, cwd, max_output):
+		self.args = list(args)
+		self.stdout = RingBuffer(max_output)
+		self.stderr = RingBuffer(max_output)
+		self.start = time.time()
+		self.timed_out = False
+		with open(os.devnull, "r") as devnull:
+			try:
+				self.proc = subprocess.Popen(self.args, stdin=devnull, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=cwd, preexec_fn=_preexec)
+			except OSError as e:
+				if e.errno == errno.ENOENT:
+					raise error.OCFErrInstalled("Command %s not found" % self.args[0])
+				if e.errno == errno.EACCES:
+					raise error.OCFErrPerm("Command %s is not executable: %s" % (self.args[0], e.strerror))
+				raise error.OCFErrGeneric("Running %s failed: %s" % (self.args[0], e))
+		self.buffers = {self.proc.stdout.fileno(): self.stdout, self.proc.stderr.fileno(): self.stderr}
+		self.files = {self.proc.stdout.fileno(): self.proc.stdout, self.proc.stderr.fileno(): self.proc.stderr}
+		self.end = None
+
+	def read(self, fd):
+		"""read available data of fd. Returns False on end of file"""
+		try:
+			chunk = os.read(fd, _READ_SIZE)
+		except OSError as e:
+			if e.errno in [errno.EINTR, errno.EAGAIN]:
+				return True
+			chunk = ""
+		if not chunk:
+			self.close(fd)
+			return False
+		self.buffers[fd].append(chunk)
+		return True
+
+	def close(self, fd):
+		"""stop reading fd"""
+		if fd in self.buffers:
+			del self.buffers[fd]
+			self.files.pop(fd).close()
+
+	def drain(self):
+		"""read data already available on the descriptors without blocking"""
+		if not self.buffers:
+			return
+		try:
+			readable = select.select(list(self.buffers), [], [], 0)[0]
+		except select.error as e:
+			if e.args[0] != errno.EINTR:
+				raise
+			return
+		for fd in readable:
+			self.read(fd)
+
+	def close_all(self):
+		"""stop reading all descriptors"""
+		for fd in list(self.buffers):
+			self.close(fd)
+
+	def poll(self):
+		"""check if the process exited, remembering the end time"""
+		if self.end is None and self.proc.poll() is not None:
+			self.end = time.time()
+		return self.end is not None
+
+	def signal(self, sig):
+		"""send sig to the process group"""
+		try:
+			os.killpg(self.proc.pid, sig)
+		except OSError as e:
+			if e.errno != errno.ESRCH:
+				raise
+
+	def result(self):
+		"""build the CommandResult"""
+		return CommandResult(self.args, self.proc.returncode, self.stdout, self.stderr, (self.end or time.time()) - self.start, self.timed_out)
+
+
+def _remaining(deadline, expires, grace=0):
+	"""seconds left until the earlier of deadline (less grace seconds) and expires. None if unlimited"""
+	remaining = None
+	if deadline is not None:
+		remaining = deadline.remaining() - grace
+	if expires is not None:
+		left = expires - time.time()
+		remaining = left if remaining is None else min(remaining, left)
+	return remaining
+
+
+def _terminate(commands, grace):
+	"""SIGTERM the process groups of commands, SIGKILL them after grace seconds and reap them.
+	Output written until then (e.g. by SIGTERM handlers) is kept"""
+	for command in commands:
+		command.signal(signal.SIGTERM)
+	expires = time.time() + grace
+	while not all(command.poll() for command in commands) and time.time() < expires:
+		for command in commands:
+			command.drain()
+		time.sleep(max(0, min(0.01, expires - time.time())))
+	for command in commands:
+		if not command.poll():
+			command.signal(signal.SIGKILL)
+		command.proc.wait()
+		command.poll()
+		command.drain()
+		command.close_all()
+
+
+def run_many(commands, deadline=None, timeout=None, env=None, cwd=None, max_output=MAX_OUTPUT, kill_grace=KILL_GRACE, check=True):
+	"""run commands (lists of arguments) concurrently until all exited or the deadline
+	(ocfagent.deadline.Deadline, kill_grace seconds before it) or timeout (seconds) passed.
+	Returns a list of CommandResult.
+	Raises OCFErrInstalled/OCFErrPerm if a command can not be started and, with check,
+	OCFErrGeneric for the first command timing out or exiting non-zero"""
+	expires = time.time() + timeout if timeout is not None else None
+	running = []
+	idle = 0.001
+	try:
+		for args in commands:
+			running.append(_Command(args, env, cwd, max_output))
+		while True:
+			done = [command.poll() for command in running]
+			# stop reading from exited commands once no data is immediately available,
+			# children left in their process group may hold the pipes open
+			fds = {}
+			for command in running:
+				for fd in command.buffers:
+					fds[fd] = command
+			if all(done) and not fds:
+				break
+			# stop waiting kill_grace before the deadline, so SIGTERM handlers can run and
+			# the escalation to SIGKILL ends before the soft deadline interrupts it
+			remaining = _remaining(deadline, expires, kill_grace + _POLL_INTERVAL)
+			if remaining is not None and remaining <= 0:
+				expired = [command for command, exited in zip(running, done) if not exited]
+				for command in expired:
+					command.timed_out = True
+				grace = kill_grace if deadline is None else min(kill_grace, max(0, deadline.remaining() - _POLL_INTERVAL))
+				_terminate(expired, grace)
+				for command in running:
+					command.drain()
+					command.close_all()
+				break
+			wait = _POLL_INTERVAL if remaining is None else min(remaining, _POLL_INTERVAL)
+			if any(done):
+				wait = min(wait, 0.01)
+			try:
+				readable = select.select(list(fds), [], [], wait)[0] if fds else []
+			except select.error as e:
+				if e.args[0] != errno.EINTR:
+					raise
+				continue
+			if not fds:
+				# output closed, wait for the exit with backoff
+				time.sleep(min(wait, idle))
+				idle = min(idle * 2, 0.1)
+			for fd in readable:
+				fds[fd].read(fd)
+			for command, exited in zip(running, done):
+				if exited and command.buffers and not any(fd in readable for fd in command.buffers):
+					command.close_all()
+	except BaseException:
+		# interrupted (e.g. DeadlineExceeded): do not leave children behind
+		_terminate([command for command in running if not command.poll()], 0)
+		for command in running:
+			command.close_all()
+		raise
+	results = [command.result() for command in running]
+	if check:
+		for result in results:
+			result.check()
+	return results
+
+
+def run(args, deadline=None, timeout=None, env=None, cwd=None, max_output=MAX_OUTPUT, kill_grace=KILL_GRACE, check=True):
+	"""run a single command (see run_many) and return its CommandResult"""
+	return run_many([args], deadline, timeout, env, cwd, max_output, kill_grace, check)[0]
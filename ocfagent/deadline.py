@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Deadline handling for handler calls.
+
+A Deadline holds the time budget of a handler call. enforce() interrupts the
+handler with DeadlineExceeded (via SIGALRM) when the soft deadline passes,
+which leaves time to report a proper exit code before lrmd kills the agent.
+"""
+
+import contextlib
+import signal
+import threading
+import time
+
+_UNITS = (("msec", 0.001), ("min", 60.0), ("sec", 1.0), ("ms", 0.001), ("hr", 3600.0), ("m", 60.0), ("h", 3600.0), ("s", 1.0))
+"""timeout unit suffixes, longest first"""
+
+
+class DeadlineExceeded(BaseException):
+	"""raised when the soft deadline of a handler has passed. Derived from BaseException,
+	so that handlers catching Exception do not swallow it"""
+
+
+def parse_timeout(value):
+	"""parse a timeout value as used in meta-data (e.g. 10, "20s", "500ms", "2min") into seconds"""
+	if isinstance(value, (int, long, float)):
+		return float(value)
+	value = str(value).strip().lower()
+	for suffix, factor in _UNITS:
+		if value.endswith(suffix):
+			return float(value[:-len(suffix)]) * factor
+	return float(value)
+
+
+class Deadline(object):
+	"""time budget of a handler call.
+	timeout is the full timeout in seconds, margin the fraction of it reserved
+	for a clean shutdown before the hard kill"""
+	def __init__(self, timeout, margin=0.1):
+		self.timeout = float(timeout)
+		self.soft_timeout = self.timeout * (1.0 - margin)
+		self.start = time.time()
+		self.expires = self.start + self.soft_timeout
+
+	def elapsed(self):
+		"""seconds since the deadline was started"""
+		return time.time() - self.start
+
+	def remaining(self):
+		"""seconds left until the soft deadline (never negative)"""
+		return max(0.0, self.expires - time.time())
+
+	@property
+	def expired(self):
+		"""True if the soft deadline has passed"""
+		return time.time() >= self.expires
+
+	def check(self):
+		"""raise DeadlineExceeded if the soft deadline has passed"""
+		if self.expired:
+			raise DeadlineExceeded("soft deadline of %.1fs exceeded" % self.soft_timeout)
+
+
+@contextlib.contextmanager
+def enforce(deadline):
+	"""raise DeadlineExceeded in the main thread when deadline passes.
+	Outside of the main thread signals can not be used and the deadline is only advisory."""
+	if not isinstance(threading.current_thread(), threading._MainThread):  # pylint: disable=W0212
+		yield deadline
+		return
+
+	def on_alarm(signum, frame):  # pylint: disable=W0613
+		"""signal handler for SIGALRM"""
+		raise DeadlineExceeded("soft deadline of %.1fs exceeded" % deadline.soft_timeout)
+
+	old_handler = signal.signal(signal.SIGALRM, on_alarm)
+	signal.setitimer(signal.ITIMER_REAL, max(deadline.remaining(), 0.001))
+	try:
+		yield deadline
+	finally:
+		signal.setitimer(signal.ITIMER_REAL, 0)
+		signal.signal(signal.SIGALRM, old_handler)
@@ -154,3 +154,26 @@ class OCFFailedMaster(ResourceAgentException):
 	"""
 	def __init__(self, message):
 		ResourceAgentException.__init__(self, OCF_FAILED_MASTER, message)
+
+
+EXCEPTION_CLASSES = {
+	OCF_SUCCESS: OCFSuccess,
+	OCF_ERR_GENERIC: OCFErrGeneric,
+	OCF_ERR_ARGS: OCFErrArgs,
+	OCF_ERR_UNIMPLEMENTED: OCFErrUnimplemented,
+	OCF_ERR_PERM: OCFErrPerm,
+	OCF_ERR_INSTALLED: OCFErrInstalled,
+	OCF_ERR_CONFIGURED: OCFErrConfigured,
+	OCF_NOT_RUNNING: OCFNotRunning,
+	OCF_RUNNING_MASTER: OCFRunningMaster,
+	OCF_FAILED_MASTER: OCFFailedMaster,
+}
+"""Resource agent exception classes by exit code"""
+
+
+def from_code(error_code, message):
+	"""create the resource agent exception for error_code"""
+	exception_class = EXCEPTION_CLASSES.get(error_code)
+	if exception_class is None:
+		return ResourceAgentException(error_code, message)
+	return exception_class(message)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Precomputed agent manifest.
+
+The manifest freezes handler specs, parameter specs and rendered meta-data
+of an agent class into a compact marshal file. It is only used while the
+agent source file (mtime and size) and the framework version are unchanged.
+"""
+
+import marshal
+import os
+import sys
+
+from . import __version__
+
+MANIFEST_VERSION = 2
+"""version of the manifest format"""
+
+
+def source_file(agent_cls):
+	"""get the source file of the module defining agent_cls"""
+	module = sys.modules.get(agent_cls.__module__)
+	path = getattr(module, "__file__", None)
+	if path is None:
+		return None
+	if path.endswith((".pyc", ".pyo")):
+		path = path[:-1]
+	return os.path.abspath(path)
+
+
+def source_stamp(agent_cls):
+	"""get the (mtime, size) stamp of the agent source file used for invalidation"""
+	path = source_file(agent_cls)
+	if path is None:
+		return None
+	try:
+		st = os.stat(path)
+	except OSError:
+		return None
+	return (st.st_mtime, st.st_size)
+
+
+def build(agent, path):
+	"""write the manifest for agent instance to path"""
+	data = {
+		"manifest_version": MANIFEST_VERSION,
+		"framework_version": __version__,
+		"agent": agent.__class__.__name__,
+		"source": source_stamp(agent.__class__),
+		"handlers": agent.handlers,
+		"monitor_depths": agent._monitor_depths,  # pylint: disable=W0212
+		"parameters": [p.name for p in agent.parameter_spec],
+		"required": [p.name for p in agent.parameter_spec if p.required],
+		"meta_data": agent.meta_data_string(),
+	}
+	tmp_path = "%s.%d.tmp" % (path, os.getpid())
+	with open(tmp_path, "wb") as f:
+		marshal.dump(data, f)
+	os.rename(tmp_path, path)
+
+
+def load(agent_cls, path):
+	"""load the manifest for agent_cls from path. Returns None if it is missing or outdated"""
+	try:
+		with open(path, "rb") as f:
+			data = marshal.load(f)
+	except (IOError, OSError, EOFError, ValueError, TypeError):
+		return None
+	if not isinstance(data, dict) or data.get("manifest_version") != MANIFEST_VERSION:
+		return None
+	if data.get("framework_version") != __version__ or data.get("agent") != agent_cls.__name__:
+		return None
+	stamp = source_stamp(agent_cls)
+	if stamp is None or tuple(data.get("source") or ()) != stamp:
+		return None
+	return data
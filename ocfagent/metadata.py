@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Minimal element tree and streaming serializer for resource agent meta-data.
+
+Serialization uses the standard library only and produces the same bytes as
+lxml.etree.tostring with pretty_print, xml_declaration and utf-8 encoding.
+lxml is only imported on demand by to_lxml.
+"""
+
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>"
+DOCTYPE = """<!DOCTYPE resource-agent SYSTEM "ra-api-1.dtd">"""
+
+_TEXT_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ("\r", "&#13;"))
+_ATTRIBUTE_ESCAPES = _TEXT_ESCAPES + (("\"", "&quot;"), ("\n", "&#10;"), ("\t", "&#9;"))
+
+
+class Element(object):
+	"""meta-data XML element with attributes, text and child elements"""
+	__slots__ = ("tag", "attrib", "text", "children")
+
+	def __init__(self, tag, attrib=None, text=None):
+		self.tag = tag
+		self.attrib = attrib if attrib is not None else {}
+		self.text = text
+		self.children = []
+
+	def append(self, child):
+		"""append a child element"""
+		self.children.append(child)
+
+
+def SubElement(parent, tag, attrib=None, text=None):  # pylint: disable=C0103
+	"""create an element and append it to parent"""
+	child = Element(tag, attrib, text)
+	parent.append(child)
+	return child
+
+
+def _encode(value):
+	"""encode unicode values as utf-8"""
+	if isinstance(value, unicode):
+		return value.encode("utf-8")
+	return value
+
+
+def _escape(value, escapes):
+	"""escape value for use in XML"""
+	value = _encode(value)
+	for char, replacement in escapes:
+		if char in value:
+			value = value.replace(char, replacement)
+	return value
+
+
+def _write(element, out, indent):
+	"""append pretty printed element to list out"""
+	out.append(indent)
+	out.append("<")
+	out.append(element.tag)
+	for key, value in sorted(element.attrib.items()):
+		out.append(" %s=\"%s\"" % (key, _escape(value, _ATTRIBUTE_ESCAPES)))
+	if element.children:
+		out.append(">\n")
+		for child in element.children:
+			_write(child, out, indent + "  ")
+		out.append("%s</%s>\n" % (indent, element.tag))
+	elif element.text is not None:
+		out.append(">%s</%s>\n" % (_escape(element.text, _TEXT_ESCAPES), element.tag))
+	else:
+		out.append("/>\n")
+
+
+def tostring(root):
+	"""serialize root element including XML declaration and DOCTYPE"""
+	out = [XML_DECLARATION, "\n", DOCTYPE, "\n"]
+	_write(root, out, "")
+	return "".join(out)
+
+
+def to_lxml(element):
+	"""convert element to an lxml.etree element"""
+	from lxml import etree
+
+	def convert(elem):
+		"""convert elem and its children recursively"""
+		e = etree.Element(elem.tag, elem.attrib)
+		if elem.text is not None:
+			e.text = elem.text
+		for child in elem.children:
+			e.append(convert(child))
+		return e
+
+	return convert(element)
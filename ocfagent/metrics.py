@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Per-action timing metrics in Prometheus textfile format.
+
+Every invocation appends one record (phase timings and exit code) to a spool
+file with a single O_APPEND write under a shared lock. At most every
+FLUSH_INTERVAL seconds (or when the spool exceeds FLUSH_BYTES), one invocation
+takes the exclusive flush lock, folds the spool into the aggregated state and
+rewrites ocfagent_<agent>.prom for the node_exporter textfile collector.
+"""
+
+import errno
+import fcntl
+import json
+import os
+import time
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+"""histogram bucket upper bounds in seconds"""
+
+FLUSH_INTERVAL = 60.0
+"""seconds between aggregations of the spool into the textfile"""
+
+FLUSH_BYTES = 256 * 1024
+"""spool size triggering an aggregation before FLUSH_INTERVAL"""
+
+
+def _paths(directory, agent):
+	"""spool, lock, state and textfile paths for agent"""
+	base = os.path.join(directory, ".ocfagent_%s" % agent)
+	return base + ".spool", base + ".lock", base + ".state", os.path.join(directory, "ocfagent_%s.prom" % agent)
+
+
+def _append(path, line):
+	"""append line to spool file. The shared lock only excludes a concurrent flush of the same file"""
+	while True:
+		fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+		try:
+			fcntl.flock(fd, fcntl.LOCK_SH)
+			# the file was taken over by a flush meanwhile, retry with a new spool
+			if os.fstat(fd).st_nlink == 0:
+				continue
+			os.write(fd, line)
+			return
+		finally:
+			os.close(fd)
+
+
+def _write_atomic(path, data):
+	"""write data to path by renaming a temporary file"""
+	tmp_path = "%s.%d.tmp" % (path, os.getpid())
+	with open(tmp_path, "w") as f:
+		f.write(data)
+	os.rename(tmp_path, path)
+
+
+def _needs_flush(spool, textfile):
+	"""check if the spool should be aggregated now"""
+	try:
+		if os.stat(spool).st_size >= FLUSH_BYTES:
+			return True
+	except OSError:
+		return False
+	try:
+		return time.time() - os.stat(textfile).st_mtime >= FLUSH_INTERVAL
+	except OSError:
+		return True
+
+
+def _load_state(path):
+	"""load aggregated state"""
+	try:
+		with open(path) as f:
+			return json.load(f)
+	except (IOError, ValueError):
+		return {"histograms": {}, "exits": {}}
+
+
+def _merge(state, record):
+	"""merge a spool record into state"""
+	labels = [record["agent"], record["action"], record["instance"]]
+	for phase, value in record["timings"].items():
+		key = "\t".join(labels + [phase])
+		histogram = state["histograms"].setdefault(key, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+		for i, bound in enumerate(BUCKETS):
+			if value <= bound:
+				histogram["buckets"][i] += 1
+		histogram["sum"] += value
+		histogram["count"] += 1
+	key = "\t".join(labels + [str(record["code"])])
+	state["exits"][key] = state["exits"].get(key, 0) + 1
+
+
+def _escape(value):
+	"""escape a label value"""
+	return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+	"""format a label set"""
+	labels = ",".join("%s=\"%s\"" % (name, _escape(value)) for name, value in zip(names, values))
+	return "{%s%s}" % (labels, extra)
+
+
+def render(state):
+	"""render state in Prometheus text exposition format"""
+	lines = [
+		"# HELP ocfagent_phase_duration_seconds Duration of resource agent call phases.",
+		"# TYPE ocfagent_phase_duration_seconds histogram",
+	]
+	names = ("agent", "action", "instance", "phase")
+	for key in sorted(state["histograms"]):
+		values = key.split("\t")
+		histogram = state["histograms"][key]
+		for bound, count in zip(BUCKETS, histogram["buckets"]):
+			lines.append("ocfagent_phase_duration_seconds_bucket%s %i" % (_labels(names, values, ",le=\"%s\"" % repr(bound)), count))
+		lines.append("ocfagent_phase_duration_seconds_bucket%s %i" % (_labels(names, values, ",le=\"+Inf\""), histogram["count"]))
+		lines.append("ocfagent_phase_duration_seconds_sum%s %s" % (_labels(names, values), repr(histogram["sum"])))
+		lines.append("ocfagent_phase_duration_seconds_count%s %i" % (_labels(names, values), histogram["count"]))
+	lines.append("# HELP ocfagent_action_exit_total Resource agent calls by exit code.")
+	lines.append("# TYPE ocfagent_action_exit_total counter")
+	names = ("agent", "action", "instance", "code")
+	for key in sorted(state["exits"]):
+		lines.append("ocfagent_action_exit_total%s %i" % (_labels(names, key.split("\t")), state["exits"][key]))
+	return "\n".join(lines) + "\n"
+
+
+def flush(directory, agent):
+	"""aggregate the spool of agent into its textfile. Skipped if another process is flushing"""
+	spool, lock, state_path, textfile = _paths(directory, agent)
+	lock_fd = os.open(lock, os.O_WRONLY | os.O_CREAT, 0o644)
+	try:
+		try:
+			fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except IOError as e:
+			if e.errno in (errno.EAGAIN, errno.EACCES):
+				return
+			raise
+		taken = "%s.%d" % (spool, os.getpid())
+		try:
+			os.rename(spool, taken)
+		except OSError as e:
+			if e.errno != errno.ENOENT:
+				raise
+			taken = None
+		state = _load_state(state_path)
+		if taken is not None:
+			with open(taken) as f:
+				# wait for writers still appending to the taken spool
+				fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+				os.unlink(taken)
+				for line in f:
+					try:
+						_merge(state, json.loads(line))
+					except (ValueError, KeyError):
+						continue
+		_write_atomic(state_path, json.dumps(state))
+		_write_atomic(textfile, render(state))
+	finally:
+		os.close(lock_fd)
+
+
+def record(directory, agent, action, instance, timings, code):
+	"""record phase timings (seconds by phase name) and exit code of one call"""
+	spool, _, _, textfile = _paths(directory, agent)
+	line = json.dumps({"agent": agent, "action": action, "instance": instance, "timings": timings, "code": code})
+	_append(spool, line + "\n")
+	if _needs_flush(spool, textfile):
+		flush(directory, agent)
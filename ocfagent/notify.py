@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Structured access to clone notification variables.
+
+Pacemaker passes notify actions of clones with notify=true the notification
+type and operation and space separated lists of resources and node names
+(OCF_RESKEY_CRM_meta_notify_<kind>_resource and _uname). NotifyContext splits
+each list only when it is accessed and caches the resulting tuples, sets and
+mappings.
+"""
+
+NOTIFY_PREFIX = "OCF_RESKEY_CRM_meta_notify_"
+
+KINDS = ["active", "inactive", "start", "stop", "promote", "demote", "master", "slave", "promoted", "unpromoted", "available", "all"]
+"""kinds of resource and node lists passed by pacemaker (available and all only have unames)"""
+
+
+class NotifyContext(object):
+	"""notification variables of a notify action, parsed lazily from environ"""
+	def __init__(self, environ):
+		self.environ = environ
+		self._cache = {}
+
+	def _cached(self, key, build):
+		"""return the cached value of key, calling build on first access"""
+		try:
+			return self._cache[key]
+		except KeyError:
+			value = self._cache[key] = build()
+			return value
+
+	@property
+	def type(self):
+		"""notification type: pre or post (None if this is no notification)"""
+		return self.environ.get(NOTIFY_PREFIX + "type")
+
+	@property
+	def operation(self):
+		"""notified operation: start, stop, promote or demote"""
+		return self.environ.get(NOTIFY_PREFIX + "operation")
+
+	@property
+	def phase(self):
+		"""(type, operation) tuple, e.g. ("pre", "start")"""
+		return self.type, self.operation
+
+	@property
+	def local_node(self):
+		"""name of the node this notification is delivered on"""
+		return self.environ.get("OCF_RESKEY_CRM_meta_on_node")
+
+	@property
+	def is_pre(self):
+		"""check if this is a pre notification"""
+		return self.type == "pre"
+
+	@property
+	def is_post(self):
+		"""check if this is a post notification"""
+		return self.type == "post"
+
+	def _list(self, kind, suffix):
+		"""split list kind_suffix"""
+		if kind not in KINDS:
+			raise RuntimeError("Unknown notify list %s" % kind)
+		return self._cached((kind, suffix), lambda: tuple(self.environ.get("%s%s_%s" % (NOTIFY_PREFIX, kind, suffix), "").split()))
+
+	def resources(self, kind):
+		"""tuple of resource instances of list kind (e.g. start, active)"""
+		return self._list(kind, "resource")
+
+	def unames(self, kind):
+		"""tuple of node names of list kind in the order of resources(kind)"""
+		return self._list(kind, "uname")
+
+	def nodes(self, kind):
+		"""set of node names of list kind"""
+		return self._cached((kind, "nodes"), lambda: frozenset(self.unames(kind)))
+
+	def resource_nodes(self, kind):
+		"""mapping of resource instance to node name of list kind"""
+		return self._cached((kind, "resource_nodes"), lambda: dict(zip(self.resources(kind), self.unames(kind))))
+
+	def node_resources(self, kind):
+		"""mapping of node name to the list of resource instances of list kind"""
+		def build():
+			"""group resources by node"""
+			mapping = {}
+			for resource, uname in zip(self.resources(kind), self.unames(kind)):
+				mapping.setdefault(uname, []).append(resource)
+			return mapping
+		return self._cached((kind, "node_resources"), build)
+
+	def operation_resources(self):
+		"""resource instances the notified operation acts on"""
+		return self.resources(self.operation) if self.operation in KINDS else ()
+
+	def operation_nodes(self):
+		"""set of node names the notified operation acts on"""
+		return self.nodes(self.operation) if self.operation in KINDS else frozenset()
+
+	def includes(self, kind, uname=None):
+		"""check if node uname (the local node by default) is in list kind"""
+		return (uname or self.local_node) in self.nodes(kind)
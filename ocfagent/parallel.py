@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Concurrent sub-checks for handlers.
+
+A TaskGroup runs callables in threads under one shared deadline. The first
+failing task ends the group: join() re-raises its exception immediately and
+sets the cancelled event. Threads can not be interrupted, so tasks still
+running are abandoned, not cancelled: they keep running as daemon threads
+until they return or the agent process exits, and their side effects may
+still happen. Tasks only stop early if they are given the event (e.g.
+group.spawn(func, group.cancelled)) and poll it. Handler latency is bounded
+by the slowest successful task or the deadline, not by the sum of all tasks.
+"""
+
+import Queue
+import sys
+import threading
+
+from .deadline import DeadlineExceeded
+
+_POLL_INTERVAL = 1.0
+"""maximum blocking time of a single queue wait, keeps signal handlers (SIGALRM) responsive"""
+
+
+class TaskGroup(object):
+	"""group of concurrently running tasks sharing a deadline (ocfagent.deadline.Deadline or None)"""
+	def __init__(self, deadline=None):
+		self.deadline = deadline
+		self.cancelled = threading.Event()
+		self._queue = Queue.Queue()
+		self._count = 0
+
+	def _run(self, index, func, args, kwargs):
+		"""thread target running a single task"""
+		try:
+			self._queue.put((index, True, func(*args, **kwargs)))
+		except BaseException:  # pylint: disable=W0703
+			self._queue.put((index, False, sys.exc_info()))
+
+	def spawn(self, func, *args, **kwargs):
+		"""start func(*args, **kwargs) in a new thread"""
+		thread = threading.Thread(target=self._run, args=(self._count, func, args, kwargs))
+		thread.daemon = True
+		self._count += 1
+		thread.start()
+
+	def join(self):
+		"""wait for all tasks and return their results in spawn order.
+		Re-raises the exception of the first failing task and raises DeadlineExceeded
+		if the deadline passes first. In both cases cancelled is set and the remaining
+		tasks are abandoned (they are not interrupted)."""
+		results = [None] * self._count
+		pending = self._count
+		while pending > 0:
+			if self.deadline is not None:
+				if self.deadline.expired:
+					self.cancelled.set()
+					raise DeadlineExceeded("soft deadline of %.1fs exceeded waiting for %i tasks" % (self.deadline.soft_timeout, pending))
+				timeout = min(self.deadline.remaining(), _POLL_INTERVAL)
+			else:
+				timeout = _POLL_INTERVAL
+			try:
+				index, success, value = self._queue.get(timeout=timeout)
+			except Queue.Empty:
+				continue
+			if not success:
+				self.cancelled.set()
+				raise value[0], value[1], value[2]
+			results[index] = value
+			pending -= 1
+		return results
+
+
+def gather(deadline, *funcs):
+	"""run funcs concurrently under deadline and return their results in order (see TaskGroup.join).
+	If one fails, the others are abandoned and keep running in the background"""
+	group = TaskGroup(deadline)
+	for func in funcs:
+		group.spawn(func)
+	return group.join()
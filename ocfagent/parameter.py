@@ -1,8 +1,18 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import re
 import types
 
+from . import error
+
+PATH_KINDS = ["absolute", "exists", "file", "directory", "executable"]
+"""valid values of the path constraint"""
+
+SCHEMA_CACHE_SIZE = 64
+"""maximum number of validated parameter sets cached per compiled schema"""
+
 
 class ResourceBaseParameter(object):
 	__CLASS_NAME_PREFIX = "OCFParameter_"
@@ -54,6 +64,8 @@ class ResourceBaseParameter(object):
 			return "string"
 		if self.type_def == types.BooleanType:
 			return "boolean"
+		if self.type_def == types.ListType:
+			return "string"
 
 	@property
 	def default(self):  # pylint: disable=R0201
@@ -75,15 +87,70 @@ resource type.
 		"""define this parameter to be required if true"""
 		return False
 
+	@property
+	def reloadable(self):  # pylint: disable=R0201
+		"""define this parameter as reloadable: changes are applied by handle_reload without a
+		restart. Reloadable parameters are advertised as not unique"""
+		return False
+
+	@property
+	def minimum(self):  # pylint: disable=R0201
+		"""minimum value of integer parameters. None if unbounded"""
+		return None
+
+	@property
+	def maximum(self):  # pylint: disable=R0201
+		"""maximum value of integer parameters. None if unbounded"""
+		return None
+
+	@property
+	def pattern(self):  # pylint: disable=R0201
+		"""regular expression string values (list items) must match completely. None if any value is allowed"""
+		return None
+
+	@property
+	def choices(self):  # pylint: disable=R0201
+		"""list of allowed values (list items). None if any value is allowed"""
+		return None
+
+	@property
+	def path(self):  # pylint: disable=R0201
+		"""path constraint of string values (list items), one of PATH_KINDS. None for no path.
+		absolute only requires an absolute path, the others are checked on the filesystem
+		for the actions in ResourceAgent.PARAMETER_PATH_CHECK_ACTIONS"""
+		return None
+
+	def describe_constraints(self):
+		"""describe the constraints for the meta-data longdesc. None if there are none"""
+		lines = []
+		if self.choices is not None:
+			lines.append("Allowed values: %s." % ", ".join(self.format_value(choice) for choice in self.choices))
+		if self.minimum is not None and self.maximum is not None:
+			lines.append("Allowed range: %i to %i." % (self.minimum, self.maximum))
+		elif self.minimum is not None:
+			lines.append("Minimum: %i." % self.minimum)
+		elif self.maximum is not None:
+			lines.append("Maximum: %i." % self.maximum)
+		if self.pattern is not None:
+			lines.append("Must match: %s" % self.pattern)
+		if self.path == "absolute":
+			lines.append("Must be an absolute path.")
+		elif self.path is not None:
+			lines.append("Must be an absolute path to an existing %s." % {"exists": "file or directory", "executable": "executable file"}.get(self.path, self.path))
+		if not lines:
+			return None
+		return "\n".join(lines)
+
+	def format_value(self, value):  # pylint: disable=R0201
+		"""format value for meta-data"""
+		return str(value)
+
 	@property
 	def value(self):
-		"""returns the parameter value is set. returns default value if not set"""
+		"""returns the parameter value is set. returns default value if not set. Values are validated when set"""
 		if self._value is None:
-			self.validate_type(self.default)
 			return self.default
-		else:
-			self.validate_type(self._value)
-			return self._value
+		return self._value
 
 	@value.setter
 	def value(self, value):
@@ -125,11 +192,8 @@ class ResourceBoolParameter(ResourceBaseParameter):
 	@property
 	def value(self):
 		if self._value is None:
-			self.validate_type(self.default)
 			return self.default
-		else:
-			self.validate_type(self._value)
-			return self._value
+		return self._value
 
 	@value.setter
 	def value(self, val):  # pylint: disable=R0201,W0221
@@ -140,3 +204,171 @@ class ResourceBoolParameter(ResourceBaseParameter):
 			self._value = False
 			return
 		raise ValueError("Invalid boolean literal: %s" % val)
+
+
+class ResourceListParameter(ResourceBaseParameter):
+	"""Implement list type. Values are split at separator, constraints apply to each item"""
+	@property
+	def type_def(self):
+		return types.ListType
+
+	@property
+	def separator(self):  # pylint: disable=R0201
+		"""item separator. None splits at whitespace"""
+		return None
+
+	def format_value(self, value):
+		return (self.separator or " ").join(value)
+
+
+def _check_path(name, kind, value):
+	"""check path constraint kind on the filesystem"""
+	if kind == "exists":
+		ok = os.path.exists(value)
+	elif kind == "file":
+		ok = os.path.isfile(value)
+	elif kind == "directory":
+		ok = os.path.isdir(value)
+	else:
+		ok = os.path.isfile(value) and os.access(value, os.X_OK)
+	if not ok:
+		raise error.OCFErrInstalled("Parameter %s: %s is not an existing %s" % (name, value, kind))
+
+
+def _compile_parameter(param):  # pylint: disable=R0912
+	"""compile the parameter instance param into (env name, convert, checks, path kind).
+	convert parses the environment string, checks validate converted values"""
+	name = param.name
+	type_def = param.type_def
+	if type_def == types.IntType:
+		def convert(raw):
+			"""parse integer"""
+			try:
+				return int(raw)
+			except ValueError:
+				raise error.OCFErrConfigured("Parameter %s: %r is not an integer" % (name, raw))
+	elif type_def == types.StringType:
+		convert = str
+	elif type_def == types.BooleanType:
+		literals = dict([(literal, True) for literal in param._true] + [(literal, False) for literal in param._false])  # pylint: disable=W0212
+
+		def convert(raw):
+			"""parse boolean literal"""
+			try:
+				return literals[raw]
+			except KeyError:
+				raise error.OCFErrConfigured("Parameter %s: invalid boolean literal %r" % (name, raw))
+	elif type_def == types.ListType:
+		separator = param.separator
+
+		def convert(raw):
+			"""split list, dropping empty items"""
+			return [item.strip() for item in raw.split(separator) if item.strip()]
+	else:
+		raise RuntimeError("Parameter %s has unknown type_def %r" % (name, type_def))
+
+	# checks of single (item) values
+	item_checks = []
+	minimum, maximum = param.minimum, param.maximum
+	if minimum is not None or maximum is not None:
+		if type_def != types.IntType:
+			raise RuntimeError("Parameter %s: minimum and maximum require an integer parameter" % name)
+
+		def check_range(value):
+			"""check range"""
+			if minimum is not None and value < minimum:
+				raise error.OCFErrConfigured("Parameter %s: %i is below minimum %i" % (name, value, minimum))
+			if maximum is not None and value > maximum:
+				raise error.OCFErrConfigured("Parameter %s: %i is above maximum %i" % (name, value, maximum))
+		item_checks.append(check_range)
+	if param.pattern is not None:
+		regex = re.compile("(?:%s)\\Z" % param.pattern)
+
+		def check_pattern(value):
+			"""check regular expression"""
+			if not regex.match(str(value)):
+				raise error.OCFErrConfigured("Parameter %s: %r does not match %s" % (name, value, param.pattern))
+		item_checks.append(check_pattern)
+	if param.choices is not None:
+		choices = frozenset(param.choices)
+
+		def check_choices(value):
+			"""check allowed values"""
+			if value not in choices:
+				raise error.OCFErrConfigured("Parameter %s: %r is not one of %s" % (name, value, ", ".join(str(c) for c in param.choices)))
+		item_checks.append(check_choices)
+	path = param.path
+	if path is not None:
+		if path not in PATH_KINDS:
+			raise RuntimeError("Parameter %s: path must be one of %s" % (name, ", ".join(PATH_KINDS)))
+		if type_def not in [types.StringType, types.ListType]:
+			raise RuntimeError("Parameter %s: path requires a string or list parameter" % name)
+
+		def check_absolute(value):
+			"""check absolute path"""
+			if not os.path.isabs(value):
+				raise error.OCFErrConfigured("Parameter %s: %r is not an absolute path" % (name, value))
+		item_checks.append(check_absolute)
+		if path == "absolute":
+			path = None
+
+	if type_def == types.ListType and item_checks:
+		def check_items(values):
+			"""check each list item"""
+			for value in values:
+				for check in item_checks:
+					check(value)
+		checks = [check_items]
+	else:
+		checks = item_checks
+
+	# defaults must fulfill the constraints as well
+	if param.default is not None:
+		param.validate_type(param.default)
+		try:
+			for check in checks:
+				check(param.default)
+		except error.ResourceAgentException as e:
+			raise RuntimeError("Default of %s" % e.message)
+	return "OCF_RESKEY_%s" % name, convert, checks, path
+
+
+def compile_schema(parameter_classes):
+	"""compile parameter_classes into a single function parse(environ, check_paths=False).
+	parse returns the list of converted and validated values in order of parameter_classes
+	(None for unset parameters) and raises OCFErrConfigured (OCFErrInstalled for missing
+	paths if check_paths is True). Validated sets are cached by their raw values"""
+	steps = [_compile_parameter(parameter_class()) for parameter_class in parameter_classes]
+	env_names = [step[0] for step in steps]
+	path_checks = [(step[0][len("OCF_RESKEY_"):], i, step[3]) for i, step in enumerate(steps) if step[3] is not None]
+	list_indexes = [i for i, parameter_class in enumerate(parameter_classes) if parameter_class().type_def == types.ListType]
+	cache = {}
+
+	def parse(environ, check_paths=False):
+		"""parse and validate the parameters in environ"""
+		key = tuple([environ.get(env_name) for env_name in env_names])
+		values = cache.get(key)
+		if values is None:
+			values = []
+			for raw, (_, convert, checks, _) in zip(key, steps):
+				if raw is None:
+					values.append(None)
+					continue
+				value = convert(raw)
+				for check in checks:
+					check(value)
+				values.append(value)
+			if len(cache) >= SCHEMA_CACHE_SIZE:
+				cache.clear()
+			cache[key] = values
+		values = list(values)
+		for i in list_indexes:
+			if values[i] is not None:
+				values[i] = list(values[i])
+		if check_paths:
+			for name, i, kind in path_checks:
+				if values[i] is not None:
+					for value in (values[i] if i in list_indexes else [values[i]]):
+						_check_path(name, kind, value)
+		return values
+	return parse
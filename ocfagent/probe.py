@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Reusable health probes for monitor handlers.
+
+Declare probes in the PROBES attribute of your agent class (or return them
+from get_probes) and call self.run_probes() in handle_monitor. All probes run
+concurrently under the handler deadline. The combined result is raised as
+OCFSuccess (all probes running), OCFNotRunning (all probes cleanly not
+running) or OCFErrGeneric (anything else). Without probes run_probes raises
+OCFErrConfigured.
+"""
+
+import errno
+import httplib
+import os
+import socket
+import time
+import urlparse
+
+RUNNING = "running"
+NOT_RUNNING = "not running"
+FAILED = "failed"
+
+DEFAULT_TIMEOUT = 10.0
+"""probe timeout in seconds if neither the probe nor the handler deadline limit it"""
+
+
+class NotRunning(Exception):
+	"""raised by a probe check if the service is cleanly not running"""
+
+
+class Failed(Exception):
+	"""raised by a probe check if the service is running but not functional"""
+
+
+class ProbeResult(object):
+	"""result of a single probe with its latency in seconds"""
+	__slots__ = ("probe", "state", "message", "latency")
+
+	def __init__(self, probe, state, message, latency):
+		self.probe = probe
+		self.state = state
+		self.message = message
+		self.latency = latency
+
+	def __str__(self):
+		return "%s: %s (%s, %.1f ms)" % (self.probe.name, self.state, self.message, self.latency * 1000)
+
+
+class Probe(object):
+	"""Probe base class. Derive and implement check(timeout), which returns a message
+	on success and raises NotRunning or Failed otherwise"""
+	def __init__(self, name=None, timeout=None):
+		self._name = name
+		self.timeout = timeout
+
+	@property
+	def name(self):
+		"""name of the probe used in messages"""
+		if self._name is not None:
+			return self._name
+		return self.describe()
+
+	def describe(self):
+		"""default name of the probe"""
+		return self.__class__.__name__
+
+	def check(self, timeout):
+		"""carry out the check. Implement in derived classes"""
+		raise NotImplementedError()
+
+	def run(self, timeout=None):
+		"""run the check and return a ProbeResult. Never raises"""
+		if self.timeout is not None:
+			timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+		if timeout is None:
+			timeout = DEFAULT_TIMEOUT
+		start = time.time()
+		try:
+			message = self.check(timeout)
+			state = RUNNING
+		except NotRunning as e:
+			state, message = NOT_RUNNING, str(e)
+		except Failed as e:
+			state, message = FAILED, str(e)
+		except socket.timeout:
+			state, message = FAILED, "timeout after %.1fs" % timeout
+		except Exception as e:  # pylint: disable=W0703
+			state, message = FAILED, "%s: %s" % (e.__class__.__name__, e)
+		return ProbeResult(self, state, message or "ok", time.time() - start)
+
+
+def _connect_error(e, what):
+	"""map a socket connect error to NotRunning or Failed"""
+	if e.errno in (errno.ECONNREFUSED, errno.ENOENT):
+		return NotRunning("%s: %s" % (what, e.strerror))
+	return Failed("%s: %s" % (what, e.strerror or e))
+
+
+class TCPProbe(Probe):
+	"""TCP connect to host and port"""
+	def __init__(self, host, port, **kwargs):
+		Probe.__init__(self, **kwargs)
+		self.host = host
+		self.port = port
+
+	def describe(self):
+		return "tcp %s:%i" % (self.host, self.port)
+
+	def check(self, timeout):
+		try:
+			sock = socket.create_connection((self.host, self.port), timeout)
+		except socket.timeout:
+			raise
+		except socket.error as e:
+			raise _connect_error(e, "connect")
+		sock.close()
+		return "connected"
+
+
+class HTTPProbe(Probe):
+	"""HTTP(S) GET of url expecting status (default 200)"""
+	def __init__(self, url, status=200, **kwargs):
+		Probe.__init__(self, **kwargs)
+		self.url = url
+		self.status = status
+
+	def describe(self):
+		return "http %s" % self.url
+
+	def check(self, timeout):
+		url = urlparse.urlsplit(self.url)
+		if url.scheme == "https":
+			conn = httplib.HTTPSConnection(url.hostname, url.port, timeout=timeout)
+		else:
+			conn = httplib.HTTPConnection(url.hostname, url.port, timeout=timeout)
+		path = url.path or "/"
+		if url.query:
+			path += "?" + url.query
+		try:
+			conn.request("GET", path)
+			response = conn.getresponse()
+			response.read()
+		except socket.timeout:
+			raise
+		except socket.error as e:
+			raise _connect_error(e, "GET %s" % self.url)
+		finally:
+			conn.close()
+		if response.status != self.status:
+			raise Failed("status %i, expected %i" % (response.status, self.status))
+		return "status %i" % response.status
+
+
+class PidfileProbe(Probe):
+	"""liveness of the process whose pid is written to path. A missing pidfile means not running,
+	a stale pidfile (process gone) means failed"""
+	def __init__(self, path, **kwargs):
+		Probe.__init__(self, **kwargs)
+		self.path = path
+
+	def describe(self):
+		return "pidfile %s" % self.path
+
+	def check(self, timeout):
+		try:
+			with open(self.path) as f:
+				content = f.read().strip()
+		except IOError as e:
+			if e.errno == errno.ENOENT:
+				raise NotRunning("pidfile missing")
+			raise
+		try:
+			pid = int(content.split()[0])
+		except (IndexError, ValueError):
+			raise Failed("pidfile contains no pid")
+		try:
+			os.kill(pid, 0)
+		except OSError as e:
+			if e.errno == errno.ESRCH:
+				raise Failed("process %i is gone (stale pidfile)" % pid)
+			if e.errno != errno.EPERM:
+				raise
+		return "pid %i alive" % pid
+
+
+class UnixSocketProbe(Probe):
+	"""connect to a Unix stream socket, optionally send a request and expect a response prefix"""
+	def __init__(self, path, send=None, expect=None, **kwargs):
+		Probe.__init__(self, **kwargs)
+		self.path = path
+		self.send = send
+		self.expect = expect
+
+	def describe(self):
+		return "unix %s" % self.path
+
+	def check(self, timeout):
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		sock.settimeout(timeout)
+		try:
+			try:
+				sock.connect(self.path)
+			except socket.timeout:
+				raise
+			except socket.error as e:
+				raise _connect_error(e, "connect")
+			if self.send is not None:
+				sock.sendall(self.send)
+			if self.expect is not None:
+				data = ""
+				while len(data) < len(self.expect):
+					chunk = sock.recv(4096)
+					if not chunk:
+						break
+					data += chunk
+				if not data.startswith(self.expect):
+					raise Failed("unexpected response %r" % data[:64])
+		finally:
+			sock.close()
+		return "connected"
+
+
+class FileFreshnessProbe(Probe):
+	"""modification time of path is at most max_age seconds old. A missing file means not running"""
+	def __init__(self, path, max_age, **kwargs):
+		Probe.__init__(self, **kwargs)
+		self.path = path
+		self.max_age = max_age
+
+	def describe(self):
+		return "file %s" % self.path
+
+	def check(self, timeout):
+		try:
+			age = time.time() - os.stat(self.path).st_mtime
+		except OSError as e:
+			if e.errno == errno.ENOENT:
+				raise NotRunning("file missing")
+			raise
+		if age > self.max_age:
+			raise Failed("last modified %.1fs ago, maximum is %.1fs" % (age, self.max_age))
+		return "modified %.1fs ago" % age
+
+
+def summarize(results):
+	"""combine results into an OCF state (RUNNING, NOT_RUNNING or FAILED) and a message.
+	No results are FAILED, nothing was checked"""
+	if not results:
+		return FAILED, "no probe results"
+	states = set(result.state for result in results)
+	message = "; ".join(str(result) for result in results)
+	if states == set([RUNNING]):
+		return RUNNING, message
+	if states == set([NOT_RUNNING]):
+		return NOT_RUNNING, message
+	return FAILED, message
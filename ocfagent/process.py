@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Process tracking without full /proc scans.
+
+A Process is identified by its pid and its start time (field 22 of
+/proc/<pid>/stat), so liveness checks are a single stat read and a reused pid
+is detected. find() scans /proc as a fallback, filtering by the short comm
+name before reading command lines. Where the kernel supports pidfds
+(Linux 5.3) and the architecture uses the unified syscall numbers, waiting for
+exit and signalling use a pidfd, otherwise waiting polls with backoff.
+"""
+
+import ctypes
+import errno
+import os
+import select
+import signal as signals
+import time
+
+PROC = "/proc"
+
+SYS_PIDFD_SEND_SIGNAL = 424
+SYS_PIDFD_OPEN = 434
+"""pidfd syscall numbers of the unified syscall table. alpha, ia64 and mips use different numbers"""
+
+PIDFD_SUPPORTED = not os.uname()[4].startswith(("alpha", "ia64", "mips"))
+"""use pidfds only on architectures using the unified syscall numbers"""
+
+SIGNAL_NAMES = dict((getattr(signals, name), name[3:]) for name in dir(signals) if name.startswith("SIG") and not name.startswith("SIG_") and name not in ["SIGCLD", "SIGPOLL", "SIGIOT"])
+"""signal number to name without SIG prefix"""
+
+_libc = None
+
+
+def _syscall(number, *args):
+	"""call syscall number via libc. Returns the result, raises OSError on failure"""
+	global _libc  # pylint: disable=W0603
+	if _libc is None:
+		_libc = ctypes.CDLL(None, use_errno=True)
+	result = _libc.syscall(number, *args)
+	if result < 0:
+		err = ctypes.get_errno()
+		raise OSError(err, os.strerror(err))
+	return result
+
+
+def read_stat(pid):
+	"""read (comm, state, starttime) of pid from /proc/<pid>/stat. None if pid does not exist"""
+	try:
+		with open("%s/%i/stat" % (PROC, pid)) as f:
+			data = f.read()
+	except IOError as e:
+		if e.errno in [errno.ENOENT, errno.ESRCH]:
+			return None
+		raise
+	# comm may contain spaces and parentheses, it ends at the last parenthesis
+	end = data.rfind(")")
+	fields = data[end + 2:].split()
+	return data[data.find("(") + 1:end], fields[0], int(fields[19])
+
+
+class Process(object):
+	"""a process identified by pid and start time"""
+	def __init__(self, pid, starttime):
+		self.pid = pid
+		self.starttime = starttime
+		self._pidfd = None
+		self._pgid = None
+
+	@classmethod
+	def from_pid(cls, pid):
+		"""track running process pid. Returns None if it does not exist"""
+		stat = read_stat(pid)
+		if stat is None:
+			return None
+		return cls(pid, stat[2])
+
+	@classmethod
+	def from_pidfile(cls, path):
+		"""track the process whose pid is stored in pidfile path. None if the file or process is missing"""
+		try:
+			with open(path) as f:
+				pid = int(f.read().split()[0])
+		except (IOError, ValueError, IndexError):
+			return None
+		return cls.from_pid(pid)
+
+	@classmethod
+	def from_state(cls, value):
+		"""create from the value returned by to_state. None for invalid values"""
+		try:
+			pid, starttime = value
+			return cls(int(pid), int(starttime))
+		except (TypeError, ValueError):
+			return None
+
+	def to_state(self):
+		"""value for the state store"""
+		return [self.pid, self.starttime]
+
+	def __repr__(self):
+		return "Process(%i, %i)" % (self.pid, self.starttime)
+
+	@property
+	def comm(self):
+		"""command name of the process. None if it is not alive"""
+		stat = read_stat(self.pid)
+		if stat is None or stat[2] != self.starttime:
+			return None
+		return stat[0]
+
+	def alive(self):
+		"""check if the process is running (and not a zombie or a different process reusing the pid)"""
+		stat = read_stat(self.pid)
+		return stat is not None and stat[2] == self.starttime and stat[1] not in ["Z", "X"]
+
+	def pidfd(self):
+		"""open a pidfd for the process. Returns None if pidfds are not supported or the process is gone"""
+		if self._pidfd is None:
+			if not PIDFD_SUPPORTED:
+				return None
+			try:
+				fd = _syscall(SYS_PIDFD_OPEN, self.pid, 0)
+			except (OSError, AttributeError):
+				return None
+			# the pid could have been reused before the pidfd was opened
+			if not self.alive():
+				os.close(fd)
+				return None
+			self._pidfd = fd
+		return self._pidfd
+
+	def close(self):
+		"""close the pidfd if opened"""
+		if self._pidfd is not None:
+			os.close(self._pidfd)
+			self._pidfd = None
+
+	def group_alive(self):
+		"""check if a process of the group signalled with signal(sig, group=True) is left. Reaps
+		exited children of this process in the group, which would otherwise keep it alive"""
+		if self._pgid is None:
+			return self.alive()
+		try:
+			while os.waitpid(-self._pgid, os.WNOHANG)[0]:
+				pass
+		except OSError:
+			pass
+		try:
+			os.killpg(self._pgid, 0)
+		except OSError as e:
+			if e.errno == errno.ESRCH:
+				return False
+			if e.errno != errno.EPERM:
+				raise
+		return True
+
+	def signal(self, sig, group=False):
+		"""send sig to the process (or its whole process group). Returns False if it (or every
+		process of the group) is not alive anymore. The group is remembered on the first group
+		signal, so it is still reached after the process itself exited"""
+		if group:
+			if self._pgid is None:
+				if not self.alive():
+					return False
+				try:
+					self._pgid = os.getpgid(self.pid)
+				except OSError as e:
+					if e.errno == errno.ESRCH:
+						return False
+					raise
+			try:
+				os.killpg(self._pgid, sig)
+			except OSError as e:
+				if e.errno == errno.ESRCH:
+					return False
+				raise
+			return True
+		fd = self.pidfd()
+		if fd is not None:
+			try:
+				_syscall(SYS_PIDFD_SEND_SIGNAL, fd, sig, None, 0)
+			except OSError as e:
+				if e.errno == errno.ESRCH:
+					return False
+				raise
+			return True
+		if not self.alive():
+			return False
+		try:
+			os.kill(self.pid, sig)
+		except OSError as e:
+			if e.errno == errno.ESRCH:
+				return False
+			raise
+		return True
+
+	def wait(self, timeout, interval=0.01, max_interval=0.5, group=False):
+		"""wait up to timeout seconds for the process (with group, all processes of the group
+		signalled before) to exit. Returns True if it exited"""
+		expires = time.time() + timeout
+		if group and self._pgid is not None:
+			while self.group_alive():
+				remaining = expires - time.time()
+				if remaining <= 0:
+					return False
+				time.sleep(min(interval, remaining))
+				interval = min(interval * 2, max_interval)
+			return True
+		fd = self.pidfd()
+		if fd is not None:
+			poller = select.poll()
+			poller.register(fd, select.POLLIN)
+			while True:
+				remaining = expires - time.time()
+				try:
+					if poller.poll(max(0, int(remaining * 1000))):
+						return True
+				except select.error as e:
+					if e.args[0] != errno.EINTR:
+						raise
+					continue
+				if remaining <= 0:
+					return not self.alive()
+		while self.alive():
+			remaining = expires - time.time()
+			if remaining <= 0:
+				return False
+			time.sleep(min(interval, remaining))
+			interval = min(interval * 2, max_interval)
+		return True
+
+
+def find(comm=None, match=None, uid=None):
+	"""scan /proc for processes. comm filters on the command name (first 15 characters,
+	read from the small stat file), uid on the owner and match is called with the
+	argument list of the remaining candidates. Returns a list of Process"""
+	result = []
+	for entry in os.listdir(PROC):
+		if not entry.isdigit():
+			continue
+		pid = int(entry)
+		try:
+			if uid is not None and os.stat("%s/%s" % (PROC, entry)).st_uid != uid:
+				continue
+			stat = read_stat(pid)
+			if stat is None or stat[1] in ["Z", "X"]:
+				continue
+			if comm is not None and stat[0] != comm[:15]:
+				continue
+			if match is not None:
+				with open("%s/%s/cmdline" % (PROC, entry), "rb") as f:
+					args = f.read().split("\0")
+				if args and args[-1] == "":
+					args.pop()
+				if not match(args):
+					continue
+		except (IOError, OSError):
+			# the process exited while scanning
+			continue
+		result.append(Process(pid, stat[2]))
+	return result
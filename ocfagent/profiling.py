@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Opt-in sampled profiling of handler calls.
+
+Enabled by environment variables honoured by ResourceAgent.call_handler:
+
+OCF_AGENT_PROFILE_DIR         directory for profile files (enables profiling)
+OCF_AGENT_PROFILE_SAMPLE      profile 1 in N calls (default 1)
+OCF_AGENT_PROFILE_MAX_BYTES   size limit of the directory, oldest files are removed (default 50 MiB)
+OCF_AGENT_PROFILE_TRACEMALLOC set to 1 to also write a tracemalloc snapshot (if available)
+
+Every sampled call writes <agent>-<action>-<time>-<pid>.pstats (cProfile) and
+optionally a .tracemalloc snapshot. cProfile and tracemalloc are only imported
+for sampled calls.
+"""
+
+import contextlib
+import os
+import time
+
+ENV_DIR = "OCF_AGENT_PROFILE_DIR"
+ENV_SAMPLE = "OCF_AGENT_PROFILE_SAMPLE"
+ENV_MAX_BYTES = "OCF_AGENT_PROFILE_MAX_BYTES"
+ENV_TRACEMALLOC = "OCF_AGENT_PROFILE_TRACEMALLOC"
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+"""default size limit of the profile directory"""
+
+
+def sampled(environ):
+	"""check if this call should be profiled according to environ"""
+	if not environ.get(ENV_DIR):
+		return False
+	try:
+		sample = int(environ.get(ENV_SAMPLE) or 1)
+	except ValueError:
+		sample = 1
+	if sample <= 1:
+		return True
+	import random
+	return random.randrange(sample) == 0
+
+
+def rotate(directory, max_bytes):
+	"""remove the oldest profile files until directory is below max_bytes"""
+	entries = []
+	total = 0
+	for entry in os.listdir(directory):
+		if not entry.endswith((".pstats", ".tracemalloc")):
+			continue
+		path = os.path.join(directory, entry)
+		try:
+			st = os.stat(path)
+		except OSError:
+			continue
+		entries.append((st.st_mtime, st.st_size, path))
+		total += st.st_size
+	entries.sort()
+	while entries and total > max_bytes:
+		_, size, path = entries.pop(0)
+		try:
+			os.unlink(path)
+		except OSError:
+			pass
+		total -= size
+
+
+@contextlib.contextmanager
+def profile(environ, agent, action):
+	"""profile the enclosed block if sampled according to environ"""
+	if not sampled(environ):
+		yield
+		return
+
+	import cProfile
+	tracemalloc = None
+	if environ.get(ENV_TRACEMALLOC) == "1":
+		try:
+			import tracemalloc
+		except ImportError:
+			pass
+	directory = environ[ENV_DIR]
+	use_tracemalloc = tracemalloc is not None
+	base = os.path.join(directory, "%s-%s-%s-%i" % (agent, action, time.strftime("%Y%m%d%H%M%S"), os.getpid()))
+	profiler = cProfile.Profile()
+	if use_tracemalloc:
+		tracemalloc.start()
+	profiler.enable()
+	try:
+		yield
+	finally:
+		profiler.disable()
+		try:
+			if not os.path.isdir(directory):
+				os.makedirs(directory)
+			profiler.dump_stats(base + ".pstats")
+			if use_tracemalloc:
+				tracemalloc.take_snapshot().dump(base + ".tracemalloc")
+			try:
+				max_bytes = int(environ.get(ENV_MAX_BYTES) or DEFAULT_MAX_BYTES)
+			except ValueError:
+				max_bytes = DEFAULT_MAX_BYTES
+			rotate(directory, max_bytes)
+		except (IOError, OSError):
+			pass
+		finally:
+			if use_tracemalloc:
+				tracemalloc.stop()
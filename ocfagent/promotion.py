@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Coalescing promotion score updates for stateful (master/slave) agents.
+
+Calling crm_master on every monitor forks a process and may write to the CIB
+each time. PromotionScore remembers the last published score of the instance
+in its state store and only runs the command if the score changed, at most
+once per min_interval (changes in between are coalesced and published by a
+later call), and again after refresh seconds even if unchanged. The command
+is bounded by the deadline of the current handler.
+"""
+
+import sys
+import time
+
+from . import command as _command
+from . import error
+
+DELETED = "deleted"
+"""published value after the score was deleted"""
+
+
+class PromotionScore(object):
+	"""promotion score of the instance owning store (a state.StateStore). The command is
+	killed when deadline (ocfagent.deadline.Deadline, None for no limit) passes"""
+	def __init__(self, store, command, min_interval=0, refresh=3600, deadline=None):
+		self.store = store
+		self.command = list(command)
+		self.min_interval = min_interval
+		self.refresh = refresh
+		self.deadline = deadline
+
+	@property
+	def published(self):
+		"""last published score (DELETED after a delete, None if unknown)"""
+		return self.store.get("promotion_score")
+
+	@property
+	def pending(self):
+		"""score waiting for publication because of min_interval, None if there is none"""
+		return self.store.get("promotion_pending")
+
+	def _run(self, args):
+		"""run the command with args within the deadline. Returns True on success"""
+		name = " ".join(self.command + args)
+		try:
+			result = _command.run(self.command + args, self.deadline, check=False)
+		except error.ResourceAgentException as e:
+			sys.stderr.write("Running %s failed: %s\n" % (self.command[0], e.message))
+			return False
+		if result.timed_out:
+			sys.stderr.write("%s timed out after %.1fs\n" % (name, result.duration))
+			return False
+		if result.returncode != 0:
+			sys.stderr.write("%s exited with %i: %s\n" % (name, result.returncode, (result.stdout + result.stderr).strip()))
+			return False
+		return True
+
+	def _publish(self, value, args, now):
+		"""publish value by running the command with args and remember it"""
+		if not self._run(args):
+			return False
+		self.store.update(promotion_score=value, promotion_time=now)
+		self.store.delete("promotion_pending")
+		return True
+
+	def _due(self, value, force, now):
+		"""check if value has to be published now. Remembers it as pending if it is rate limited"""
+		last = self.store.get_float("promotion_time", 0.0)
+		if value == self.published and not force and now - last < self.refresh:
+			self.store.delete("promotion_pending")
+			return False
+		if not force and now - last < self.min_interval:
+			self.store.set("promotion_pending", value)
+			return False
+		return True
+
+	def set(self, score, force=False):
+		"""publish score if it changed or needs a refresh. Returns True if the command was run successfully"""
+		score = int(score)
+		now = time.time()
+		if not self._due(score, force, now):
+			return False
+		return self._publish(score, ["-v", str(score)], now)
+
+	def delete(self, force=False):
+		"""delete the score. Returns True if the command was run successfully"""
+		now = time.time()
+		if not self._due(DELETED, force, now):
+			return False
+		return self._publish(DELETED, ["-D"], now)
+
+	def flush(self):
+		"""publish a pending score if min_interval has passed"""
+		pending = self.pending
+		if pending is None:
+			return False
+		if pending == DELETED:
+			return self.delete()
+		return self.set(pending)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Event-driven readiness waiting for start handlers.
+
+Instead of sleeping in a loop after launching a daemon, a start handler waits
+for a real readiness signal and returns as soon as it arrives:
+
+wait_path     a pidfile or socket path appearing (inotify on the parent directory, polling as fallback)
+wait_connect  a TCP or Unix socket accepting connections (connect polling with backoff)
+NotifySocket  READY=1 sent by the daemon to NOTIFY_SOCKET in the style of sd_notify
+
+All waits are bounded by a deadline (ocfagent.deadline.Deadline) and/or a
+timeout and give up early if the launched process (ocfagent.process.Process)
+exits. Failing waits raise OCFErrGeneric.
+"""
+
+import ctypes
+import errno
+import os
+import select
+import shutil
+import socket
+import tempfile
+import time
+
+from . import error
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+"""inotify flags (linux/inotify.h)"""
+
+MIN_INTERVAL = 0.01
+MAX_INTERVAL = 0.5
+"""backoff bounds of polling waits"""
+
+_libc = None
+
+
+def _expires(deadline, timeout):
+	"""absolute expiry time of the earlier of deadline and timeout. None if unlimited"""
+	expires = deadline.expires if deadline is not None else None
+	if timeout is not None:
+		expires = time.time() + timeout if expires is None else min(expires, time.time() + timeout)
+	return expires
+
+
+def _check(what, expires, process):
+	"""raise OCFErrGeneric if process exited or expires passed. Returns the seconds left (None if unlimited)"""
+	if process is not None and not process.alive():
+		raise error.OCFErrGeneric("Process %i exited while waiting for %s" % (process.pid, what))
+	if expires is None:
+		return None
+	remaining = expires - time.time()
+	if remaining <= 0:
+		raise error.OCFErrGeneric("Timed out waiting for %s" % what)
+	return remaining
+
+
+def _wait(fds, remaining, process, interval=None):
+	"""wait until one of fds is readable, the pidfd of process signals its exit or
+	remaining seconds passed. Polling callers pass interval to return after at most
+	interval seconds, callers waiting for an event on fds pass None. Returns the readable fds"""
+	fds = list(fds)
+	pidfd = process.pidfd() if process is not None else None
+	if pidfd is not None:
+		fds.append(pidfd)
+	elif process is not None and interval is None:
+		# exits are only noticed by polling
+		interval = MAX_INTERVAL
+	if interval is not None:
+		remaining = interval if remaining is None else min(remaining, interval)
+	try:
+		return select.select(fds, [], [], remaining)[0]
+	except select.error as e:
+		if e.args[0] != errno.EINTR:
+			raise
+		return []
+
+
+def _inotify_watch(directory):
+	"""return an inotify fd watching directory for new or changed entries. None if unavailable"""
+	global _libc  # pylint: disable=W0603
+	try:
+		if _libc is None:
+			_libc = ctypes.CDLL(None, use_errno=True)
+		fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+	except AttributeError:
+		return None
+	if fd < 0:
+		return None
+	if _libc.inotify_add_watch(fd, directory, IN_CREATE | IN_MOVED_TO | IN_ATTRIB | IN_CLOSE_WRITE) < 0:
+		os.close(fd)
+		return None
+	return fd
+
+
+def wait_path(path, deadline=None, timeout=None, process=None, check=None):
+	"""wait until path exists and check(path) (if given, e.g. a pidfile having content) is true"""
+	if check is None:
+		check = os.path.exists
+	expires = _expires(deadline, timeout)
+	what = "%s to appear" % path
+	fd = _inotify_watch(os.path.dirname(os.path.abspath(path)))
+	interval = MIN_INTERVAL
+	try:
+		while True:
+			# check after the watch is established, so no event is missed
+			if check(path):
+				return
+			remaining = _check(what, expires, process)
+			if fd is None:
+				_wait([], remaining, process, interval)
+				interval = min(interval * 2, MAX_INTERVAL)
+			elif fd in _wait([fd], remaining, process):
+				try:
+					while os.read(fd, 4096):
+						pass
+				except OSError as e:
+					if e.errno != errno.EAGAIN:
+						raise
+	finally:
+		if fd is not None:
+			os.close(fd)
+
+
+def wait_connect(address, deadline=None, timeout=None, process=None):
+	"""wait until address ((host, port) or a Unix socket path) accepts connections"""
+	expires = _expires(deadline, timeout)
+	family = socket.AF_UNIX if isinstance(address, basestring) else socket.AF_INET6 if ":" in address[0] else socket.AF_INET
+	what = "%s to accept connections" % (address if family == socket.AF_UNIX else "%s:%s" % address)
+	interval = MIN_INTERVAL
+	while True:
+		remaining = _check(what, expires, process)
+		sock = socket.socket(family, socket.SOCK_STREAM)
+		try:
+			sock.settimeout(MAX_INTERVAL if remaining is None else min(remaining, MAX_INTERVAL))
+			sock.connect(address)
+			return
+		except socket.timeout:
+			continue
+		except socket.error as e:
+			if e.args[0] not in [errno.ECONNREFUSED, errno.ENOENT, errno.ECONNRESET, errno.EAGAIN, errno.EHOSTUNREACH, errno.ENETUNREACH]:
+				raise
+		finally:
+			sock.close()
+		_wait([], remaining, process, interval)
+		interval = min(interval * 2, MAX_INTERVAL)
+
+
+class NotifySocket(object):
+	"""datagram socket receiving sd_notify style messages. Pass environ() to the daemon
+	(it contains NOTIFY_SOCKET) and wait() for READY=1. The socket is created in a private
+	directory (by default a new temporary one), which has to be accessible by the daemon"""
+	def __init__(self, directory=None):
+		self.directory = directory if directory is not None else tempfile.mkdtemp(prefix="ocfagent-notify-")
+		self._remove_directory = directory is None
+		self.path = os.path.join(self.directory, "notify.%i" % os.getpid())
+		self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+		self.sock.setblocking(False)
+		self.sock.bind(self.path)
+		self.status = {}
+
+	def environ(self, env=None):
+		"""copy of env (os.environ by default) with NOTIFY_SOCKET set"""
+		env = dict(os.environ if env is None else env)
+		env["NOTIFY_SOCKET"] = self.path
+		return env
+
+	def receive(self):
+		"""read pending messages into status. Returns True if READY=1 was received"""
+		while True:
+			try:
+				data = self.sock.recv(4096)
+			except socket.error as e:
+				if e.args[0] in [errno.EAGAIN, errno.EWOULDBLOCK]:
+					return self.status.get("READY") == "1"
+				raise
+			for line in data.splitlines():
+				key, sep, value = line.partition("=")
+				if sep:
+					self.status[key] = value
+
+	def wait(self, deadline=None, timeout=None, process=None):
+		"""wait until the daemon sent READY=1. Returns the received status variables"""
+		expires = _expires(deadline, timeout)
+		what = "READY=1 on %s" % self.path
+		while True:
+			ready = self.receive()
+			if "ERRNO" in self.status or self.status.get("STOPPING") == "1":
+				raise error.OCFErrGeneric("Daemon failed to start: %s" % self.status.get("STATUS", "errno %s" % self.status.get("ERRNO")))
+			if ready:
+				return self.status
+			remaining = _check(what, expires, process)
+			_wait([self.sock.fileno()], remaining, process)
+
+	def close(self):
+		"""close and remove the socket"""
+		self.sock.close()
+		try:
+			os.unlink(self.path)
+		except OSError:
+			pass
+		if self._remove_directory:
+			shutil.rmtree(self.directory, ignore_errors=True)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Multi-agent registry with a single dispatcher entry point.
+
+A provider shipping several agents registers them by name with the module and
+class implementing them and installs one dispatcher script, busybox-style:
+
+	registry = ocfagent.registry.Registry({
+		"FooAgent": "provider.foo:FooAgent",
+		"BarAgent": "provider.bar:BarAgent",
+	})
+	if __name__ == "__main__":
+		registry.main()
+
+The agent is selected by the basename of argv[0] (the agents are installed
+as symlinks to the dispatcher) or OCF_RESOURCE_TYPE, and only its module is
+imported. Called under its own name the dispatcher provides the commands
+
+	list                    list registered agents
+	install <directory>     create the agent symlinks in directory
+	compile                 byte-compile the modules of all agents
+	meta-data <directory>   write <agent>.xml meta-data of all agents to directory
+"""
+
+import compileall
+import importlib
+import os
+import sys
+
+from . import error
+
+
+class Registry(object):
+	"""registry of agent names to "module:class" targets"""
+	def __init__(self, agents=None):
+		self.agents = {}
+		self._loaded = {}
+		for name, target in (agents or {}).items():
+			self.register(name, target)
+
+	def register(self, name, target):
+		"""register agent name implemented by target ("module:class")"""
+		if ":" not in target:
+			raise RuntimeError("Agent target %s is not of the form module:class" % target)
+		self.agents[name] = target
+
+	def load(self, name):
+		"""import and return the agent class registered as name"""
+		if name not in self._loaded:
+			if name not in self.agents:
+				raise error.OCFErrInstalled("Agent %s is not registered" % name)
+			module_name, class_name = self.agents[name].split(":", 1)
+			self._loaded[name] = getattr(importlib.import_module(module_name), class_name)
+		return self._loaded[name]
+
+	def select(self, argv=None, environ=None):
+		"""name of the agent selected by the basename of argv[0] or OCF_RESOURCE_TYPE. None if neither is registered"""
+		argv = sys.argv if argv is None else argv
+		environ = os.environ if environ is None else environ
+		name = os.path.basename(argv[0]) if argv else ""
+		if name.endswith(".py"):
+			name = name[:-3]
+		if name in self.agents:
+			return name
+		resource_type = environ.get("OCF_RESOURCE_TYPE")
+		if resource_type in self.agents:
+			return resource_type
+		return None
+
+	def dispatch(self, name):
+		"""run agent name for the action in sys.argv"""
+		self.load(name)().cmdline_call()
+
+	def source_files(self):
+		"""source files of the modules of all agents (imports them)"""
+		paths = set()
+		for name in sorted(self.agents):
+			module = sys.modules[self.load(name).__module__]
+			path = getattr(module, "__file__", None)
+			if path is not None:
+				paths.add(path[:-1] if path.endswith((".pyc", ".pyo")) else path)
+		return sorted(paths)
+
+	def compile(self):
+		"""byte-compile the modules of all agents, so every agent call shares the bytecode. Returns True on success"""
+		ok = True
+		for path in self.source_files():
+			ok = compileall.compile_file(path, quiet=1) and ok
+		return bool(ok)
+
+	def meta_data(self, name):
+		"""meta-data of agent name as string"""
+		saved_argv = sys.argv
+		sys.argv = [name, "meta-data"]
+		try:
+			return self.load(name)().meta_data_string()
+		finally:
+			sys.argv = saved_argv
+
+	def write_meta_data(self, directory):
+		"""write the meta-data of all agents to <directory>/<agent>.xml in one pass"""
+		for name in sorted(self.agents):
+			with open(os.path.join(directory, "%s.xml" % name), "w") as f:
+				f.write(self.meta_data(name))
+				f.write("\n")
+
+	def install(self, directory, dispatcher=None):
+		"""create symlinks named after all agents in directory pointing to dispatcher (default argv[0])"""
+		dispatcher = os.path.abspath(dispatcher or sys.argv[0])
+		for name in sorted(self.agents):
+			link = os.path.join(directory, name)
+			if os.path.lexists(link):
+				os.unlink(link)
+			os.symlink(dispatcher, link)
+
+	def usage(self):
+		"""print usage of the dispatcher"""
+		print ("usage: %s {list|install <directory>|compile|meta-data <directory>}" % os.path.basename(sys.argv[0]))
+		print ("agents: %s" % " ".join(sorted(self.agents)))
+
+	def main(self):
+		"""dispatcher entry point"""
+		name = self.select()
+		if name is not None:
+			self.dispatch(name)
+			return
+		command = sys.argv[1:2]
+		if command == ["list"]:
+			for name in sorted(self.agents):
+				print ("%s %s" % (name, self.agents[name]))
+		elif command == ["install"] and len(sys.argv) == 3:
+			self.install(sys.argv[2])
+		elif command == ["compile"]:
+			if not self.compile():
+				raise error.OCFErrGeneric("Compiling agent modules failed")
+		elif command == ["meta-data"] and len(sys.argv) == 3:
+			self.write_meta_data(sys.argv[2])
+		else:
+			self.usage()
+			raise error.OCFErrUnimplemented("No agent selected")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Consistent assignment of work items to clone instances.
+
+Clone ids are contiguous (0 to clone_max - 1), so jump consistent hashing
+(Lamping and Veach) maps each item onto a clone id with a single hash of the
+item and O(log clone_max) steps. When clone_max changes only the items of the
+added or removed ids move (about 1/clone_max of them). rendezvous() serves
+arbitrary, non-contiguous id sets.
+"""
+
+import hashlib
+import struct
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def key_hash(key):
+	"""stable 64 bit hash of key (str() of other objects)"""
+	if isinstance(key, unicode):
+		key = key.encode("utf-8")
+	return struct.unpack("<Q", hashlib.md5(str(key)).digest()[:8])[0]
+
+
+def jump(key, buckets):
+	"""bucket (0 to buckets - 1) of key using jump consistent hashing"""
+	if buckets < 1:
+		raise RuntimeError("Number of buckets must be positive, got %r" % buckets)
+	h = key_hash(key)
+	b, j = -1, 0
+	while j < buckets:
+		b = j
+		h = (h * 2862933555777941757 + 1) & _MASK64
+		j = int((b + 1) * (float(1 << 31) / float((h >> 33) + 1)))
+	return b
+
+
+def rendezvous(key, ids):
+	"""id of ids owning key using rendezvous (highest random weight) hashing"""
+	if not ids:
+		raise RuntimeError("No ids to assign %r to" % key)
+	return max(ids, key=lambda i: key_hash("%s\0%s" % (key, i)))
+
+
+def shard(items, index, count, key=str):
+	"""items owned by clone index of count clones. key maps an item to its hash key"""
+	if not 0 <= index < count:
+		raise RuntimeError("Clone id %r is out of range for %r clones" % (index, count))
+	return [item for item in items if jump(key(item), count) == index]
+
+
+def assignment(items, count, key=str):
+	"""mapping of clone id to the list of its items for count clones"""
+	result = dict((i, []) for i in range(count))
+	for item in items:
+		result[jump(key(item), count)].append(item)
+	return result
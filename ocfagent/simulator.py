@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Local lrmd stand-in for load-testing resource agents.
+
+Drives an agent script through start, recurring monitor, promote/demote,
+notify and stop for many resource instances with the environment lrmd would
+pass (OCF_RESKEY_CRM_meta_*, clone instance names). Operations run as
+subprocesses with configurable concurrency and are killed at their timeout
+like lrmd does. At the end throughput, latency percentiles, scheduling lag
+and timeout rates are reported per action. Runs fully offline.
+
+Usage: python -m ocfagent.simulator AGENT [options]
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from . import error
+
+
+class Operation(object):
+	"""a scheduled agent operation"""
+	__slots__ = ("due", "resource", "action", "notify", "result")
+
+	def __init__(self, due, resource, action, notify=None):
+		self.due = due
+		self.resource = resource
+		self.action = action
+		self.notify = notify
+		self.result = None
+
+
+class Resource(object):
+	"""simulated resource instance"""
+	def __init__(self, index, name, promote):
+		self.index = index
+		self.name = name
+		self.promote = promote
+		self.promoted = False
+		self.stopped = False
+
+
+class Stats(object):
+	"""collected results per action"""
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.latencies = {}
+		self.lags = {}
+		self.codes = {}
+		self.timeouts = {}
+
+	def add(self, action, latency, lag, code, timed_out):
+		"""add the result of one operation"""
+		with self.lock:
+			self.latencies.setdefault(action, []).append(latency)
+			self.lags.setdefault(action, []).append(lag)
+			codes = self.codes.setdefault(action, {})
+			codes[code] = codes.get(code, 0) + 1
+			self.timeouts[action] = self.timeouts.get(action, 0) + (1 if timed_out else 0)
+
+
+def percentile(values, fraction):
+	"""percentile of sorted values (nearest rank)"""
+	if not values:
+		return 0.0
+	index = min(len(values) - 1, max(0, int(math.ceil(fraction * len(values))) - 1))
+	return values[index]
+
+
+class Simulator(object):
+	"""scheduler standing in for lrmd"""
+	def __init__(self, args):
+		self.args = args
+		self.stats = Stats()
+		self.queue = []
+		self.queue_lock = threading.Condition()
+		self.sequence = 0
+		self.running = 0
+		self.end_time = None
+		self.rsctmp = tempfile.mkdtemp(prefix="ocfagent-simulator-")
+		resource_type = os.path.basename(args.agent)
+		self.base_env = dict(os.environ)
+		self.base_env.update({
+			"OCF_ROOT": args.ocf_root,
+			"OCF_RA_VERSION_MAJOR": "1",
+			"OCF_RA_VERSION_MINOR": "0",
+			"OCF_RESOURCE_TYPE": resource_type,
+			"OCF_RESOURCE_PROVIDER": args.provider,
+			"HA_RSCTMP": self.rsctmp,
+			"OCF_RESKEY_CRM_meta_on_node": args.node,
+		})
+		for param in args.param:
+			key, _, value = param.partition("=")
+			self.base_env["OCF_RESKEY_%s" % key] = value
+		if args.clone:
+			self.base_env.update({
+				"OCF_RESKEY_CRM_meta_clone_max": str(args.resources),
+				"OCF_RESKEY_CRM_meta_clone_node_max": str(args.resources),
+				"OCF_RESKEY_CRM_meta_globally_unique": "false",
+				"OCF_RESKEY_CRM_meta_notify": "true" if args.notify else "false",
+			})
+		self.resources = []
+		for i in range(args.resources):
+			name = "%s:%i" % (args.name, i) if args.clone else "%s%i" % (args.name, i)
+			self.resources.append(Resource(i, name, i < args.promote))
+
+	def environment(self, op):
+		"""environment of op as lrmd would pass it"""
+		env = dict(self.base_env)
+		env["OCF_RESOURCE_INSTANCE"] = op.resource.name
+		env["OCF_RESKEY_CRM_meta_timeout"] = str(int(self.args.timeout * 1000))
+		if self.args.clone:
+			env["OCF_RESKEY_CRM_meta_clone"] = str(op.resource.index)
+		if op.action == "monitor":
+			env["OCF_RESKEY_CRM_meta_interval"] = str(int(self.args.interval * 1000))
+			if op.resource.promoted:
+				env["OCF_RESKEY_CRM_meta_role"] = "Master"
+		if op.notify is not None:
+			notify_type, operation = op.notify
+			env["OCF_RESKEY_CRM_meta_notify_type"] = notify_type
+			env["OCF_RESKEY_CRM_meta_notify_operation"] = operation
+			env["OCF_RESKEY_CRM_meta_notify_%s_resource" % operation] = op.resource.name
+			env["OCF_RESKEY_CRM_meta_notify_%s_uname" % operation] = self.args.node
+			env["OCF_RESKEY_CRM_meta_notify_active_resource"] = " ".join(r.name for r in self.resources if not r.stopped)
+			env["OCF_RESKEY_CRM_meta_notify_active_uname"] = " ".join(self.args.node for r in self.resources if not r.stopped)
+		return env
+
+	def schedule(self, due, resource, action, notify=None):
+		"""queue an operation due at time due"""
+		with self.queue_lock:
+			self.sequence += 1
+			heapq.heappush(self.queue, (due, self.sequence, Operation(due, resource, action, notify)))
+			self.queue_lock.notify()
+
+	def schedule_with_notify(self, due, resource, action):
+		"""queue action, bracketed by pre and post notifications if enabled"""
+		if self.args.notify:
+			self.schedule(due, resource, "notify", ("pre", action))
+		else:
+			self.schedule(due, resource, action)
+
+	def execute(self, op):
+		"""run op as subprocess, killing it at the timeout. Returns exit code, latency and timeout flag"""
+		start = time.time()
+		with open(os.devnull, "w") as devnull:
+			proc = subprocess.Popen([self.args.python, self.args.agent, op.action], env=self.environment(op), stdout=devnull, stderr=devnull, close_fds=True)
+			killed = []
+
+			def kill():
+				"""kill op at timeout like lrmd"""
+				killed.append(True)
+				try:
+					proc.send_signal(signal.SIGKILL)
+				except OSError:
+					pass
+
+			timer = threading.Timer(self.args.timeout, kill)
+			timer.start()
+			code = proc.wait()
+			timer.cancel()
+		return code, time.time() - start, bool(killed)
+
+	def follow_up(self, op, code, now):
+		"""schedule the next operation of the resource after op completed"""
+		resource = op.resource
+		finished = now >= self.end_time
+		if op.notify is not None:
+			notify_type, operation = op.notify
+			if notify_type == "pre":
+				self.schedule(now, resource, operation)
+			else:
+				self.next_after(resource, operation, now, finished)
+			return
+		if self.args.notify and op.action in ["start", "stop", "promote", "demote"]:
+			self.schedule(now, resource, "notify", ("post", op.action))
+			return
+		self.next_after(resource, op.action, now, finished)
+
+	def next_after(self, resource, action, now, finished):
+		"""schedule what follows action (after its post notification)"""
+		if action == "stop":
+			resource.stopped = True
+			return
+		if action == "promote":
+			resource.promoted = True
+		elif action == "demote":
+			resource.promoted = False
+			self.schedule_with_notify(now, resource, "stop")
+			return
+		if finished:
+			if resource.promoted:
+				self.schedule_with_notify(now, resource, "demote")
+			else:
+				self.schedule_with_notify(now, resource, "stop")
+		elif action == "start" and resource.promote:
+			self.schedule_with_notify(now, resource, "promote")
+		else:
+			self.schedule(now + self.args.interval, resource, "monitor")
+
+	def worker(self):
+		"""worker thread executing due operations"""
+		while True:
+			with self.queue_lock:
+				while True:
+					if not self.queue and self.running == 0:
+						self.queue_lock.notify_all()
+						return
+					if self.queue and self.queue[0][0] <= time.time():
+						_, _, op = heapq.heappop(self.queue)
+						self.running += 1
+						break
+					timeout = 0.1
+					if self.queue:
+						timeout = min(timeout, max(0.0, self.queue[0][0] - time.time()))
+					self.queue_lock.wait(timeout)
+			try:
+				lag = time.time() - op.due
+				code, latency, timed_out = self.execute(op)
+				action = op.action if op.notify is None else "notify"
+				self.stats.add(action, latency, lag, code, timed_out)
+				self.follow_up(op, code, time.time())
+			finally:
+				with self.queue_lock:
+					self.running -= 1
+					self.queue_lock.notify_all()
+
+	def run(self):
+		"""run the simulation and return the report"""
+		start = time.time()
+		self.end_time = start + self.args.duration
+		# stagger starts over one monitor interval
+		for resource in self.resources:
+			self.schedule_with_notify(start + self.args.interval * resource.index / max(1, len(self.resources)), resource, "start")
+		threads = [threading.Thread(target=self.worker) for _ in range(self.args.concurrency)]
+		for thread in threads:
+			thread.daemon = True
+			thread.start()
+		for thread in threads:
+			while thread.is_alive():
+				thread.join(0.5)
+		elapsed = time.time() - start
+		shutil.rmtree(self.rsctmp, ignore_errors=True)
+		return self.report(elapsed)
+
+	def report(self, elapsed):
+		"""build the report dictionary"""
+		actions = {}
+		total = 0
+		for action, latencies in self.stats.latencies.items():
+			latencies = sorted(latencies)
+			lags = sorted(self.stats.lags[action])
+			total += len(latencies)
+			actions[action] = {
+				"count": len(latencies),
+				"exit_codes": dict((str(code), count) for code, count in self.stats.codes[action].items()),
+				"timeouts": self.stats.timeouts[action],
+				"timeout_rate": self.stats.timeouts[action] / float(len(latencies)),
+				"latency_p50": percentile(latencies, 0.5),
+				"latency_p90": percentile(latencies, 0.9),
+				"latency_p99": percentile(latencies, 0.99),
+				"latency_max": latencies[-1],
+				"lag_p50": percentile(lags, 0.5),
+				"lag_p99": percentile(lags, 0.99),
+			}
+		return {"elapsed": elapsed, "operations": total, "throughput": total / elapsed if elapsed else 0.0, "actions": actions}
+
+
+def print_report(report):
+	"""print report as table"""
+	print ("%i operations in %.1fs (%.1f ops/s)" % (report["operations"], report["elapsed"], report["throughput"]))
+	print ("%-10s %7s %8s %9s %9s %9s %9s %9s  %s" % ("action", "count", "timeouts", "p50 ms", "p90 ms", "p99 ms", "max ms", "lag p99", "exit codes"))
+	for action in sorted(report["actions"]):
+		a = report["actions"][action]
+		codes = " ".join("%s:%i" % item for item in sorted(a["exit_codes"].items()))
+		print ("%-10s %7i %7.1f%% %9.1f %9.1f %9.1f %9.1f %9.1f  %s" % (action, a["count"], a["timeout_rate"] * 100, a["latency_p50"] * 1000, a["latency_p90"] * 1000, a["latency_p99"] * 1000, a["latency_max"] * 1000, a["lag_p99"] * 1000, codes))
+
+
+def main(argv=None):
+	"""command line entry point"""
+	parser = argparse.ArgumentParser(description="Local lrmd stand-in for load-testing OCF resource agents")
+	parser.add_argument("agent", help="agent script")
+	parser.add_argument("--resources", type=int, default=10, help="number of resource instances (default 10)")
+	parser.add_argument("--clone", action="store_true", help="simulate clone instances <name>:<id>")
+	parser.add_argument("--promote", type=int, default=0, help="number of instances to promote (default 0)")
+	parser.add_argument("--notify", action="store_true", help="bracket start/stop/promote/demote with notify pre/post")
+	parser.add_argument("--interval", type=float, default=5.0, help="monitor interval in seconds (default 5)")
+	parser.add_argument("--duration", type=float, default=30.0, help="seconds until resources are stopped (default 30)")
+	parser.add_argument("--concurrency", type=int, default=10, help="maximum concurrent operations (default 10)")
+	parser.add_argument("--timeout", type=float, default=20.0, help="operation timeout in seconds (default 20)")
+	parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE", help="resource parameter (repeatable)")
+	parser.add_argument("--name", default="rsc", help="resource name prefix (default rsc)")
+	parser.add_argument("--node", default="node1", help="node name (default node1)")
+	parser.add_argument("--provider", default="local", help="resource provider (default local)")
+	parser.add_argument("--ocf-root", default="/usr/lib/ocf", help="OCF_ROOT (default /usr/lib/ocf)")
+	parser.add_argument("--python", default=sys.executable, help="interpreter running the agent")
+	parser.add_argument("--json", help="write report as JSON to this file")
+	args = parser.parse_args(argv)
+	if args.promote > args.resources:
+		parser.error("--promote must not exceed --resources")
+
+	report = Simulator(args).run()
+	print_report(report)
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump(report, f, indent=2, sort_keys=True)
+	failed = sum(a["timeouts"] for a in report["actions"].values())
+	return error.OCF_ERR_GENERIC if failed else error.OCF_SUCCESS
+
+
+if __name__ == "__main__":
+	sys.exit(main())
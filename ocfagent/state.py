@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Per-instance persistent state store.
+
+Keeps small values (pids, cached lookups, last check results) of one resource
+instance across agent invocations in a marshal file in HA_RSCTMP. The file is
+read on first access and written atomically (temporary file, fsync, rename)
+by ResourceAgent after the handler ran if values were changed. It is removed
+after a successful stop.
+"""
+
+import errno
+import marshal
+import os
+
+from .cache import instance_filename
+
+
+class StateStore(object):
+	"""state of one resource instance (key) stored in directory"""
+	def __init__(self, directory, key):
+		self.directory = directory
+		self.path = os.path.join(directory, "%s.state" % instance_filename(key))
+		self._values = None
+		self.dirty = False
+
+	@property
+	def values(self):
+		"""dictionary of stored values (loaded on first access)"""
+		if self._values is None:
+			try:
+				with open(self.path, "rb") as f:
+					values = marshal.load(f)
+			except (IOError, OSError, EOFError, ValueError, TypeError):
+				values = {}
+			self._values = values if isinstance(values, dict) else {}
+		return self._values
+
+	def __contains__(self, name):
+		return name in self.values
+
+	def get(self, name, default=None):
+		"""get value name or default if it is not stored"""
+		return self.values.get(name, default)
+
+	def _get_typed(self, name, types, default):
+		"""get value name if it is an instance of types, default otherwise"""
+		value = self.values.get(name)
+		if isinstance(value, types) and not (bool not in types and isinstance(value, bool)):
+			return value
+		return default
+
+	def get_int(self, name, default=None):
+		"""get integer value name"""
+		return self._get_typed(name, (int, long), default)
+
+	def get_float(self, name, default=None):
+		"""get float value name (integers are converted)"""
+		value = self._get_typed(name, (float, int, long), None)
+		return default if value is None else float(value)
+
+	def get_str(self, name, default=None):
+		"""get string value name"""
+		return self._get_typed(name, (basestring,), default)
+
+	def get_bool(self, name, default=None):
+		"""get boolean value name"""
+		return self._get_typed(name, (bool,), default)
+
+	def get_list(self, name, default=None):
+		"""get list value name"""
+		return self._get_typed(name, (list, tuple), default)
+
+	def get_dict(self, name, default=None):
+		"""get dictionary value name"""
+		return self._get_typed(name, (dict,), default)
+
+	def set(self, name, value):
+		"""set value name. Values must be marshal serializable (None, numbers, strings, lists, tuples, dicts, sets)"""
+		try:
+			marshal.dumps(value)
+		except ValueError:
+			raise RuntimeError("State value %s of type %s can not be stored" % (name, type(value).__name__))
+		if self.values.get(name, self) != value:
+			self.values[name] = value
+			self.dirty = True
+
+	def update(self, **values):
+		"""set several values"""
+		for name, value in values.items():
+			self.set(name, value)
+
+	def delete(self, name):
+		"""remove value name if it is stored"""
+		if name in self.values:
+			del self.values[name]
+			self.dirty = True
+
+	def save(self):
+		"""write the state atomically if it was changed"""
+		if not self.dirty:
+			return
+		try:
+			os.makedirs(self.directory)
+		except OSError as e:
+			if e.errno != errno.EEXIST:
+				raise
+		tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+		with open(tmp_path, "wb") as f:
+			marshal.dump(self.values, f)
+			f.flush()
+			os.fsync(f.fileno())
+		os.rename(tmp_path, self.path)
+		# make the rename durable
+		fd = os.open(self.directory, os.O_RDONLY)
+		try:
+			os.fsync(fd)
+		finally:
+			os.close(fd)
+		self.dirty = False
+
+	def remove(self):
+		"""remove all stored values including the file"""
+		self._values = {}
+		self.dirty = False
+		try:
+			os.unlink(self.path)
+		except OSError as e:
+			if e.errno != errno.ENOENT:
+				raise
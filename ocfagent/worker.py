@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Warm worker mode for resource agents.
+
+A long-lived worker process keeps the agent class loaded and listens on a
+Unix socket. Constructing the agent (ResourceAgent.forward_call) forwards
+argv and environment of handler calls to the worker before anything is
+parsed, the worker forks a child per request to run the handler. If no
+worker is listening, the call falls back to in-process execution.
+"""
+
+import errno
+import marshal
+import os
+import signal
+import socket
+import sys
+import tempfile
+import traceback
+
+from . import error
+
+in_worker = False
+"""set in forked worker children so that calls are not forwarded again"""
+
+
+class WorkerUnavailable(Exception):
+	"""raised by the client if no worker is listening on the socket"""
+
+
+def _exit_code(code):
+	"""translate a SystemExit code into a process exit code"""
+	if code is None:
+		return 0
+	if isinstance(code, int):
+		return code
+	sys.stderr.write("%s\n" % (code,))
+	return 1
+
+
+def _read_all(sock):
+	"""read from socket until the peer shuts down its sending side"""
+	chunks = []
+	while True:
+		data = sock.recv(65536)
+		if not data:
+			return "".join(chunks)
+		chunks.append(data)
+
+
+def run_agent(agent_cls, argv, environ, testmode=False):
+	"""run an agent action in the current (forked) process capturing its output.
+	Returns a dictionary with exit code, stdout and stderr of the call."""
+	global in_worker  # pylint: disable=W0603
+	in_worker = True
+	os.environ.clear()
+	os.environ.update(environ)
+	sys.argv = list(argv)
+
+	out = tempfile.TemporaryFile()
+	err = tempfile.TemporaryFile()
+	sys.stdout.flush()
+	sys.stderr.flush()
+	os.dup2(out.fileno(), 1)
+	os.dup2(err.fileno(), 2)
+
+	# the forked child must not reuse an agent instance of the parent
+	agent_cls.instance = None
+	try:
+		agent = agent_cls(testmode=testmode)
+		agent.cmdline_call()
+		code = 0
+	except SystemExit as e:
+		code = _exit_code(e.code)
+	except Exception:  # pylint: disable=W0703
+		traceback.print_exc()
+		code = 1
+	sys.stdout.flush()
+	sys.stderr.flush()
+	out.seek(0)
+	err.seek(0)
+	return {"exit": code, "stdout": out.read(), "stderr": err.read()}
+
+
+def _handle_connection(agent_cls, conn):
+	"""handle a single client request in a forked child"""
+	request = marshal.loads(_read_all(conn))
+	result = run_agent(agent_cls, request["argv"], request["environ"], request["testmode"])
+	conn.sendall(marshal.dumps(result))
+	conn.close()
+
+
+def serve(agent_cls, path=None):
+	"""Run the worker for agent_cls listening on path (defaults to WORKER_SOCKET of the class).
+	Never returns."""
+	if path is None:
+		path = agent_cls.WORKER_SOCKET
+	if path is None:
+		raise RuntimeError("No worker socket path given for agent %s" % agent_cls.__name__)
+
+	try:
+		os.unlink(path)
+	except OSError as e:
+		if e.errno != errno.ENOENT:
+			raise
+
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	old_umask = os.umask(0o077)
+	try:
+		sock.bind(path)
+	finally:
+		os.umask(old_umask)
+	sock.listen(64)
+
+	# children are reaped automatically
+	signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+	while True:
+		try:
+			conn, _ = sock.accept()
+		except socket.error as e:
+			if e.errno == errno.EINTR:
+				continue
+			raise
+		pid = os.fork()
+		if pid == 0:
+			code = 0
+			try:
+				signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+				sock.close()
+				_handle_connection(agent_cls, conn)
+			except BaseException:  # pylint: disable=W0703
+				traceback.print_exc()
+				code = 1
+			finally:
+				os._exit(code)  # pylint: disable=W0212
+		conn.close()
+
+
+def call(path, argv, environ, testmode=False, timeout=None):
+	"""Forward a call to the worker listening on path. Raises WorkerUnavailable
+	if no worker is listening and OCFErrGeneric if it does not answer within
+	timeout seconds. Returns the result dictionary of run_agent."""
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	sock.settimeout(timeout)
+	try:
+		sock.connect(path)
+	except socket.timeout:
+		sock.close()
+		raise error.OCFErrGeneric("Worker on %s did not accept the call within %.1fs" % (path, timeout))
+	except socket.error as e:
+		sock.close()
+		if e.errno in (errno.ENOENT, errno.ECONNREFUSED, errno.EACCES, errno.ENOTSOCK):
+			raise WorkerUnavailable("No worker listening on %s" % path)
+		raise
+	try:
+		sock.sendall(marshal.dumps({"argv": list(argv), "environ": dict(environ), "testmode": testmode}))
+		sock.shutdown(socket.SHUT_WR)
+		data = _read_all(sock)
+	except socket.timeout:
+		raise error.OCFErrGeneric("Worker on %s did not answer within %.1fs" % (path, timeout))
+	finally:
+		sock.close()
+	if not data:
+		raise error.OCFErrGeneric("Worker on %s closed connection without result" % path)
+	return marshal.loads(data)
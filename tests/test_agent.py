@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import unittest
+
+import ocfagent.agent
+import ocfagent.parameter
+from ocfagent import error
+from ocfagent import probe
+
+
+class StatefulOCF(ocfagent.agent.ResourceAgent):
+	"""agent without reload"""
+	VERSION = "1.0"
+	SHORTDESC = "stateful test agent"
+	LONGDESC = "stateful test agent"
+
+	class OCFParameter_name(ocfagent.parameter.ResourceStringParameter):
+		"""name parameter
+Name of the instance"""
+		@property
+		def default(self):
+			return "default"
+
+	def handle_start(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_stop(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_monitor(self, timeout=20):  # pylint: disable=W0613
+		raise error.OCFNotRunning("stopped")
+
+
+class ReloadableOCF(StatefulOCF):
+	"""agent with reloadable parameters"""
+	class OCFParameter_name(ocfagent.parameter.ResourceStringParameter):
+		"""name parameter
+Name of the instance"""
+		@property
+		def reloadable(self):
+			return True
+
+	def handle_reload(self, timeout=20):  # pylint: disable=W0613
+		print ("diff %r" % (sorted(self.parameter_diff.items()),))
+
+	def handle_migrate_to(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_migrate_from(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+
+class AgentTestCase(unittest.TestCase):
+	"""runs agent calls in-process with an OCF environment and HA_RSCTMP in a temporary directory"""
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.saved = sys.argv, sys.stdout, dict(os.environ)
+		os.environ.update({
+			"OCF_ROOT": "/usr/lib/ocf",
+			"OCF_RA_VERSION_MAJOR": "1",
+			"OCF_RA_VERSION_MINOR": "0",
+			"OCF_RESOURCE_INSTANCE": "rsc",
+			"OCF_RESOURCE_TYPE": "Test",
+			"HA_RSCTMP": self.directory,
+		})
+
+	def tearDown(self):
+		sys.argv, sys.stdout = self.saved[:2]
+		os.environ.clear()
+		os.environ.update(self.saved[2])
+		shutil.rmtree(self.directory)
+
+	def call(self, agent_class, action, **environ):
+		"""run action of a new agent_class instance. Returns (exit code, stdout)"""
+		os.environ.update(environ)
+		sys.argv = [agent_class.__name__, action]
+		sys.stdout = StringIO.StringIO()
+		agent_class.instance = None
+		try:
+			agent_class().cmdline_call()
+			code = error.OCF_SUCCESS
+		except SystemExit as e:
+			code = e.code
+		finally:
+			output, sys.stdout = sys.stdout.getvalue(), self.saved[1]
+			agent_class.instance = None
+		return code, output
+
+
+class TestState(AgentTestCase):
+	def state_files(self):
+		directory = os.path.join(self.directory, "ocfagent")
+		return [entry for entry in os.listdir(directory) if entry.endswith(".state")] if os.path.isdir(directory) else []
+
+	def test_start_without_reload_writes_no_state(self):
+		self.assertEqual(self.call(StatefulOCF, "start")[0], error.OCF_SUCCESS)
+		self.assertEqual(self.state_files(), [])
+
+	def test_reload_diff(self):
+		self.assertEqual(self.call(ReloadableOCF, "start", OCF_RESKEY_name="a")[0], error.OCF_SUCCESS)
+		self.assertEqual(len(self.state_files()), 1)
+		self.assertEqual(self.call(ReloadableOCF, "reload", OCF_RESKEY_name="b"), (error.OCF_SUCCESS, "diff [('name', ('a', 'b'))]\n"))
+		self.assertEqual(self.call(ReloadableOCF, "stop")[0], error.OCF_SUCCESS)
+		self.assertEqual(self.state_files(), [])
+
+	def test_reload_after_migration(self):
+		self.assertEqual(self.call(ReloadableOCF, "migrate_to", OCF_RESKEY_name="a")[0], error.OCF_SUCCESS)
+		self.assertEqual(self.state_files(), [])
+		self.assertEqual(self.call(ReloadableOCF, "migrate_from", OCF_RESKEY_name="a")[0], error.OCF_SUCCESS)
+		self.assertEqual(self.call(ReloadableOCF, "reload", OCF_RESKEY_name="b"), (error.OCF_SUCCESS, "diff [('name', ('a', 'b'))]\n"))
+
+
+class CachedOCF(ReloadableOCF):
+	"""agent with monitor cache counting monitor handler calls"""
+	MONITOR_CACHE_TTL = 60
+	monitor_calls = 0
+
+	def handle_monitor(self, timeout=20):  # pylint: disable=W0613
+		CachedOCF.monitor_calls += 1
+		raise error.OCFSuccess("running")
+
+
+class TestMonitorCache(AgentTestCase):
+	def test_invalidated_by_reload(self):
+		CachedOCF.monitor_calls = 0
+		for action in ["monitor", "monitor", "reload", "monitor", "monitor"]:
+			self.assertEqual(self.call(CachedOCF, action, OCF_RESKEY_name="a")[0], error.OCF_SUCCESS)
+		self.assertEqual(CachedOCF.monitor_calls, 2)
+
+
+class TestShard(AgentTestCase):
+	def shard(self, instance, clone_max=None):
+		"""items assigned to instance of StatefulOCF"""
+		os.environ["OCF_RESOURCE_INSTANCE"] = instance
+		if clone_max is not None:
+			os.environ["OCF_RESKEY_CRM_meta_clone_max"] = str(clone_max)
+		sys.argv = ["StatefulOCF", "monitor"]
+		StatefulOCF.instance = None
+		try:
+			return StatefulOCF().shard(range(100))
+		finally:
+			StatefulOCF.instance = None
+
+	def test_not_a_clone(self):
+		self.assertEqual(self.shard("rsc"), range(100))
+
+	def test_clones_split_items(self):
+		shards = [self.shard("rsc:%i" % clone_id, 3) for clone_id in range(3)]
+		self.assertEqual(sorted(sum(shards, [])), range(100))
+
+	def test_clone_id_beyond_clone_max(self):
+		self.assertEqual(self.shard("rsc:3", 3), [])
+
+
+class ProbingOCF(StatefulOCF):
+	"""agent monitoring with the probes in PROBES"""
+	def handle_monitor(self, timeout=20):  # pylint: disable=W0613
+		self.run_probes()
+
+
+class TestProbes(AgentTestCase):
+	def test_no_probes(self):
+		ProbingOCF.PROBES = []
+		self.assertEqual(self.call(ProbingOCF, "monitor")[0], error.OCF_ERR_CONFIGURED)
+
+	def test_probes(self):
+		ProbingOCF.PROBES = [probe.FileFreshnessProbe(self.directory, 60), probe.PidfileProbe(os.path.join(self.directory, "pid"))]
+		self.assertEqual(self.call(ProbingOCF, "monitor")[0], error.OCF_ERR_GENERIC)
+		ProbingOCF.PROBES = ProbingOCF.PROBES[:1]
+		self.assertEqual(self.call(ProbingOCF, "monitor")[0], error.OCF_SUCCESS)
+
+
+class MetricsOCF(StatefulOCF):
+	"""agent recording metrics"""
+	class OCFParameter_count(ocfagent.parameter.ResourceIntParameter):
+		"""count parameter
+Some number"""
+
+
+class TestMetrics(AgentTestCase):
+	def setUp(self):
+		AgentTestCase.setUp(self)
+		MetricsOCF.METRICS_DIR = os.path.join(self.directory, "metrics")
+		os.mkdir(MetricsOCF.METRICS_DIR)
+
+	def exits(self, action, code):
+		"""number of calls of action exiting with code exported to the textfile"""
+		from ocfagent import metrics
+		metrics.flush(MetricsOCF.METRICS_DIR, "MetricsOCF")
+		with open(os.path.join(MetricsOCF.METRICS_DIR, "ocfagent_MetricsOCF.prom")) as f:
+			for line in f:
+				if line.startswith('ocfagent_action_exit_total{agent="MetricsOCF",action="%s",instance="rsc",code="%i"}' % (action, code)):
+					return int(line.split()[-1])
+		return 0
+
+	def test_handler_exit(self):
+		self.assertEqual(self.call(MetricsOCF, "monitor")[0], error.OCF_NOT_RUNNING)
+		self.assertEqual(self.exits("monitor", error.OCF_NOT_RUNNING), 1)
+
+	def test_invalid_parameter(self):
+		self.assertEqual(self.call(MetricsOCF, "start", OCF_RESKEY_count="many")[0], error.OCF_ERR_CONFIGURED)
+		self.assertEqual(self.exits("start", error.OCF_ERR_CONFIGURED), 1)
+
+	def test_missing_environment(self):
+		del os.environ["OCF_ROOT"]
+		self.assertEqual(self.call(MetricsOCF, "monitor")[0], error.OCF_ERR_ARGS)
+		self.assertEqual(self.exits("monitor", error.OCF_ERR_ARGS), 1)
+
+
+if __name__ == "__main__":
+	unittest.main()
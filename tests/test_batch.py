@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import StringIO
+import sys
+
+import ocfagent.agent
+import ocfagent.parameter
+from ocfagent import batch
+from ocfagent import error
+from tests.test_agent import AgentTestCase
+
+
+class BatchOCF(ocfagent.agent.ResourceAgent):
+	"""agent printing its name parameter to stderr on monitor"""
+	VERSION = "1.0"
+	SHORTDESC = "batch test agent"
+	LONGDESC = "batch test agent"
+
+	class OCFParameter_name(ocfagent.parameter.ResourceStringParameter):
+		"""name parameter
+Name of the instance"""
+
+	def handle_start(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_stop(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_monitor(self, timeout=20):  # pylint: disable=W0613
+		sys.stderr.write("name=%s\n" % self.get_parameter("name"))
+		raise error.OCFNotRunning("stopped")
+
+
+class TestBatch(AgentTestCase):
+	def run_batch(self, instances):
+		sys.argv = ["BatchOCF", "batch", "monitor"]
+		BatchOCF.instance = None
+		agent = BatchOCF()
+		output = StringIO.StringIO()
+		results = batch.run(agent, "monitor", instances, output, concurrency=2)
+		BatchOCF.instance = None
+		# one line per instance in completion order
+		self.assertEqual(sorted((json.loads(line) for line in output.getvalue().splitlines()), key=lambda result: result["index"]), results)
+		return results
+
+	def test_non_ascii_values(self):
+		results = self.run_batch([
+			{"OCF_RESOURCE_INSTANCE": u"rsc-ä", "OCF_RESKEY_name": u"Größe"},
+			{"OCF_RESOURCE_INSTANCE": "rsc-2", "OCF_RESKEY_name": 17},
+		])
+		self.assertEqual([result["exit"] for result in results], [error.OCF_NOT_RUNNING] * 2)
+		self.assertEqual(results[0]["instance"], u"rsc-ä")
+		self.assertEqual(results[0]["stderr"], u"name=Größe\n")
+		self.assertEqual(results[1]["stderr"], u"name=17\n")
+
+	def test_bad_instance_fails_alone(self):
+		results = self.run_batch([
+			{"OCF_RESOURCE_INSTANCE": "rsc-1", "OCF_RESKEY_name": "a"},
+			{"OCF_RESOURCE_INSTANCE": "rsc-2", "OCF_RESKEY_name": "b", "OCF_RESKEY_CRM_meta_timeout": "soon"},
+			{"OCF_RESOURCE_INSTANCE": "rsc-3", "OCF_RESKEY_name": "c"},
+		])
+		self.assertEqual([result["exit"] for result in results], [error.OCF_NOT_RUNNING, error.OCF_ERR_GENERIC, error.OCF_NOT_RUNNING])
+		self.assertEqual(results[1]["instance"], "rsc-2")
+		self.assertTrue(results[1]["stderr"].startswith("Starting instance failed"))
+
+	def test_all_instances_bad(self):
+		results = self.run_batch([{"OCF_RESOURCE_INSTANCE": "rsc-1", "OCF_RESKEY_CRM_meta_timeout": "soon"}])
+		self.assertEqual(results[0]["exit"], error.OCF_ERR_GENERIC)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import signal
+import time
+import unittest
+
+from ocfagent import command
+from ocfagent import deadline
+from ocfagent import error
+
+TERM_TRAP = ["sh", "-c", "trap 'echo terminated; exit 3' TERM; echo started; while :; do sleep 0.05; done"]
+"""command writing output on SIGTERM"""
+
+TERM_IGNORED = ["sh", "-c", "trap '' TERM; while :; do sleep 0.05; done"]
+"""command surviving SIGTERM"""
+
+
+class TestCommand(unittest.TestCase):
+	def test_run(self):
+		result = command.run(["sh", "-c", "echo out; echo err >&2"], timeout=5)
+		self.assertEqual((result.returncode, result.stdout, result.stderr, result.timed_out), (0, "out\n", "err\n", False))
+
+	def test_failures(self):
+		self.assertRaises(error.OCFErrInstalled, command.run, ["/nonexistent/command"])
+		self.assertRaises(error.OCFErrGeneric, command.run, ["sh", "-c", "exit 2"])
+		self.assertEqual(command.run(["sh", "-c", "exit 2"], check=False).returncode, 2)
+
+	def test_output_is_bounded(self):
+		result = command.run(["sh", "-c", "seq 100000"], max_output=100)
+		self.assertTrue(result.stdout_truncated)
+		self.assertEqual(result.stdout, "".join("%i\n" % i for i in range(1, 100001))[-100:])
+
+	def test_term_handler_runs_before_soft_deadline(self):
+		budget = deadline.Deadline(1.5, 0)
+		with deadline.enforce(budget):
+			result = command.run(TERM_TRAP, budget, kill_grace=0.5, check=False)
+		self.assertTrue(result.timed_out)
+		self.assertEqual(result.returncode, 3)
+		self.assertEqual(result.stdout, "started\nterminated\n")
+		self.assertTrue(budget.remaining() > 0)
+
+	def test_kill_after_grace(self):
+		budget = deadline.Deadline(1.0, 0)
+		with deadline.enforce(budget):
+			start = time.time()
+			result = command.run(TERM_IGNORED, budget, kill_grace=0.3, check=False)
+		self.assertTrue(result.timed_out)
+		self.assertEqual(result.returncode, -signal.SIGKILL)
+		self.assertTrue(time.time() - start < 1.0)
+
+	def test_timeout(self):
+		start = time.time()
+		self.assertRaises(error.OCFErrGeneric, command.run, TERM_TRAP, timeout=0.3, kill_grace=0.5)
+		self.assertTrue(time.time() - start < 1.5)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+
+import ocfagent.agent
+from ocfagent import deadline
+from ocfagent import error
+from tests.test_agent import AgentTestCase
+
+
+class SlowOCF(ocfagent.agent.ResourceAgent):
+	"""agent whose start sleeps SLEEP seconds and records its time budget"""
+	VERSION = "1.0"
+	SHORTDESC = "slow test agent"
+	LONGDESC = "slow test agent"
+	SLEEP = 0
+	budget = None
+
+	def handle_start(self, timeout="500ms"):  # pylint: disable=W0613
+		SlowOCF.budget = self.deadline.timeout
+		time.sleep(self.SLEEP)
+
+	def handle_stop(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_monitor(self, timeout=20):  # pylint: disable=W0613
+		raise error.OCFNotRunning("stopped")
+
+
+class TestParseTimeout(unittest.TestCase):
+	def test_units(self):
+		for value, seconds in [(10, 10.0), (1.5, 1.5), ("20", 20.0), ("20s", 20.0), ("20sec", 20.0), ("500ms", 0.5),
+				("500msec", 0.5), ("2m", 120.0), ("2min", 120.0), ("1h", 3600.0), ("1hr", 3600.0), (" 3S ", 3.0)]:
+			self.assertEqual(deadline.parse_timeout(value), seconds)
+
+	def test_invalid(self):
+		self.assertRaises(ValueError, deadline.parse_timeout, "soon")
+
+
+class TestDeadline(unittest.TestCase):
+	def test_margin(self):
+		budget = deadline.Deadline(10, 0.1)
+		self.assertEqual(budget.soft_timeout, 9.0)
+		self.assertTrue(8.9 < budget.remaining() <= 9.0)
+		self.assertFalse(budget.expired)
+		budget.check()
+
+	def test_expired(self):
+		budget = deadline.Deadline(0.01, 0)
+		time.sleep(0.02)
+		self.assertTrue(budget.expired)
+		self.assertEqual(budget.remaining(), 0.0)
+		self.assertRaises(deadline.DeadlineExceeded, budget.check)
+
+
+class TestEnforce(AgentTestCase):
+	def setUp(self):
+		AgentTestCase.setUp(self)
+		SlowOCF.SLEEP = 0
+		SlowOCF.budget = None
+
+	def tearDown(self):
+		SlowOCF.ENFORCE_DEADLINE = True
+		SlowOCF.DEADLINE_ERROR = error.OCFErrGeneric
+		AgentTestCase.tearDown(self)
+
+	def test_handler_timeout(self):
+		self.assertEqual(self.call(SlowOCF, "start")[0], error.OCF_SUCCESS)
+		self.assertEqual(SlowOCF.budget, 0.5)
+
+	def test_meta_timeout_takes_precedence(self):
+		self.assertEqual(self.call(SlowOCF, "start", OCF_RESKEY_CRM_meta_timeout="3000")[0], error.OCF_SUCCESS)
+		self.assertEqual(SlowOCF.budget, 3.0)
+
+	def test_overrun(self):
+		SlowOCF.SLEEP = 2
+		start = time.time()
+		self.assertEqual(self.call(SlowOCF, "start")[0], error.OCF_ERR_GENERIC)
+		# interrupted at the soft deadline of 90% of the timeout
+		self.assertTrue(0.4 < time.time() - start < 0.9)
+
+	def test_deadline_error(self):
+		SlowOCF.SLEEP = 2
+		SlowOCF.DEADLINE_ERROR = error.OCFNotRunning
+		self.assertEqual(self.call(SlowOCF, "start")[0], error.OCF_NOT_RUNNING)
+
+	def test_not_enforced(self):
+		SlowOCF.SLEEP = 0.7
+		SlowOCF.ENFORCE_DEADLINE = False
+		self.assertEqual(self.call(SlowOCF, "start")[0], error.OCF_SUCCESS)
+
+
+if __name__ == "__main__":
+	unittest.main()
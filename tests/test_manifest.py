@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import imp
+import os
+import unittest
+
+from ocfagent import manifest
+from tests.test_agent import AgentTestCase
+
+SOURCE = '''
+import os
+import ocfagent.agent
+import ocfagent.parameter
+
+
+class ManifestOCF(ocfagent.agent.ResourceAgent):
+	"""agent with a manifest"""
+	VERSION = "1.0"
+	SHORTDESC = "manifest test agent"
+	LONGDESC = "manifest test agent"
+	MANIFEST = os.environ["TEST_MANIFEST"]
+
+	class OCFParameter_name(ocfagent.parameter.ResourceStringParameter):
+		"""name parameter
+Name of the instance"""
+		@property
+		def required(self):
+			return True
+
+	def handle_start(self, timeout=20):
+		pass
+
+	def handle_stop(self, timeout="30s"):
+		pass
+
+	def handle_monitor(self, timeout=20, interval=10):
+		pass
+
+	def handle_monitor_10(self, timeout=40):
+		pass
+
+
+class OtherOCF(ManifestOCF):
+	"""agent of another name in the same source file"""
+'''
+
+
+class TestManifest(AgentTestCase):
+	def setUp(self):
+		AgentTestCase.setUp(self)
+		self.source = os.path.join(self.directory, "manifest_agent.py")
+		with open(self.source, "w") as f:
+			f.write(SOURCE)
+		# whole seconds survive os.utime unchanged
+		os.utime(self.source, (1000000000, 1000000000))
+		self.path = os.environ["TEST_MANIFEST"] = os.path.join(self.directory, "agent.manifest")
+		self.module = imp.load_source("manifest_agent", self.source)
+		self.agent_class = self.module.ManifestOCF
+
+	def load(self):
+		"""recompute the class specs and return whether the manifest is used"""
+		self.agent_class.init_class()
+		return self.agent_class._manifest is not None  # pylint: disable=W0212
+
+	def test_fresh_manifest_is_used(self):
+		self.assertFalse(self.load())
+		handlers = self.agent_class._handlers  # pylint: disable=W0212
+		depths = self.agent_class._monitor_depths  # pylint: disable=W0212
+		self.assertEqual(self.call(self.agent_class, "manifest")[0], 0)
+		self.assertTrue(self.load())
+		self.assertEqual(self.agent_class._handlers, handlers)  # pylint: disable=W0212
+		self.assertEqual(self.agent_class._monitor_depths, depths)  # pylint: disable=W0212
+		self.assertEqual(self.agent_class._required_parameters, ["name"])  # pylint: disable=W0212
+
+	def test_meta_data_identical(self):
+		self.load()
+		introspected = self.call(self.agent_class, "meta-data")
+		self.call(self.agent_class, "manifest")
+		self.assertTrue(self.load())
+		self.assertEqual(self.call(self.agent_class, "meta-data"), introspected)
+		self.assertTrue(introspected[1].startswith(manifest.load(self.agent_class, self.path)["meta_data"]))
+
+	def test_source_changed(self):
+		self.call(self.agent_class, "manifest")
+		os.utime(self.source, (1000000000, 1000000001))
+		self.assertFalse(self.load())
+		os.utime(self.source, (1000000000, 1000000000))
+		self.assertTrue(self.load())
+		with open(self.source, "a") as f:
+			f.write("\n")
+		os.utime(self.source, (1000000000, 1000000000))
+		self.assertFalse(self.load())
+
+	def test_framework_version_changed(self):
+		self.call(self.agent_class, "manifest")
+		version = manifest.__version__
+		manifest.__version__ = "0.0"
+		try:
+			self.assertFalse(self.load())
+		finally:
+			manifest.__version__ = version
+		self.assertTrue(self.load())
+
+	def test_other_class(self):
+		self.call(self.agent_class, "manifest")
+		self.assertEqual(manifest.load(self.module.OtherOCF, self.path), None)
+		self.assertNotEqual(manifest.load(self.agent_class, self.path), None)
+
+	def test_missing_or_corrupt(self):
+		self.assertEqual(manifest.load(self.agent_class, self.path), None)
+		with open(self.path, "w") as f:
+			f.write("garbage")
+		self.assertEqual(manifest.load(self.agent_class, self.path), None)
+
+
+if __name__ == "__main__":
+	unittest.main()
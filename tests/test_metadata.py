@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import unittest
+
+from lxml import etree
+
+import example
+import ocfagent.agent
+import ocfagent.parameter
+from ocfagent import metadata
+
+
+class SpecialCharactersOCF(ocfagent.agent.ResourceAgent):
+	"""agent with markup characters, whitespace and non-ASCII text in its meta-data"""
+	VERSION = "1.0 & <2>"
+	SHORTDESC = u"Größe \"quoted\" & <tagged>"
+	LONGDESC = u"Line one\n\tindented <line> two & 'three'\nÄÖÜ ß € \"end\"\r\n"
+
+	class OCFParameter_special(ocfagent.parameter.ResourceStringParameter):
+		u"""special parameter with "quotes" & <markup>
+	Tab	separated & <escaped>
+Umlauts äöü and "quotes" > end"""
+		@property
+		def default(self):
+			return "a \"quoted\" & <b>\tc\nd\re"
+
+	class OCFParameter_number(ocfagent.parameter.ResourceIntParameter):
+		"""number parameter
+Range checked"""
+		@property
+		def default(self):
+			return 5
+
+		@property
+		def minimum(self):
+			return 1
+
+	class OCFParameter_mode(ocfagent.parameter.ResourceStringParameter):
+		"""mode parameter
+Operating mode"""
+		choices = ["fast", "safe"]
+
+	def handle_start(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_stop(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_monitor(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+
+def lxml_tostring(root):
+	"""serialize root the way meta-data was written with lxml"""
+	return etree.tostring(metadata.to_lxml(root), pretty_print=True, xml_declaration=True, encoding="utf-8", doctype=metadata.DOCTYPE)
+
+
+def meta_data_tree(agent_class):
+	"""meta-data element tree of agent_class called for the meta-data action"""
+	saved_argv = sys.argv
+	sys.argv = [agent_class.__name__, "meta-data"]
+	try:
+		return agent_class().meta_data_tree()
+	finally:
+		sys.argv = saved_argv
+
+
+class TestMetadata(unittest.TestCase):
+	def assertSameAsLxml(self, root):
+		self.assertEqual(metadata.tostring(root), lxml_tostring(root))
+
+	def test_example_agent(self):
+		self.assertSameAsLxml(meta_data_tree(example.TestOCF))
+
+	def test_special_characters(self):
+		root = meta_data_tree(SpecialCharactersOCF)
+		self.assertSameAsLxml(root)
+		output = metadata.tostring(root)
+		self.assertTrue(u"Größe".encode("utf-8") in output)
+		self.assertTrue("&amp; &lt;2&gt;" in output)
+		etree.fromstring(output)
+
+	def test_choices_in_longdesc(self):
+		output = metadata.tostring(meta_data_tree(SpecialCharactersOCF))
+		self.assertTrue("Operating mode\nAllowed values: fast, safe.</longdesc>" in output)
+		self.assertFalse("select" in output)
+		self.assertFalse("<option" in output)
+
+	def test_elements(self):
+		root = metadata.Element("root", {"b": "2", "a": "&\"<>\t\n\r"})
+		metadata.SubElement(root, "empty")
+		metadata.SubElement(root, "text", {"lang": "en"}, "& < > \" \t \n \r")
+		metadata.SubElement(root, "unicode", text=u"€ ß")
+		child = metadata.SubElement(root, "nested")
+		metadata.SubElement(child, "empty_text", text="")
+		self.assertSameAsLxml(root)
+
+
+if __name__ == "__main__":
+	unittest.main()
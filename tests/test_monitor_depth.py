@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import unittest
+
+import ocfagent.agent
+from ocfagent import error
+from tests.test_agent import AgentTestCase
+
+
+class DeepOCF(ocfagent.agent.ResourceAgent):
+	"""agent with monitor depths 10 and 20 printing the depth and timeout of the monitor called"""
+	VERSION = "1.0"
+	SHORTDESC = "monitor depth test agent"
+	LONGDESC = "monitor depth test agent"
+
+	def handle_start(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_stop(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_monitor(self, timeout=20, interval=10):  # pylint: disable=W0613
+		print ("0 %.1f" % self.deadline.timeout)
+
+	def handle_monitor_10(self, timeout=40, interval=60):  # pylint: disable=W0613
+		print ("10 %.1f" % self.deadline.timeout)
+
+	def handle_monitor_20(self, timeout="2min"):  # pylint: disable=W0613
+		print ("20 %.1f" % self.deadline.timeout)
+
+
+class TestMonitorDepth(AgentTestCase):
+	def monitor(self, level=None):
+		"""output of monitor called with OCF_CHECK_LEVEL level"""
+		environ = {"OCF_CHECK_LEVEL": level} if level is not None else {}
+		code, output = self.call(DeepOCF, "monitor", **environ)
+		self.assertEqual(code, error.OCF_SUCCESS)
+		return output
+
+	def test_dispatch(self):
+		self.assertEqual(self.monitor(), "0 20.0\n")
+		self.assertEqual(self.monitor("0"), "0 20.0\n")
+		self.assertEqual(self.monitor("5"), "0 20.0\n")
+		self.assertEqual(self.monitor("10"), "10 40.0\n")
+		self.assertEqual(self.monitor("15"), "10 40.0\n")
+		self.assertEqual(self.monitor("20"), "20 120.0\n")
+		self.assertEqual(self.monitor("99"), "20 120.0\n")
+
+	def test_meta_timeout_takes_precedence(self):
+		self.assertEqual(self.call(DeepOCF, "monitor", OCF_CHECK_LEVEL="20", OCF_RESKEY_CRM_meta_timeout="5000")[1], "20 5.0\n")
+
+	def test_invalid_level(self):
+		self.assertEqual(self.call(DeepOCF, "monitor", OCF_CHECK_LEVEL="deep")[0], error.OCF_ERR_ARGS)
+
+	def test_invalid_handler_name(self):
+		def define():
+			class BadDepthOCF(DeepOCF):  # pylint: disable=W0612
+				"""agent with a monitor handler without depth"""
+				def handle_monitor_deep(self, timeout=20):  # pylint: disable=W0613
+					pass
+		self.assertRaises(RuntimeError, define)
+
+	def test_meta_data(self):
+		sys.argv = ["DeepOCF", "meta-data"]
+		DeepOCF.instance = None
+		try:
+			root = DeepOCF().meta_data_tree()
+		finally:
+			DeepOCF.instance = None
+		actions = [element.attrib for element in [child for child in root.children if child.tag == "actions"][0].children]
+		monitors = [attrib for attrib in actions if attrib["name"] == "monitor"]
+		self.assertEqual(monitors, [
+			{"name": "monitor", "timeout": "20", "interval": "10"},
+			{"name": "monitor", "depth": "10", "timeout": "40", "interval": "60"},
+			{"name": "monitor", "depth": "20", "timeout": "2min"},
+		])
+
+
+if __name__ == "__main__":
+	unittest.main()
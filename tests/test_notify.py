@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from ocfagent import notify
+
+ENVIRON = {
+	"OCF_RESKEY_CRM_meta_notify_type": "pre",
+	"OCF_RESKEY_CRM_meta_notify_operation": "start",
+	"OCF_RESKEY_CRM_meta_on_node": "node2",
+	"OCF_RESKEY_CRM_meta_notify_start_resource": "rsc:1 rsc:2 ",
+	"OCF_RESKEY_CRM_meta_notify_start_uname": "node2  node3",
+	"OCF_RESKEY_CRM_meta_notify_active_resource": "rsc:0 rsc:3",
+	"OCF_RESKEY_CRM_meta_notify_active_uname": "node1 node1",
+}
+
+
+class TestNotifyContext(unittest.TestCase):
+	def setUp(self):
+		self.context = notify.NotifyContext(ENVIRON)
+
+	def test_lists(self):
+		self.assertEqual(self.context.resources("start"), ("rsc:1", "rsc:2"))
+		self.assertEqual(self.context.unames("start"), ("node2", "node3"))
+		self.assertEqual(self.context.nodes("active"), frozenset(["node1"]))
+		self.assertEqual(self.context.resource_nodes("start"), {"rsc:1": "node2", "rsc:2": "node3"})
+		self.assertEqual(self.context.node_resources("active"), {"node1": ["rsc:0", "rsc:3"]})
+		self.assertEqual(self.context.resources("stop"), ())
+		self.assertEqual(self.context.nodes("all"), frozenset())
+		self.assertTrue(self.context.resources("start") is self.context.resources("start"))
+
+	def test_phase(self):
+		self.assertEqual(self.context.phase, ("pre", "start"))
+		self.assertTrue(self.context.is_pre)
+		self.assertFalse(self.context.is_post)
+		self.assertEqual(notify.NotifyContext({}).phase, (None, None))
+
+	def test_operation(self):
+		self.assertEqual(self.context.operation_resources(), ("rsc:1", "rsc:2"))
+		self.assertEqual(self.context.operation_nodes(), frozenset(["node2", "node3"]))
+		self.assertTrue(self.context.includes("start"))
+		self.assertFalse(self.context.includes("start", "node1"))
+		self.assertEqual(notify.NotifyContext({}).operation_nodes(), frozenset())
+
+	def test_unknown_kind(self):
+		for method in [self.context.resources, self.context.unames, self.context.nodes, self.context.resource_nodes, self.context.node_resources]:
+			self.assertRaises(RuntimeError, method, "started")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+
+from ocfagent import deadline
+from ocfagent import parallel
+
+
+def returns(value, delay=0):
+	"""task returning value after delay seconds"""
+	def task():
+		time.sleep(delay)
+		return value
+	return task
+
+
+def fails(message, delay=0):
+	"""task raising ValueError(message) after delay seconds"""
+	def task():
+		time.sleep(delay)
+		raise ValueError(message)
+	return task
+
+
+class TestTaskGroup(unittest.TestCase):
+	def test_results_in_spawn_order(self):
+		start = time.time()
+		self.assertEqual(parallel.gather(None, returns("slow", 0.3), returns("fast"), returns("medium", 0.1)), ["slow", "fast", "medium"])
+		# concurrently, not one after the other
+		self.assertTrue(time.time() - start < 0.35)
+
+	def test_arguments(self):
+		group = parallel.TaskGroup()
+		group.spawn(lambda a, b=0: a + b, 1, b=2)
+		group.spawn(lambda: None)
+		self.assertEqual(group.join(), [3, None])
+
+	def test_empty(self):
+		self.assertEqual(parallel.gather(deadline.Deadline(1)), [])
+
+	def test_first_failure(self):
+		group = parallel.TaskGroup(deadline.Deadline(10))
+		group.spawn(returns("slow", 5))
+		group.spawn(fails("late", 0.3))
+		group.spawn(fails("first", 0.05))
+		start = time.time()
+		try:
+			group.join()
+		except ValueError as e:
+			self.assertEqual(str(e), "first")
+		else:
+			self.fail("failure was not raised")
+		self.assertTrue(time.time() - start < 0.3)
+		self.assertTrue(group.cancelled.is_set())
+
+	def test_cancelled_event(self):
+		group = parallel.TaskGroup()
+		group.spawn(group.cancelled.wait, 5)
+		group.spawn(fails("failed"))
+		self.assertRaises(ValueError, group.join)
+		self.assertTrue(group.cancelled.wait(1))
+
+	def test_deadline(self):
+		group = parallel.TaskGroup(deadline.Deadline(0.2, 0))
+		group.spawn(returns("fast"))
+		group.spawn(returns("slow", 5))
+		start = time.time()
+		self.assertRaises(deadline.DeadlineExceeded, group.join)
+		self.assertTrue(time.time() - start < 1)
+		self.assertTrue(group.cancelled.is_set())
+
+
+if __name__ == "__main__":
+	unittest.main()
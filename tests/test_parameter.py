@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+import ocfagent.agent
+from ocfagent import error
+from ocfagent import parameter
+from tests.test_agent import AgentTestCase
+
+
+class OCFParameter_count(parameter.ResourceIntParameter):
+	"""count parameter
+Range checked"""
+	@property
+	def default(self):
+		return 5
+
+	@property
+	def minimum(self):
+		return 1
+
+	@property
+	def maximum(self):
+		return 10
+
+
+class OCFParameter_mode(parameter.ResourceStringParameter):
+	"""mode parameter
+One of two modes"""
+	@property
+	def choices(self):
+		return ["fast", "safe"]
+
+
+class OCFParameter_label(parameter.ResourceStringParameter):
+	"""label parameter
+Lower case letters"""
+	@property
+	def pattern(self):
+		return "[a-z]+"
+
+
+class OCFParameter_flag(parameter.ResourceBoolParameter):
+	"""flag parameter
+Boolean"""
+
+
+class OCFParameter_hosts(parameter.ResourceListParameter):
+	"""hosts parameter
+Comma separated host names"""
+	@property
+	def separator(self):
+		return ","
+
+	@property
+	def pattern(self):
+		return "[a-z0-9.]+"
+
+
+class OCFParameter_words(parameter.ResourceListParameter):
+	"""words parameter
+Whitespace separated words"""
+	@property
+	def choices(self):
+		return ["a", "b", "c"]
+
+
+class OCFParameter_base(parameter.ResourceStringParameter):
+	"""base parameter
+Absolute path"""
+	@property
+	def path(self):
+		return "absolute"
+
+
+class OCFParameter_config(parameter.ResourceStringParameter):
+	"""config parameter
+Existing file"""
+	@property
+	def path(self):
+		return "file"
+
+
+class OCFParameter_dirs(parameter.ResourceListParameter):
+	"""dirs parameter
+Existing directories"""
+	@property
+	def path(self):
+		return "directory"
+
+
+class CountingStr(str):
+	"""string counting how often it is split"""
+	splits = 0
+
+	def split(self, *args):
+		CountingStr.splits += 1
+		return str.split(self, *args)
+
+
+class TestSchema(unittest.TestCase):
+	def setUp(self):
+		self.parse = parameter.compile_schema([OCFParameter_count, OCFParameter_mode, OCFParameter_label, OCFParameter_flag,
+			OCFParameter_hosts, OCFParameter_words, OCFParameter_base, OCFParameter_config, OCFParameter_dirs])
+
+	def values(self, check_paths=False, **environ):
+		"""parsed values of environ given without OCF_RESKEY_ prefix"""
+		return self.parse(dict(("OCF_RESKEY_%s" % name, value) for name, value in environ.items()), check_paths)
+
+	def test_unset(self):
+		self.assertEqual(self.values(), [None] * 9)
+
+	def test_valid(self):
+		values = self.values(count="10", mode="safe", label="abc", flag="yes", hosts=" a.example, b ,,", words="a  c", base="/x")
+		self.assertEqual(values, [10, "safe", "abc", True, ["a.example", "b"], ["a", "c"], "/x", None, None])
+
+	def test_integer(self):
+		self.assertRaises(error.OCFErrConfigured, self.values, count="many")
+		self.assertRaises(error.OCFErrConfigured, self.values, count="0")
+		self.assertRaises(error.OCFErrConfigured, self.values, count="11")
+
+	def test_choices(self):
+		self.assertRaises(error.OCFErrConfigured, self.values, mode="slow")
+		self.assertRaises(error.OCFErrConfigured, self.values, words="a d")
+
+	def test_pattern(self):
+		self.assertRaises(error.OCFErrConfigured, self.values, label="abc1")
+		self.assertRaises(error.OCFErrConfigured, self.values, label="")
+		self.assertRaises(error.OCFErrConfigured, self.values, hosts="a,B")
+
+	def test_boolean(self):
+		self.assertEqual(self.values(flag="0")[3], False)
+		self.assertRaises(error.OCFErrConfigured, self.values, flag="maybe")
+
+	def test_paths(self):
+		self.assertRaises(error.OCFErrConfigured, self.values, base="relative")
+		self.assertRaises(error.OCFErrConfigured, self.values, config="relative")
+		# existence is only checked if requested
+		self.assertEqual(self.values(config="/nonexistent")[7], "/nonexistent")
+		self.assertRaises(error.OCFErrInstalled, self.values, True, config="/nonexistent")
+		self.assertRaises(error.OCFErrInstalled, self.values, True, config="/")
+		self.assertEqual(self.values(True, config=os.path.abspath(__file__))[7], os.path.abspath(__file__))
+		self.assertEqual(self.values(True, dirs="/ /tmp")[8], ["/", "/tmp"])
+		self.assertRaises(error.OCFErrInstalled, self.values, True, dirs="/ /nonexistent")
+
+	def test_cache_returns_copies(self):
+		CountingStr.splits = 0
+		environ = {"OCF_RESKEY_hosts": CountingStr("a,b"), "OCF_RESKEY_count": "3"}
+		first = self.parse(environ)
+		first[0] = 4
+		first[4].append("c")
+		self.assertEqual(self.parse(environ), [3, None, None, None, ["a", "b"], None, None, None, None])
+		self.assertEqual(CountingStr.splits, 1)
+
+	def test_rejected_defaults(self):
+		class OCFParameter_low(OCFParameter_count):
+			"""default below minimum"""
+			@property
+			def default(self):
+				return 0
+
+		class OCFParameter_choice(OCFParameter_mode):
+			"""default not allowed"""
+			@property
+			def default(self):
+				return "slow"
+
+		class OCFParameter_typed(parameter.ResourceIntParameter):
+			"""default of wrong type"""
+			@property
+			def default(self):
+				return "5"
+		for parameter_class in [OCFParameter_low, OCFParameter_choice, OCFParameter_typed]:
+			self.assertRaises(RuntimeError, parameter.compile_schema, [parameter_class])
+
+	def test_invalid_constraints(self):
+		class OCFParameter_bounded(parameter.ResourceStringParameter):
+			"""minimum on a string"""
+			@property
+			def minimum(self):
+				return 1
+
+		class OCFParameter_where(parameter.ResourceStringParameter):
+			"""unknown path kind"""
+			@property
+			def path(self):
+				return "somewhere"
+		for parameter_class in [OCFParameter_bounded, OCFParameter_where]:
+			self.assertRaises(RuntimeError, parameter.compile_schema, [parameter_class])
+
+
+class ParameterOCF(ocfagent.agent.ResourceAgent):
+	"""agent printing its parameter values on monitor"""
+	VERSION = "1.0"
+	SHORTDESC = "parameter test agent"
+	LONGDESC = "parameter test agent"
+
+	OCFParameter_count = OCFParameter_count
+	OCFParameter_config = OCFParameter_config
+
+	def handle_start(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_stop(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_validate_all(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_monitor(self, timeout=20):  # pylint: disable=W0613
+		print ("count=%r config=%r" % (self.get_parameter("count"), self.get_parameter("config")))
+
+
+class TestAgentParameters(AgentTestCase):
+	def test_default(self):
+		self.assertEqual(self.call(ParameterOCF, "monitor"), (error.OCF_SUCCESS, "count=5 config=None\n"))
+		self.assertEqual(self.call(ParameterOCF, "monitor", OCF_RESKEY_count="7"), (error.OCF_SUCCESS, "count=7 config=None\n"))
+
+	def test_invalid_value(self):
+		self.assertEqual(self.call(ParameterOCF, "monitor", OCF_RESKEY_count="0")[0], error.OCF_ERR_CONFIGURED)
+
+	def test_path_checked_per_action(self):
+		environ = {"OCF_RESKEY_config": os.path.join(self.directory, "missing.conf")}
+		self.assertEqual(self.call(ParameterOCF, "monitor", **environ)[0], error.OCF_SUCCESS)
+		self.assertEqual(self.call(ParameterOCF, "start", **environ)[0], error.OCF_ERR_INSTALLED)
+		self.assertEqual(self.call(ParameterOCF, "validate-all", **environ)[0], error.OCF_ERR_INSTALLED)
+		self.assertEqual(self.call(ParameterOCF, "stop", **environ)[0], error.OCF_SUCCESS)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import BaseHTTPServer
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+
+from ocfagent import probe
+
+
+class StatusHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+	"""answers GET /<status> with that status code"""
+	def do_GET(self):  # pylint: disable=C0103
+		self.send_response(int(self.path.strip("/") or 200))
+		self.send_header("Content-Length", "2")
+		self.end_headers()
+		self.wfile.write("ok")
+
+	def log_message(self, *args):  # pylint: disable=W0221
+		pass
+
+
+def free_port():
+	"""a local TCP port nobody listens on"""
+	sock = socket.socket()
+	sock.bind(("127.0.0.1", 0))
+	port = sock.getsockname()[1]
+	sock.close()
+	return port
+
+
+class TestProbes(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def listener(self):
+		"""listening TCP socket closed on cleanup. Returns its port"""
+		sock = socket.socket()
+		sock.bind(("127.0.0.1", 0))
+		sock.listen(5)
+		self.addCleanup(sock.close)
+		return sock.getsockname()[1]
+
+	def http_server(self):
+		"""stand-in HTTP server answering with the status given as path. Returns its port"""
+		server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), StatusHandler)
+		thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05})
+		thread.daemon = True
+		thread.start()
+		self.addCleanup(server.server_close)
+		self.addCleanup(server.shutdown)
+		return server.server_address[1]
+
+	def assertState(self, p, state, timeout=2):
+		result = p.run(timeout)
+		self.assertEqual(result.state, state, str(result))
+		return result
+
+	def test_tcp(self):
+		self.assertState(probe.TCPProbe("127.0.0.1", self.listener()), probe.RUNNING)
+		self.assertState(probe.TCPProbe("127.0.0.1", free_port()), probe.NOT_RUNNING)
+
+	def test_http(self):
+		port = self.http_server()
+		result = self.assertState(probe.HTTPProbe("http://127.0.0.1:%i/" % port), probe.RUNNING)
+		self.assertEqual(result.message, "status 200")
+		self.assertState(probe.HTTPProbe("http://127.0.0.1:%i/204" % port, status=204), probe.RUNNING)
+		result = self.assertState(probe.HTTPProbe("http://127.0.0.1:%i/500" % port), probe.FAILED)
+		self.assertEqual(result.message, "status 500, expected 200")
+		self.assertState(probe.HTTPProbe("http://127.0.0.1:%i/" % free_port()), probe.NOT_RUNNING)
+
+	def test_http_timeout(self):
+		# accepts connections but never answers
+		port = self.listener()
+		start = time.time()
+		result = self.assertState(probe.HTTPProbe("http://127.0.0.1:%i/" % port), probe.FAILED, timeout=0.2)
+		self.assertTrue(time.time() - start < 1)
+		self.assertTrue(result.message.startswith("timeout"))
+
+	def test_unix_socket(self):
+		path = os.path.join(self.directory, "sock")
+		self.assertState(probe.UnixSocketProbe(path), probe.NOT_RUNNING)
+		server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		server.bind(path)
+		server.listen(1)
+		self.addCleanup(server.close)
+
+		def answer():
+			"""answer one request"""
+			conn = server.accept()[0]
+			conn.recv(4096)
+			conn.sendall("PONG\n")
+			conn.close()
+		threading.Thread(target=answer).start()
+		self.assertState(probe.UnixSocketProbe(path, send="PING\n", expect="PONG"), probe.RUNNING)
+
+	def test_pidfile(self):
+		path = os.path.join(self.directory, "pid")
+		self.assertState(probe.PidfileProbe(path), probe.NOT_RUNNING)
+		with open(path, "w") as f:
+			f.write("%i\n" % os.getpid())
+		self.assertState(probe.PidfileProbe(path), probe.RUNNING)
+		proc = subprocess.Popen(["true"])
+		proc.wait()
+		with open(path, "w") as f:
+			f.write("%i\n" % proc.pid)
+		self.assertState(probe.PidfileProbe(path), probe.FAILED)
+		with open(path, "w") as f:
+			f.write("garbage\n")
+		self.assertState(probe.PidfileProbe(path), probe.FAILED)
+
+	def test_file_freshness(self):
+		path = os.path.join(self.directory, "heartbeat")
+		self.assertState(probe.FileFreshnessProbe(path, 60), probe.NOT_RUNNING)
+		open(path, "w").close()
+		self.assertState(probe.FileFreshnessProbe(path, 60), probe.RUNNING)
+		os.utime(path, (time.time() - 120, time.time() - 120))
+		self.assertState(probe.FileFreshnessProbe(path, 60), probe.FAILED)
+
+	def test_summarize(self):
+		p = probe.Probe("stand-in")
+		running = probe.ProbeResult(p, probe.RUNNING, "ok", 0.001)
+		not_running = probe.ProbeResult(p, probe.NOT_RUNNING, "down", 0.001)
+		failed = probe.ProbeResult(p, probe.FAILED, "broken", 0.001)
+		self.assertEqual(probe.summarize([running, running])[0], probe.RUNNING)
+		self.assertEqual(probe.summarize([not_running, not_running])[0], probe.NOT_RUNNING)
+		self.assertEqual(probe.summarize([running, not_running])[0], probe.FAILED)
+		self.assertEqual(probe.summarize([running, failed]), (probe.FAILED, "stand-in: running (ok, 1.0 ms); stand-in: failed (broken, 1.0 ms)"))
+		self.assertEqual(probe.summarize([])[0], probe.FAILED)
+
+
+if __name__ == "__main__":
+	unittest.main()
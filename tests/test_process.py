@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import errno
+import os
+import signal
+import subprocess
+import threading
+import time
+import unittest
+
+import ocfagent.agent
+from ocfagent import error
+from ocfagent import process
+from tests.test_agent import AgentTestCase
+
+GROUP = ["sh", "-c", "(trap '' TERM; while :; do sleep 0.05; done) & exec sleep 30"]
+"""process group whose leader exits on SIGTERM while a member ignores it"""
+
+
+class StopOCF(ocfagent.agent.ResourceAgent):
+	"""agent stopping the process group of target"""
+	VERSION = "1.0"
+	SHORTDESC = "stop test agent"
+	LONGDESC = "stop test agent"
+	STOP_SIGNALS = [(signal.SIGTERM, 0.1), (signal.SIGKILL, 1.0)]
+	target = None
+
+	def handle_start(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_stop(self, timeout=20):  # pylint: disable=W0613
+		self.stop_process(self.target, group=True)
+
+	def handle_monitor(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+
+class RealtimeStopOCF(StopOCF):
+	"""agent stopping target with a real-time signal without name"""
+	STOP_SIGNALS = [(signal.SIGRTMIN + 1, 0.5), (signal.SIGKILL, 0.5)]
+
+	def handle_stop(self, timeout=20):  # pylint: disable=W0613
+		self.stop_process(self.target)
+
+
+def group_exists(pgid):
+	"""check if any process is left in group pgid"""
+	try:
+		os.killpg(pgid, 0)
+	except OSError as e:
+		if e.errno == errno.ESRCH:
+			return False
+		raise
+	return True
+
+
+class TestStopProcess(AgentTestCase):
+	def setUp(self):
+		AgentTestCase.setUp(self)
+		self.leader = subprocess.Popen(GROUP, preexec_fn=os.setsid)
+		# let the member install its SIGTERM trap
+		time.sleep(0.2)
+
+	def tearDown(self):
+		if group_exists(self.leader.pid):
+			os.killpg(self.leader.pid, signal.SIGKILL)
+		self.leader.wait()
+		AgentTestCase.tearDown(self)
+
+	def test_group_escalates_until_empty(self):
+		StopOCF.target = process.Process.from_pid(self.leader.pid)
+		self.assertEqual(self.call(StopOCF, "stop", OCF_RESKEY_CRM_meta_timeout="5000")[0], error.OCF_SUCCESS)
+		self.assertFalse(group_exists(self.leader.pid))
+
+	def test_signal_without_name(self):
+		RealtimeStopOCF.target = process.Process.from_pid(self.leader.pid)
+		self.assertEqual(self.call(RealtimeStopOCF, "stop", OCF_RESKEY_CRM_meta_timeout="5000")[0], error.OCF_SUCCESS)
+		self.assertEqual(self.leader.wait(), -(signal.SIGRTMIN + 1))
+
+
+class TestProcess(unittest.TestCase):
+	def setUp(self):
+		self.children = []
+
+	def tearDown(self):
+		for child in self.children:
+			if child.poll() is None:
+				child.kill()
+				child.wait()
+		process.PIDFD_SUPPORTED = True
+
+	def spawn(self, args):
+		"""start child args and return its process.Process"""
+		child = subprocess.Popen(args)
+		self.children.append(child)
+		return process.Process.from_pid(child.pid)
+
+	def zombie(self):
+		"""start a child, let it exit without reaping it and return its pid"""
+		child = subprocess.Popen(["sleep", "0"])
+		self.children.append(child)
+		for _ in range(500):
+			stat = process.read_stat(child.pid)
+			if stat[1] == "Z":
+				return child.pid
+			time.sleep(0.01)
+		self.fail("child %i did not exit" % child.pid)
+
+	def test_alive(self):
+		proc = self.spawn(["sleep", "30"])
+		self.assertTrue(proc.alive())
+		self.assertEqual(proc.comm, "sleep")
+		self.assertEqual(repr(process.Process.from_state(proc.to_state())), repr(proc))
+		self.assertEqual(process.Process.from_state("garbage"), None)
+
+	def test_reused_pid(self):
+		proc = self.spawn(["sleep", "30"])
+		reused = process.Process(proc.pid, proc.starttime + 1)
+		self.assertFalse(reused.alive())
+		self.assertEqual(reused.comm, None)
+		self.assertEqual(reused.pidfd(), None)
+		self.assertFalse(reused.signal(signal.SIGTERM))
+		self.assertTrue(proc.alive())
+
+	def test_zombie(self):
+		pid = self.zombie()
+		self.assertFalse(process.Process.from_pid(pid).alive())
+		self.assertFalse(pid in [proc.pid for proc in process.find(comm="sleep")])
+
+	def test_find(self):
+		proc = self.spawn(["sleep", "31.25"])
+		self.spawn(["sleep", "32.25"])
+		found = process.find(comm="sleep", match=lambda args: args[1:] == ["31.25"])
+		self.assertEqual([p.pid for p in found], [proc.pid])
+		self.assertEqual(found[0].starttime, proc.starttime)
+		self.assertEqual(process.find(comm="sleep", match=lambda args: False), [])
+		self.assertEqual(process.find(comm="no-such-comm"), [])
+		self.assertTrue(proc.pid in [p.pid for p in process.find(uid=os.getuid(), comm="sleep")])
+
+	def check_wait(self):
+		"""check that wait returns False while the process runs and True once it exited"""
+		proc = self.spawn(["sleep", "30"])
+		self.assertFalse(proc.wait(0.2))
+		threading.Timer(0.2, proc.signal, [signal.SIGTERM]).start()
+		start = time.time()
+		self.assertTrue(proc.wait(5))
+		self.assertTrue(time.time() - start < 2)
+		proc.close()
+		return proc
+
+	def test_wait_pidfd(self):
+		current = process.Process.from_pid(os.getpid())
+		if current.pidfd() is None:
+			self.skipTest("pidfds are not supported")
+		current.close()
+		self.check_wait()
+
+	def test_wait_polling(self):
+		process.PIDFD_SUPPORTED = False
+		proc = self.check_wait()
+		self.assertEqual(proc.pidfd(), None)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from ocfagent import error
+from ocfagent import profiling
+from tests.test_agent import AgentTestCase
+from tests.test_agent import StatefulOCF
+
+
+class TestSampled(unittest.TestCase):
+	def test_disabled(self):
+		self.assertFalse(profiling.sampled({}))
+		self.assertFalse(profiling.sampled({profiling.ENV_DIR: "", profiling.ENV_SAMPLE: "1"}))
+
+	def test_every_call(self):
+		for sample in [None, "", "1", "0", "-3", "often"]:
+			environ = {profiling.ENV_DIR: "/tmp"}
+			if sample is not None:
+				environ[profiling.ENV_SAMPLE] = sample
+			self.assertTrue(profiling.sampled(environ))
+
+	def test_sample(self):
+		environ = {profiling.ENV_DIR: "/tmp", profiling.ENV_SAMPLE: "2"}
+		results = set(profiling.sampled(environ) for _ in range(200))
+		self.assertEqual(results, set([True, False]))
+
+
+class TestProfile(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def files(self):
+		return sorted(os.listdir(self.directory))
+
+	def test_not_sampled(self):
+		with profiling.profile({}, "Agent", "monitor"):
+			pass
+		self.assertEqual(self.files(), [])
+
+	def test_pstats(self):
+		directory = os.path.join(self.directory, "profiles")
+		try:
+			with profiling.profile({profiling.ENV_DIR: directory}, "Agent", "monitor"):
+				sorted(range(1000))
+				raise ValueError("handler failed")
+		except ValueError:
+			pass
+		files = os.listdir(directory)
+		self.assertEqual(len(files), 1)
+		self.assertTrue(files[0].startswith("Agent-monitor-") and files[0].endswith("-%i.pstats" % os.getpid()))
+		stats = pstats.Stats(os.path.join(directory, files[0]))
+		self.assertTrue(any("sorted" in function[2] for function in stats.stats))
+
+	def test_unwritable_directory(self):
+		path = os.path.join(self.directory, "file")
+		open(path, "w").close()
+		with profiling.profile({profiling.ENV_DIR: os.path.join(path, "profiles")}, "Agent", "monitor"):
+			pass
+
+	def write(self, name, size, mtime):
+		"""write a file of size bytes modified at mtime"""
+		path = os.path.join(self.directory, name)
+		with open(path, "w") as f:
+			f.write("x" * size)
+		os.utime(path, (mtime, mtime))
+
+	def test_rotate(self):
+		self.write("a.pstats", 100, 1000)
+		self.write("b.tracemalloc", 100, 2000)
+		self.write("c.pstats", 100, 3000)
+		self.write("other.txt", 1000, 0)
+		profiling.rotate(self.directory, 300)
+		self.assertEqual(self.files(), ["a.pstats", "b.tracemalloc", "c.pstats", "other.txt"])
+		profiling.rotate(self.directory, 250)
+		self.assertEqual(self.files(), ["b.tracemalloc", "c.pstats", "other.txt"])
+		profiling.rotate(self.directory, 0)
+		self.assertEqual(self.files(), ["other.txt"])
+
+
+class TestHandlerProfile(AgentTestCase):
+	def test_handler_profiled(self):
+		directory = os.path.join(self.directory, "profiles")
+		self.assertEqual(self.call(StatefulOCF, "start", OCF_AGENT_PROFILE_DIR=directory)[0], error.OCF_SUCCESS)
+		self.assertEqual(self.call(StatefulOCF, "monitor", OCF_AGENT_PROFILE_DIR=directory)[0], error.OCF_NOT_RUNNING)
+		self.assertEqual(sorted(name.split("-")[1] for name in os.listdir(directory)), ["monitor", "start"])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import errno
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+from ocfagent import deadline
+from ocfagent import promotion
+from ocfagent import state
+
+STUB = """#!/bin/sh
+echo "$@" >> %(log)s
+exit $(cat %(status)s 2>/dev/null || echo 0)
+"""
+"""stand-in for crm_attribute/crm_master logging its arguments, exits with the content of the status file"""
+
+HANGING_STUB = """#!/bin/sh
+echo $$ > %(pid)s
+exec sleep 30
+"""
+"""stand-in for a hanging crm_master writing its pid"""
+
+
+class TestPromotionScore(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.log = os.path.join(self.directory, "calls")
+		self.status = os.path.join(self.directory, "status")
+		self.stub = os.path.join(self.directory, "crm_attribute")
+		with open(self.stub, "w") as f:
+			f.write(STUB % {"log": self.log, "status": self.status})
+		os.chmod(self.stub, stat.S_IRWXU)
+		self.store = state.StateStore(self.directory, "rsc:0")
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def score(self, min_interval=0, refresh=3600):
+		return promotion.PromotionScore(self.store, [self.stub, "-N", "node1", "-n", "master-rsc"], min_interval, refresh)
+
+	def calls(self):
+		"""argument lines the stub was called with"""
+		if not os.path.exists(self.log):
+			return []
+		with open(self.log) as f:
+			return f.read().splitlines()
+
+	def test_unchanged_score_is_not_published_again(self):
+		score = self.score()
+		self.assertTrue(score.set(10))
+		self.assertFalse(score.set(10))
+		self.assertTrue(score.set(5))
+		self.assertEqual(self.calls(), ["-N node1 -n master-rsc -v 10", "-N node1 -n master-rsc -v 5"])
+		self.assertEqual(score.published, 5)
+
+	def test_published_score_survives_calls(self):
+		self.assertTrue(self.score().set(10))
+		self.store.save()
+		self.store = state.StateStore(self.directory, "rsc:0")
+		self.assertFalse(self.score().set(10))
+		self.assertEqual(len(self.calls()), 1)
+
+	def test_refresh(self):
+		score = self.score(refresh=0)
+		self.assertTrue(score.set(10))
+		self.assertTrue(score.set(10))
+		self.assertEqual(len(self.calls()), 2)
+
+	def test_min_interval_coalesces(self):
+		score = self.score(min_interval=3600)
+		self.assertTrue(score.set(10))
+		self.assertFalse(score.set(20))
+		self.assertFalse(score.set(30))
+		self.assertEqual(score.pending, 30)
+		self.assertFalse(score.flush())
+		self.assertTrue(score.set(40, force=True))
+		self.assertEqual(score.pending, None)
+		self.assertEqual(self.calls(), ["-N node1 -n master-rsc -v 10", "-N node1 -n master-rsc -v 40"])
+
+	def test_flush_publishes_pending(self):
+		score = self.score(min_interval=3600)
+		self.assertTrue(score.set(10))
+		self.assertFalse(score.set(20))
+		score.min_interval = 0
+		self.assertTrue(score.flush())
+		self.assertEqual(score.published, 20)
+		self.assertFalse(score.flush())
+
+	def test_delete(self):
+		score = self.score()
+		self.assertTrue(score.set(10))
+		self.assertTrue(score.delete())
+		self.assertFalse(score.delete())
+		self.assertEqual(score.published, promotion.DELETED)
+		self.assertEqual(self.calls()[-1], "-N node1 -n master-rsc -D")
+
+	def test_failing_command(self):
+		with open(self.status, "w") as f:
+			f.write("1\n")
+		score = self.score()
+		self.assertFalse(score.set(10))
+		self.assertEqual(score.published, None)
+		os.unlink(self.status)
+		self.assertTrue(score.set(10))
+		self.assertEqual(len(self.calls()), 2)
+
+	def test_hanging_command(self):
+		hanging = os.path.join(self.directory, "crm_master")
+		pidfile = os.path.join(self.directory, "pid")
+		with open(hanging, "w") as f:
+			f.write(HANGING_STUB % {"pid": pidfile})
+		os.chmod(hanging, stat.S_IRWXU)
+		score = promotion.PromotionScore(self.store, [hanging], deadline=deadline.Deadline(2.0, 0))
+		start = time.time()
+		self.assertFalse(score.set(10))
+		self.assertTrue(time.time() - start < 2.0)
+		self.assertEqual(score.published, None)
+		with open(pidfile) as f:
+			pid = int(f.read())
+		# killed and reaped
+		try:
+			os.kill(pid, 0)
+		except OSError as e:
+			self.assertEqual(e.errno, errno.ESRCH)
+		else:
+			self.fail("command %i is still running" % pid)
+
+	def test_missing_command(self):
+		score = promotion.PromotionScore(self.store, [os.path.join(self.directory, "missing")])
+		self.assertFalse(score.set(10))
+		self.assertEqual(score.published, None)
+
+
+if __name__ == "__main__":
+	unittest.main()
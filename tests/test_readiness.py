@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+
+from ocfagent import process
+from ocfagent import readiness
+
+
+def delayed_listener(delay):
+	"""listen on a free local port after delay seconds. Returns (socket, port)"""
+	probe = socket.socket()
+	probe.bind(("127.0.0.1", 0))
+	port = probe.getsockname()[1]
+	probe.close()
+	server = socket.socket()
+	server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+	def listen():
+		"""bind and listen after delay"""
+		time.sleep(delay)
+		server.bind(("127.0.0.1", port))
+		server.listen(1)
+	threading.Thread(target=listen).start()
+	return server, port
+
+
+class TestReadiness(unittest.TestCase):
+	def setUp(self):
+		self.daemon = subprocess.Popen(["sleep", "30"])
+		self.process = process.Process.from_pid(self.daemon.pid)
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		if self.daemon.poll() is None:
+			self.daemon.kill()
+			self.daemon.wait()
+		self.process.close()
+		shutil.rmtree(self.directory)
+
+	def test_wait_connect_retries_with_process(self):
+		server, port = delayed_listener(0.3)
+		try:
+			start = time.time()
+			readiness.wait_connect(("127.0.0.1", port), timeout=5, process=self.process)
+			self.assertTrue(time.time() - start < 2)
+		finally:
+			server.close()
+
+	def test_wait_connect_without_process(self):
+		server, port = delayed_listener(0.3)
+		try:
+			start = time.time()
+			readiness.wait_connect(("127.0.0.1", port), timeout=5)
+			self.assertTrue(time.time() - start < 2)
+		finally:
+			server.close()
+
+	def test_wait_path_polling_with_process(self):
+		# parent directory missing: no inotify watch, polling fallback
+		path = os.path.join(self.directory, "run", "daemon.pid")
+
+		def create():
+			"""create the pidfile after a delay"""
+			time.sleep(0.3)
+			os.mkdir(os.path.dirname(path))
+			open(path, "w").close()
+		threading.Thread(target=create).start()
+		start = time.time()
+		readiness.wait_path(path, timeout=5, process=self.process)
+		self.assertTrue(time.time() - start < 2)
+
+	def test_wait_path_inotify(self):
+		path = os.path.join(self.directory, "daemon.pid")
+		threading.Timer(0.2, lambda: open(path, "w").close()).start()
+		start = time.time()
+		readiness.wait_path(path, timeout=5, process=self.process)
+		self.assertTrue(time.time() - start < 2)
+
+	def test_process_exit(self):
+		self.daemon.kill()
+		self.daemon.wait()
+		self.assertRaises(SystemExit, readiness.wait_path, os.path.join(self.directory, "never"), timeout=5, process=self.process)
+
+	def test_timeout(self):
+		start = time.time()
+		self.assertRaises(SystemExit, readiness.wait_path, os.path.join(self.directory, "never"), timeout=0.3)
+		self.assertTrue(time.time() - start < 1)
+
+	def test_notify_socket(self):
+		with readiness.NotifySocket() as notify_socket:
+			sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+			threading.Timer(0.2, lambda: sender.sendto("STATUS=up\nREADY=1", notify_socket.path)).start()
+			status = notify_socket.wait(timeout=5, process=self.process)
+			sender.close()
+		self.assertEqual(status, {"STATUS": "up", "READY": "1"})
+
+
+if __name__ == "__main__":
+	unittest.main()
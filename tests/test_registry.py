@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import unittest
+
+from ocfagent import error
+from ocfagent import registry
+from tests.test_agent import AgentTestCase
+
+SOURCE = '''
+import ocfagent.agent
+from ocfagent import error
+
+
+class %(name)s(ocfagent.agent.ResourceAgent):
+	"""registered agent %(name)s"""
+	VERSION = "1.0"
+	SHORTDESC = "%(name)s"
+	LONGDESC = "registered agent %(name)s"
+
+	def handle_start(self, timeout=20):
+		pass
+
+	def handle_stop(self, timeout=20):
+		pass
+
+	def handle_monitor(self, timeout=20):
+		raise error.OCFNotRunning("%(name)s stopped")
+'''
+
+
+class TestRegistry(AgentTestCase):
+	def setUp(self):
+		AgentTestCase.setUp(self)
+		self.modules = {"Alpha": "registered_alpha", "Beta": "registered_beta"}
+		for name, module in self.modules.items():
+			with open(os.path.join(self.directory, "%s.py" % module), "w") as f:
+				f.write(SOURCE % {"name": name})
+		sys.path.insert(0, self.directory)
+		self.registry = registry.Registry(dict((name, "%s:%s" % (module, name)) for name, module in self.modules.items()))
+
+	def tearDown(self):
+		sys.path.remove(self.directory)
+		for module in self.modules.values():
+			sys.modules.pop(module, None)
+		AgentTestCase.tearDown(self)
+
+	def test_invalid_target(self):
+		self.assertRaises(RuntimeError, registry.Registry, {"Alpha": "registered_alpha.Alpha"})
+		self.assertRaises(RuntimeError, self.registry.register, "Gamma", "registered_gamma")
+
+	def test_select(self):
+		self.assertEqual(self.registry.select(["/usr/lib/ocf/resource.d/provider/Alpha"], {}), "Alpha")
+		self.assertEqual(self.registry.select(["Beta.py"], {}), "Beta")
+		self.assertEqual(self.registry.select(["dispatcher"], {"OCF_RESOURCE_TYPE": "Beta"}), "Beta")
+		self.assertEqual(self.registry.select(["Alpha"], {"OCF_RESOURCE_TYPE": "Beta"}), "Alpha")
+		self.assertEqual(self.registry.select(["dispatcher"], {"OCF_RESOURCE_TYPE": "Gamma"}), None)
+		self.assertEqual(self.registry.select([], {}), None)
+
+	def test_only_selected_module_is_imported(self):
+		agent_class = self.registry.load("Alpha")
+		self.assertEqual(agent_class.__name__, "Alpha")
+		self.assertTrue("registered_alpha" in sys.modules)
+		self.assertFalse("registered_beta" in sys.modules)
+		self.assertTrue(self.registry.load("Alpha") is agent_class)
+		self.assertRaises(error.OCFErrInstalled, self.registry.load, "Gamma")
+
+	def test_dispatch(self):
+		sys.argv = [os.path.join(self.directory, "Beta"), "monitor"]
+		code = None
+		try:
+			self.registry.main()
+		except SystemExit as e:
+			code = e.code
+		self.assertEqual(code, error.OCF_NOT_RUNNING)
+		self.assertFalse("registered_alpha" in sys.modules)
+
+	def test_install(self):
+		directory = os.path.join(self.directory, "resource.d")
+		os.mkdir(directory)
+		dispatcher = os.path.join(self.directory, "dispatcher")
+		os.symlink("/nonexistent", os.path.join(directory, "Alpha"))
+		self.registry.install(directory, dispatcher)
+		self.assertEqual(sorted(os.listdir(directory)), ["Alpha", "Beta"])
+		for name in ["Alpha", "Beta"]:
+			self.assertEqual(os.readlink(os.path.join(directory, name)), dispatcher)
+
+	def test_write_meta_data(self):
+		directory = os.path.join(self.directory, "meta-data")
+		os.mkdir(directory)
+		self.registry.write_meta_data(directory)
+		self.assertEqual(sorted(os.listdir(directory)), ["Alpha.xml", "Beta.xml"])
+		for name in ["Alpha", "Beta"]:
+			with open(os.path.join(directory, "%s.xml" % name)) as f:
+				content = f.read()
+			self.assertEqual(content, self.registry.meta_data(name) + "\n")
+			self.assertTrue('<resource-agent name="%s" version="1.0">' % name in content)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from ocfagent import error
+from ocfagent import simulator
+
+AGENT = """import os, sys, time
+action = sys.argv[1]
+env = os.environ
+with open(env["OCF_RESKEY_log"], "a") as f:
+	f.write("%s %s %s%s\\n" % (env["OCF_RESOURCE_INSTANCE"], action, env.get("OCF_RESKEY_CRM_meta_notify_type", ""), env.get("OCF_RESKEY_CRM_meta_notify_operation", "")))
+if action == "monitor" and env.get("OCF_RESKEY_hang"):
+	time.sleep(30)
+sys.exit(7 if action == "monitor" and env.get("OCF_RESKEY_CRM_meta_role") != "Master" else 0)
+"""
+"""trivial agent logging its calls, hanging in monitor if the hang parameter is set"""
+
+
+class TestPercentile(unittest.TestCase):
+	def test_nearest_rank(self):
+		values = range(1, 11)
+		self.assertEqual(simulator.percentile(values, 0.5), 5)
+		self.assertEqual(simulator.percentile(values, 0.9), 9)
+		self.assertEqual(simulator.percentile(values, 0.95), 10)
+		self.assertEqual(simulator.percentile(values, 0.99), 10)
+		self.assertEqual(simulator.percentile(values, 1.0), 10)
+		self.assertEqual(simulator.percentile(values, 0.0), 1)
+
+	def test_small_samples(self):
+		self.assertEqual(simulator.percentile([], 0.5), 0.0)
+		self.assertEqual(simulator.percentile([3.0], 0.99), 3.0)
+		self.assertEqual(simulator.percentile([1.0, 2.0], 0.5), 1.0)
+
+
+class TestSimulator(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.agent = os.path.join(self.directory, "agent.py")
+		with open(self.agent, "w") as f:
+			f.write(AGENT)
+		self.log = os.path.join(self.directory, "calls")
+		self.report = os.path.join(self.directory, "report.json")
+		self.saved_stdout = sys.stdout
+
+	def tearDown(self):
+		sys.stdout = self.saved_stdout
+		shutil.rmtree(self.directory)
+
+	def run_simulator(self, *args):
+		"""run the simulator quietly with args. Returns exit code, report and calls per resource"""
+		sys.stdout = open(os.devnull, "w")
+		try:
+			code = simulator.main([self.agent, "--json", self.report, "--param", "log=%s" % self.log] + list(args))
+		finally:
+			sys.stdout.close()
+			sys.stdout = self.saved_stdout
+		with open(self.report) as f:
+			report = json.load(f)
+		calls = {}
+		with open(self.log) as f:
+			for line in f:
+				resource, call = line.split(" ", 1)
+				calls.setdefault(resource, []).append(call.strip())
+		return code, report, calls
+
+	def test_lifecycle(self):
+		code, report, calls = self.run_simulator("--resources", "2", "--clone", "--promote", "1", "--notify", "--interval", "0.2", "--duration", "0.6", "--timeout", "5")
+		self.assertEqual(code, error.OCF_SUCCESS)
+		self.assertEqual(sorted(calls), ["rsc:0", "rsc:1"])
+		for resource, promoted in [("rsc:0", True), ("rsc:1", False)]:
+			sequence = [call for call in calls[resource] if call != "monitor"]
+			expected = ["notify prestart", "start", "notify poststart"]
+			if promoted:
+				expected += ["notify prepromote", "promote", "notify postpromote"]
+			self.assertTrue("monitor" in calls[resource])
+			self.assertEqual(calls[resource][:len(expected)], expected)
+			if promoted:
+				expected += ["notify predemote", "demote", "notify postdemote"]
+			expected += ["notify prestop", "stop", "notify poststop"]
+			self.assertEqual(sequence, expected)
+		self.assertEqual(set(report), set(["elapsed", "operations", "throughput", "actions"]))
+		self.assertEqual(report["operations"], sum(len(resource_calls) for resource_calls in calls.values()))
+		self.assertEqual(sorted(report["actions"]), ["demote", "monitor", "notify", "promote", "start", "stop"])
+		self.assertEqual(report["actions"]["notify"]["count"], 12)
+		self.assertEqual(report["actions"]["start"]["exit_codes"], {"0": 2})
+		monitor = report["actions"]["monitor"]
+		self.assertEqual(set(monitor), set(["count", "exit_codes", "timeouts", "timeout_rate", "latency_p50", "latency_p90", "latency_p99", "latency_max", "lag_p50", "lag_p99"]))
+		self.assertEqual(sorted(monitor["exit_codes"]), ["0", "7"])
+		self.assertEqual(monitor["timeouts"], 0)
+		self.assertTrue(0 < monitor["latency_p50"] <= monitor["latency_p99"] <= monitor["latency_max"])
+
+	def test_timeout_killed(self):
+		code, report, calls = self.run_simulator("--resources", "1", "--interval", "0.1", "--duration", "0.1", "--timeout", "1", "--param", "hang=1")
+		self.assertEqual(code, error.OCF_ERR_GENERIC)
+		self.assertEqual([call for call in calls["rsc0"] if call != "monitor"], ["start", "stop"])
+		monitor = report["actions"]["monitor"]
+		self.assertEqual(monitor["timeouts"], monitor["count"])
+		self.assertEqual(monitor["timeout_rate"], 1.0)
+		self.assertEqual(monitor["exit_codes"], {str(-9): monitor["count"]})
+		self.assertTrue(monitor["latency_max"] < 5)
+		self.assertEqual(report["actions"]["stop"]["timeouts"], 0)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import marshal
+import os
+import shutil
+import socket
+import StringIO
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import ocfagent.agent
+from ocfagent import error
+from ocfagent import worker
+
+
+class WorkerOCF(ocfagent.agent.ResourceAgent):
+	"""agent forwarding to a stand-in worker"""
+	VERSION = "1.0"
+	SHORTDESC = "worker test agent"
+	LONGDESC = "worker test agent"
+
+	def handle_start(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_stop(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+	def handle_monitor(self, timeout=20):  # pylint: disable=W0613
+		pass
+
+
+class ConfiguredOCF(WorkerOCF):
+	"""agent with its own constructor arguments"""
+	def __init__(self, config, testmode=False):
+		WorkerOCF.__init__(self, testmode=testmode)
+		self.config = config
+
+
+class StandInWorker(threading.Thread):
+	"""accepts one call on path, records the request and answers with result (never if None)"""
+	def __init__(self, path, result):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.result = result
+		self.request = None
+		self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.sock.bind(path)
+		self.sock.listen(1)
+
+	def run(self):
+		conn = self.sock.accept()[0]
+		self.request = marshal.loads(worker._read_all(conn))  # pylint: disable=W0212
+		if self.result is not None:
+			conn.sendall(marshal.dumps(self.result))
+			conn.close()
+
+
+class TestWorker(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		WorkerOCF.WORKER_SOCKET = os.path.join(self.directory, "worker.sock")
+		WorkerOCF.instance = None
+		self.saved = sys.argv, sys.stdout, dict(os.environ)
+		sys.argv = ["WorkerOCF", "monitor"]
+		for name in list(os.environ):
+			if name.startswith("OCF_"):
+				del os.environ[name]
+
+	def tearDown(self):
+		sys.argv, sys.stdout = self.saved[:2]
+		os.environ.clear()
+		os.environ.update(self.saved[2])
+		WorkerOCF.instance = None
+		shutil.rmtree(self.directory)
+
+	def test_forwarded_before_construction(self):
+		stand_in = StandInWorker(WorkerOCF.WORKER_SOCKET, {"exit": 7, "stdout": "from worker\n", "stderr": ""})
+		stand_in.start()
+		sys.stdout = StringIO.StringIO()
+		# the OCF environment is missing, constructing the instance would fail
+		try:
+			WorkerOCF()
+		except SystemExit as e:
+			self.assertEqual(e.code, 7)
+		else:
+			self.fail("call was not forwarded")
+		self.assertEqual(sys.stdout.getvalue(), "from worker\n")
+		self.assertEqual(WorkerOCF.instance, None)
+		stand_in.join()
+		self.assertEqual(stand_in.request["argv"], ["WorkerOCF", "monitor"])
+
+	def test_custom_constructor(self):
+		ConfiguredOCF.WORKER_SOCKET = None
+		ConfiguredOCF.instance = None
+		sys.argv = ["ConfiguredOCF", "meta-data"]
+		try:
+			self.assertEqual(ConfiguredOCF("/etc/k.conf", testmode=True).config, "/etc/k.conf")
+		finally:
+			ConfiguredOCF.instance = None
+
+	def test_custom_constructor_forwarded(self):
+		ConfiguredOCF.WORKER_SOCKET = WorkerOCF.WORKER_SOCKET
+		ConfiguredOCF.instance = None
+		sys.argv = ["ConfiguredOCF", "monitor"]
+		stand_in = StandInWorker(WorkerOCF.WORKER_SOCKET, {"exit": 0, "stdout": "", "stderr": ""})
+		stand_in.start()
+		self.assertRaises(SystemExit, ConfiguredOCF, "/etc/k.conf", testmode=True)
+		stand_in.join()
+		self.assertEqual(ConfiguredOCF.instance, None)
+		self.assertEqual(stand_in.request["testmode"], True)
+
+	def test_not_forwarded(self):
+		StandInWorker(WorkerOCF.WORKER_SOCKET, None)
+		for argv in [["WorkerOCF"], ["WorkerOCF", "meta-data"], ["WorkerOCF", "batch", "monitor"]]:
+			sys.argv = argv
+			self.assertEqual(WorkerOCF.forward_call(), None)
+		worker.in_worker = True
+		try:
+			sys.argv = ["WorkerOCF", "monitor"]
+			self.assertEqual(WorkerOCF.forward_call(), None)
+		finally:
+			worker.in_worker = False
+
+	def test_worker_unavailable(self):
+		self.assertEqual(WorkerOCF.forward_call(), None)
+
+	def test_timeout(self):
+		StandInWorker(WorkerOCF.WORKER_SOCKET, None).start()
+		os.environ["OCF_RESKEY_CRM_meta_timeout"] = "300"
+		start = time.time()
+		self.assertRaises(error.OCFErrGeneric, WorkerOCF.forward_call)
+		self.assertTrue(time.time() - start < 2)
+
+
+if __name__ == "__main__":
+	unittest.main()